@@ -10,4 +10,5 @@ INCLUDES 	+= -I$(DIRVER_PATH)/platform
 INCLUDES 	+= -I$(DIRVER_PATH)/platform
 INCLUDES 	+= -I$(BSP_BASE)/$(BOARD)
 
-C_SRCS   	+= $(DIRVER_PATH)/peripherals/uart.c
\ No newline at end of file
+C_SRCS   	+= $(DIRVER_PATH)/peripherals/uart.c
+C_SRCS   	+= $(DIRVER_PATH)/platform/hpm.c
\ No newline at end of file
@@ -0,0 +1,152 @@
+///////////////////////////////////////////////////////////////////////////////////////////////////
+//
+// Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+//
+// Author: Heqing Huang
+// Date Created: 10/17/2026
+//
+// ================== Description ==================
+//
+// Hardware performance monitor routines
+//
+///////////////////////////////////////////////////////////////////////////////////////////////////
+
+#include <stdint.h>
+#include <stdio.h>
+
+#include "sysutils.h"
+#include "hpm.h"
+
+static const char *hpm_event_name[HPM_EVENT_NUM] = {
+    "none", "branch", "branch_good", "branch_miss", "load_use", "csr_dep",
+    "mul_busy", "div_busy", "ibus_wait", "dbus_wait", "dcache_miss", "trap",
+};
+
+/** Read a 64 bits counter, retry if the lower 32 bits overflow in between */
+#define _read_csr64(reg) ({ uint32_t __hi, __lo; \
+do { \
+    __hi = _read_csr(reg ## h); \
+    __lo = _read_csr(reg); \
+} while (__hi != _read_csr(reg ## h)); \
+((uint64_t) __hi << 32) | __lo;})
+
+/**
+ * Select the event of mhpmcounter<counter>
+ */
+void _hpm_set_event(uint32_t counter, uint32_t event) {
+    switch (counter) {
+        case 3: _write_csr(mhpmevent3, event); break;
+        case 4: _write_csr(mhpmevent4, event); break;
+        case 5: _write_csr(mhpmevent5, event); break;
+        case 6: _write_csr(mhpmevent6, event); break;
+        case 7: _write_csr(mhpmevent7, event); break;
+        case 8: _write_csr(mhpmevent8, event); break;
+        default: break;
+    }
+}
+
+uint32_t _hpm_get_event(uint32_t counter) {
+    switch (counter) {
+        case 3: return _read_csr(mhpmevent3);
+        case 4: return _read_csr(mhpmevent4);
+        case 5: return _read_csr(mhpmevent5);
+        case 6: return _read_csr(mhpmevent6);
+        case 7: return _read_csr(mhpmevent7);
+        case 8: return _read_csr(mhpmevent8);
+        default: return HPM_EVENT_NONE;
+    }
+}
+
+/**
+ * Read mhpmcounter<counter>
+ */
+uint64_t _hpm_read(uint32_t counter) {
+    switch (counter) {
+        case 3: return _read_csr64(mhpmcounter3);
+        case 4: return _read_csr64(mhpmcounter4);
+        case 5: return _read_csr64(mhpmcounter5);
+        case 6: return _read_csr64(mhpmcounter6);
+        case 7: return _read_csr64(mhpmcounter7);
+        case 8: return _read_csr64(mhpmcounter8);
+        default: return 0;
+    }
+}
+
+/**
+ * Select the events, clear and enable all the counters
+ * - events: event of each counter, HPM_COUNTER_NUM entries
+ */
+void _hpm_init(const uint32_t *events) {
+    uint32_t i;
+    asm volatile ("csrc mcountinhibit, %0" :: "r"(HPM_MCOUNTINHIBIT_IR | HPM_MCOUNTINHIBIT_HPM));
+    for (i = 0; i < HPM_COUNTER_NUM; i++) {
+        _hpm_set_event(i + HPM_COUNTER_BASE, events[i]);
+    }
+    _write_csr(minstret, 0);
+    _write_csr(minstreth, 0);
+    _write_csr(mhpmcounter3, 0);
+    _write_csr(mhpmcounter3h, 0);
+    _write_csr(mhpmcounter4, 0);
+    _write_csr(mhpmcounter4h, 0);
+    _write_csr(mhpmcounter5, 0);
+    _write_csr(mhpmcounter5h, 0);
+    _write_csr(mhpmcounter6, 0);
+    _write_csr(mhpmcounter6h, 0);
+    _write_csr(mhpmcounter7, 0);
+    _write_csr(mhpmcounter7h, 0);
+    _write_csr(mhpmcounter8, 0);
+    _write_csr(mhpmcounter8h, 0);
+    asm volatile ("csrs mcountinhibit, %0" :: "r"(HPM_MCOUNTINHIBIT_CY | HPM_MCOUNTINHIBIT_IR | HPM_MCOUNTINHIBIT_HPM));
+}
+
+/**
+ * Take a snapshot of mcycle, minstret and all the counters
+ */
+void _hpm_sample(hpm_sample_t *sample) {
+    uint32_t i;
+    sample->cycle   = _read_csr64(mcycle);
+    sample->instret = _read_csr64(minstret);
+    for (i = 0; i < HPM_COUNTER_NUM; i++) {
+        sample->event[i] = _hpm_get_event(i + HPM_COUNTER_BASE);
+        sample->count[i] = _hpm_read(i + HPM_COUNTER_BASE);
+    }
+}
+
+/**
+ * end = end - start
+ */
+void _hpm_diff(hpm_sample_t *end, const hpm_sample_t *start) {
+    uint32_t i;
+    end->cycle   -= start->cycle;
+    end->instret -= start->instret;
+    for (i = 0; i < HPM_COUNTER_NUM; i++) {
+        end->count[i] -= start->count[i];
+    }
+}
+
+/** Convert a 64 bits value to decimal string, newlib nano printf does not support %llu */
+static char *u64_to_str(uint64_t value, char *buf) {
+    char *p = buf + 21;
+    *--p = 0;
+    do {
+        *--p = '0' + (value % 10);
+        value /= 10;
+    } while (value);
+    return p;
+}
+
+/**
+ * Print the sample, one line per counter:
+ *   HPM <name> <event> <count>
+ */
+void _hpm_dump(const char *name, const hpm_sample_t *sample) {
+    char buf[21];
+    uint32_t i;
+    printf("HPM %s cycle %s\n", name, u64_to_str(sample->cycle, buf));
+    printf("HPM %s instret %s\n", name, u64_to_str(sample->instret, buf));
+    for (i = 0; i < HPM_COUNTER_NUM; i++) {
+        if (sample->event[i] != HPM_EVENT_NONE && sample->event[i] < HPM_EVENT_NUM) {
+            printf("HPM %s %s %s\n", name, hpm_event_name[sample->event[i]], u64_to_str(sample->count[i], buf));
+        }
+    }
+}
@@ -0,0 +1,74 @@
+///////////////////////////////////////////////////////////////////////////////////////////////////
+//
+// Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+//
+// Author: Heqing Huang
+// Date Created: 10/17/2026
+//
+// ================== Description ==================
+//
+// Hardware performance monitor (mhpmcounter/mhpmevent)
+//
+// Usage:
+//   hpm_sample_t start, end;
+//   _hpm_init(events);
+//   _hpm_sample(&start);
+//   ... code to measure ...
+//   _hpm_sample(&end);
+//   _hpm_diff(&end, &start);
+//   _hpm_dump("name", &end);
+//
+// The dump can be turned into a CPI stack by sdk/tools/cpi_stack.py
+//
+///////////////////////////////////////////////////////////////////////////////////////////////////
+
+#ifndef __HPM_H__
+#define __HPM_H__
+
+#include <stdint.h>
+
+// Event of mhpmevent, same as HpmEvent in Define.scala
+#define HPM_EVENT_NONE          0
+#define HPM_EVENT_BRANCH        1
+#define HPM_EVENT_BRANCH_GOOD   2
+#define HPM_EVENT_BRANCH_MISS   3
+#define HPM_EVENT_LOAD_USE      4
+#define HPM_EVENT_CSR_DEP       5
+#define HPM_EVENT_MUL_BUSY      6
+#define HPM_EVENT_DIV_BUSY      7
+#define HPM_EVENT_IBUS_WAIT     8
+#define HPM_EVENT_DBUS_WAIT     9
+#define HPM_EVENT_DCACHE_MISS   10
+#define HPM_EVENT_TRAP          11
+#define HPM_EVENT_NUM           12
+
+// Number of mhpmcounter starting from mhpmcounter3, same as CsrCfg.MHPMC_NUM
+#define HPM_COUNTER_NUM         6
+#define HPM_COUNTER_BASE        3
+
+// mcountinhibit is an enable register in AppleRISCV: 1 = count
+#define HPM_MCOUNTINHIBIT_CY    0x1
+#define HPM_MCOUNTINHIBIT_IR    0x4
+#define HPM_MCOUNTINHIBIT_HPM   (((1 << HPM_COUNTER_NUM) - 1) << HPM_COUNTER_BASE)
+
+/** Events selected for a CPI stack: stall cycles of each kind and the mispredicted branch */
+#define HPM_CPI_EVENTS { \
+    HPM_EVENT_BRANCH_MISS, HPM_EVENT_LOAD_USE, HPM_EVENT_MUL_BUSY, \
+    HPM_EVENT_DIV_BUSY,    HPM_EVENT_IBUS_WAIT, HPM_EVENT_DBUS_WAIT }
+
+typedef struct {
+    uint64_t cycle;
+    uint64_t instret;
+    uint32_t event[HPM_COUNTER_NUM];
+    uint64_t count[HPM_COUNTER_NUM];
+} hpm_sample_t;
+
+void     _hpm_set_event(uint32_t counter, uint32_t event);
+uint32_t _hpm_get_event(uint32_t counter);
+uint64_t _hpm_read(uint32_t counter);
+void     _hpm_init(const uint32_t *events);
+void     _hpm_sample(hpm_sample_t *sample);
+void     _hpm_diff(hpm_sample_t *end, const hpm_sample_t *start);
+void     _hpm_dump(const char *name, const hpm_sample_t *sample);
+
+#endif
@@ -13,9 +13,25 @@
 # Revsion 1: 05/18/2021
 #   Added command line parser
 #
+# Revsion 2: 10/17/2026
+#   Added delta download: only the words changed since the last download are sent.
+#   The last image is cached per board/port.
+#
+# Revsion 3: 10/17/2026
+#   Added packet protocol: baudrate negotiation, CRC-32 protected packets with
+#   ack/nak response and a sliding window of outstanding packets.
+#   Fall back to the raw word stream if the board does not respond to ping.
+#
+# Revsion 4: 10/17/2026
+#   Delta download checks the CRC-32 of the ram on the board against the cached image
+#   and falls back to the full download if they are different.
+#
 ##################################################################
 
+import os
 import sys
+import time
+import zlib
 import argparse
 import serial
 from serial.tools.list_ports import comports
@@ -25,74 +41,237 @@ PORT_NAME = {
     "de2" : "USB-Serial Controller"
 }
 
+# SoC clock frequency, used to compute the clock divider of the uart debug module
+CLK_FREQ = {
+    "arty": 50000000,
+    "de2" : 27000000
+}
+
+
+START = b'\xFF\xFF\xFF\xFF'
+STOP  = b'\xFE\xFF\xFF\xFF'
+BAUD  = b'\xFC\xFF\xFF\xFF'
+PING  = b'\xFB\xFF\xFF\xFF'
+PACKET = b'\xFA\xFF\xFF\xFF'
+CHECKSUM = b'\xF9\xFF\xFF\xFF'
+
+# Response of the uart debug module: code, sequence number
+ACK = 0x06
+NAK = 0x15
+# Oversampling of the uart debug module
+RX_SAMPLE_PER_BIT = 8
+# The uart debug module drops a partial packet and goes back to the initial baudrate after
+# the line is idle for this long (2^20 clock cycles)
+RX_IDLE_TIME = 0.05
+# Time for the board to switch the baudrate after the ack of the baud command is received,
+# must be shorter than the idle time
+BAUD_SWITCH_TIME = 0.001
+MAX_RETRY = 8
+# Maximum number of words in a packet, the uart debug module buffers the packet
+PACKET_WORDS = 64
+
+# Directory holding the last image downloaded to each board
+CACHE_DIR = os.path.expanduser('~/.cache/apple-riscv')
+# Unchanged words between two changed ranges smaller than the packet overhead
+# (command, sequence number, address, count, CRC) are sent instead of starting a new block
+BLOCK_GAP = 5
 
 class UartDownload:
 
-    def __init__(self, size, port, file, baudrate=115200):
+    def __init__(self, size, port, file, baudrate=115200, board='', delta=False,
+                 targetBaud=0, window=4, packetWords=64):
         """
             @param size: instruction rom size in KB
             @param baudrate: uart baudrate
+            @param delta: only download the words changed since the last download
+            @param targetBaud: baudrate to switch to for the download, 0 to keep the baudrate
+            @param window: number of packets sent without waiting for the ack
+            @param packetWords: number of words in each packet
         """
         self.baudrate = baudrate
+        self.clk = CLK_FREQ.get(board, CLK_FREQ["arty"])
+        self.targetBaud = targetBaud
+        self.window = window
+        if not 0 < packetWords <= PACKET_WORDS:
+            raise ValueError(f"The packet size must be 1 to {PACKET_WORDS} words")
+        self.packetWords = packetWords
         self.port = port
+        self.delta = delta
+        self.cacheFile = f"{CACHE_DIR}/{board}_{os.path.basename(str(port))}.bin"
         self.file = file
         self.size = size * 1024
         self.base = 0x20000000
-        self.ram = []
+        # The start/stop marker are framed around the image in the same buffer
+        # so the data stream is built without any copy.
+        self.buffer = bytearray(len(START) + self.size + len(STOP))
+        self.image = memoryview(self.buffer)[len(START):len(START)+self.size]
+        self.end = 0
+        self.ram = memoryview(self.buffer)[:0]
 
     def readVerilogMem(self, base):
         """
             Function to read verilog memory file and convert it into actual instruction stream
 
-            @param size: number of word in the final ram
-            @return: return the ram data sequentially in byte
-        """
-
-        def readFromLine(line, ram, addr):
-            data = line.split(" ")
-            for byte in data:
-                ram[addr] = int(byte ,16)
-                addr += 1
-            return addr
+            Data outside of the rom address range is ignored.
 
-        self.ram = [ 0 for _ in range(self.size)]
+            @param base: base address of the rom
+            @return: number of bytes populated in the rom, rounded up to a word
+        """
+        image = self.image
         addr = 0
-
-        f = open(self.file)
-        for line in f.readlines():
-            line = line.rstrip()
-            if line.find('@') != -1: # this is address line
-                addr = int(line[1:], 16) - base
-            else:
-                addr = readFromLine(line, self.ram, addr)
-                if (addr == self.size):
-                    f.close()
-        f.close()
+        end = 0
+        with open(self.file) as f:
+            for line in f:
+                if line[0] == '@': # this is address line
+                    addr = int(line[1:], 16) - base
+                    continue
+                data = bytes.fromhex(line)
+                if 0 <= addr and addr + len(data) <= self.size:
+                    image[addr:addr+len(data)] = data
+                    end = max(end, addr + len(data))
+                addr += len(data)
+        self.end = (end + 3) & ~3
+        return self.end
 
     def addStartStop(self):
         """ Add start and stop signal to the bit stream """
-        self.ram.insert(0, 0xFF)
-        self.ram.insert(0, 0xFF)
-        self.ram.insert(0, 0xFF)
-        self.ram.insert(0, 0xFF)
-        self.ram.append(0xFE)
-        self.ram.append(0xFF)
-        self.ram.append(0xFF)
-        self.ram.append(0xFF)
-
-    def printRam(self):
-        for byte in self.ram:
-            print(byte, end='')
+        start = len(START)
+        self.buffer[:start] = START
+        self.buffer[start+self.end:start+self.end+len(STOP)] = STOP
+        # only the populated address range is sent
+        self.ram = memoryview(self.buffer)[:start+self.end+len(STOP)]
 
     def createData(self):
         """ create data stream from verilog memory file """
         self.readVerilogMem(self.base)
         self.addStartStop()
-        #self.printRam()
+        #self.printRam(len(self.ram))
+
+    def readCache(self):
+        """ @return: the last image downloaded to the board or None """
+        if not os.path.isfile(self.cacheFile):
+            return None
+        with open(self.cacheFile, 'rb') as f:
+            return f.read()
+
+    def writeCache(self):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(self.cacheFile, 'wb') as f:
+            f.write(self.image[:self.end])
+
+    def changedBlocks(self, prev):
+        """ Compare the image with the previous image
+
+            @return: list of (offset, size) in byte of the changed ranges
+        """
+        image = self.image
+        blocks = []
+        start = None
+        last = None
+        for addr in range(0, self.end, 4):
+            if image[addr:addr+4] == prev[addr:addr+4]:
+                continue
+            if start is not None and addr - last <= BLOCK_GAP * 4:
+                last = addr + 4
+                continue
+            if start is not None:
+                blocks.append((start, last - start))
+            start, last = addr, addr + 4
+        if start is not None:
+            blocks.append((start, last - start))
+        return blocks
 
     def setupUart(self):
         """ Setup uart port """
-        self.serPort = serial.Serial(self.port, self.baudrate)
+        self.serPort = serial.Serial(self.port, self.baudrate, timeout=RX_IDLE_TIME)
+
+    def setTimeout(self):
+        """ Wait long enough for the whole window to be transmitted before timing out """
+        packetBytes = (self.packetWords + 5) * 4 + 2
+        self.serPort.timeout = 2 * self.window * packetBytes * 10 / self.serPort.baudrate + RX_IDLE_TIME
+
+    def readResponse(self):
+        """ @return: (code, sequence number) or None on timeout """
+        resp = self.serPort.read(2)
+        if len(resp) < 2:
+            return None
+        return resp[0], resp[1]
+
+    def ping(self):
+        """ Check if the board supports the packet protocol """
+        self.serPort.reset_input_buffer()
+        self.serPort.write(PING)
+        return self.readResponse() == (ACK, 0)
+
+    def setBaud(self):
+        """ Switch the board and the host to the target baudrate """
+        if not self.targetBaud or self.targetBaud == self.baudrate:
+            return
+        # the uart of the board runs at clk / RX_SAMPLE_PER_BIT / (divider + 1)
+        divider = min(max(round(self.clk / RX_SAMPLE_PER_BIT / self.targetBaud) - 1, 1), 255)
+        baudrate = round(self.clk / RX_SAMPLE_PER_BIT / (divider + 1))
+        self.serPort.write(BAUD + divider.to_bytes(4, 'little'))
+        if self.readResponse() != (ACK, divider):
+            raise RuntimeError("Board did not acknowledge the baud command")
+        # the board switches the baudrate after the ack is sent
+        time.sleep(BAUD_SWITCH_TIME)
+        self.serPort.baudrate = baudrate
+        if not self.ping():
+            raise RuntimeError(f"Board does not respond at baudrate {baudrate}")
+        print(f"Switched to baudrate {baudrate}")
+
+    def checksum(self, size):
+        """ @return: CRC-32 of the first size bytes of the ram on the board or None on timeout """
+        self.serPort.reset_input_buffer()
+        self.serPort.write(CHECKSUM + self.base.to_bytes(4, 'little') + (size // 4).to_bytes(4, 'little'))
+        resp = self.serPort.read(6)
+        if len(resp) < 6 or resp[0] != ACK:
+            return None
+        return int.from_bytes(resp[2:], 'little')
+
+    def createPacket(self, seq, offset, size):
+        """ create a packet: command, sequence number, address, word count, data, CRC """
+        body = bytearray(seq.to_bytes(4, 'little'))
+        body += (self.base + offset).to_bytes(4, 'little')
+        body += (size // 4).to_bytes(4, 'little')
+        body += self.image[offset:offset+size]
+        return PACKET + body + zlib.crc32(body).to_bytes(4, 'little')
+
+    def writePackets(self, blocks):
+        """ Send the blocks as packets, keeping up to window packets outstanding """
+        step = self.packetWords * 4
+        chunks = [(offset + i, min(step, size - i)) for offset, size in blocks for i in range(0, size, step)]
+        chunks.reverse()
+        pending = {}
+        retry = 0
+        seq = 0
+        self.setTimeout()
+        while chunks or pending:
+            while chunks and len(pending) < self.window:
+                packet = self.createPacket(seq, *chunks.pop())
+                pending[seq] = packet
+                self.serPort.write(packet)
+                seq = (seq + 1) & 0xFF
+            resp = self.readResponse()
+            if resp is None or resp[0] == NAK:
+                retry += 1
+                if retry > MAX_RETRY:
+                    raise RuntimeError("Too many retries, download failed")
+            if resp is None:
+                # lost byte: let the board drop the partial packet, it is then back to the
+                # initial baudrate, so switch the baudrate again and resend everything
+                time.sleep(RX_IDLE_TIME)
+                self.serPort.baudrate = self.baudrate
+                self.serPort.reset_input_buffer()
+                self.setBaud()
+                self.setTimeout()
+                for packet in pending.values():
+                    self.serPort.write(packet)
+            elif resp[0] == NAK and resp[1] in pending:
+                self.serPort.write(pending[resp[1]])
+            elif resp[0] == ACK:
+                pending.pop(resp[1], None)
+        print(f"write {len(blocks)} blocks with packet protocol, {retry} retries")
 
     def writeRam(self):
         num = self.serPort.write(self.ram)
@@ -104,14 +283,37 @@ class UartDownload:
 
     def all(self):
         self.createData()
+        prev = self.readCache() if self.delta else None
+        if prev is None and self.delta:
+            print("No cached image for this board, fall back to full download")
         self.setupUart()
-        self.writeRam()
+        self.serPort.write(START)
+        if self.ping():
+            self.setBaud()
+            if prev is not None and self.checksum(len(prev)) != zlib.crc32(prev):
+                # the board was reprogrammed or power cycled since the last download
+                print("The board does not hold the cached image, fall back to full download")
+                prev = None
+            self.writePackets(self.changedBlocks(prev) if prev is not None else [(0, self.end)])
+            self.serPort.write(STOP)
+            self.serPort.flush()
+        else:
+            # The board does not support the packet protocol and wrote the ping as data,
+            # restart and use the raw word stream to download the whole image.
+            print("Board does not support the packet protocol, use the raw word stream")
+            self.serPort.write(STOP)
+            self.writeRam()
+        self.writeCache()
 
 def cmdParser():
     parser = argparse.ArgumentParser(description='Upload Instruction ROM through Uart')
     parser.add_argument('-size', '-s', type=int, required=True, nargs='?', help='Size of the Instruction ROM in KByte')
     parser.add_argument('-file', '-f', type=str, required=True, nargs='?', help='The Instruction ROM file')
     parser.add_argument('-board', '-b',  type=str, required=True, nargs='?', help='The FPGA board')
+    parser.add_argument('-delta', '-d',  type=int, default=0, nargs='?', help='Only download the change since the last download')
+    parser.add_argument('-baud', type=int, default=0, nargs='?', help='Baudrate used for the download, e.g. 2000000')
+    parser.add_argument('-window', '-w', type=int, default=4, nargs='?', help='Number of outstanding packets')
+    parser.add_argument('-packet', '-p', type=int, default=64, nargs='?', help='Number of words in each packet')
     return parser.parse_args()
 
 def getComport(board):
@@ -130,5 +332,6 @@ if __name__ == "__main__":
     file = args.file
     board = args.board
     port = getComport(board)
-    uartDownload = UartDownload(size, port, file)
+    uartDownload = UartDownload(size, port, file, board=board, delta=args.delta == 1,
+                                targetBaud=args.baud, window=args.window, packetWords=args.packet)
     uartDownload.all()
\ No newline at end of file
@@ -0,0 +1,146 @@
+#!/usr/bin/python3
+###################################################################
+#
+# Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+#
+# Author: Heqing Huang
+# Date Created: 10/17/2026
+#
+# ================== Description ==================
+#
+# Build a CPI stack from the hardware performance counter dump
+#
+# The software prints the counters with _hpm_dump (sdk/common/driver/platform/hpm.c):
+#   HPM <name> cycle <count>
+#   HPM <name> instret <count>
+#   HPM <name> <event> <count>
+# The log can be the uart output of the board or the simulation. Dumps with the same name
+# are merged so the counters can be read in several runs with different events: cycle,
+# instret and the events of the first dump are kept, the events only found in a later dump
+# are scaled to the instret of the first dump. An event repeated in a later dump is ignored
+# with a warning.
+#
+# The base CPI is 1 cycle per instruction. The stall events count cycles, the mispredicted
+# branch and the trap count events and are multiplied by their penalty. The residual is
+# reported as "other".
+#
+#   python3 cpi_stack.py uart.log -name coremark
+#
+##################################################################
+
+import sys
+import json
+import argparse
+
+# Events counting stall cycles, see HpmEvent in Define.scala
+STALL_EVENTS = ('load_use', 'csr_dep', 'mul_busy', 'div_busy', 'ibus_wait', 'dbus_wait')
+# Events counting occurrence: default penalty in cycles
+PENALTY_EVENTS = {
+    'branch_miss': 2,   # IF and ID stage are flushed
+    'trap': 3,          # pipeline flush and jump to mtvec
+}
+
+def parse_log(lines):
+    """ Parse the HPM lines of the log
+
+        @return: dict of name -> list of {key: count}, a new dump starts at each cycle line
+    """
+    dumps = {}
+    for line in lines:
+        fields = line.split()
+        if len(fields) != 4 or fields[0] != 'HPM':
+            continue
+        _, name, key, value = fields
+        try:
+            value = int(value)
+        except ValueError:
+            continue
+        if key == 'cycle' or name not in dumps:
+            dumps.setdefault(name, []).append({})
+        dumps[name][-1][key] = value
+    return dumps
+
+def merge(dumps, name=''):
+    """ Merge several dumps of the same code
+
+        The new events of each dump are scaled to the instruction count of the first dump so the
+        event rate per instruction is kept. cycle, instret and the events already found in a
+        previous dump are taken from that dump.
+    """
+    result = dict(dumps[0])
+    instret = result.get('instret', 0)
+    for idx, dump in enumerate(dumps[1:], 2):
+        scale = instret / dump['instret'] if dump.get('instret') else 1
+        for key, value in dump.items():
+            if key in ('cycle', 'instret'):
+                continue
+            if key in result:
+                print(f"Warning: {name} dump {idx} repeats {key}, the value of the first dump is used",
+                      file=sys.stderr)
+                continue
+            result[key] = round(value * scale)
+    return result
+
+def cpi_stack(counters, penalty=PENALTY_EVENTS):
+    """ Split the cycles into the CPI components
+
+        @return: list of (component, cycles)
+    """
+    cycle = counters.get('cycle', 0)
+    instret = counters.get('instret', 0)
+    stack = [('base', instret)]
+    for event in STALL_EVENTS:
+        if event in counters:
+            stack.append((event, counters[event]))
+    for event, cycles in penalty.items():
+        if event in counters:
+            stack.append((event, counters[event] * cycles))
+    stack.append(('other', cycle - sum(c for _, c in stack)))
+    return stack
+
+def print_stack(name, counters, stack, file=sys.stdout):
+    cycle = counters.get('cycle', 0)
+    instret = counters.get('instret', 0)
+    cpi = cycle / instret if instret else 0
+    print(f"{name}: {cycle} cycles, {instret} instructions, CPI {cpi:.3f}", file=file)
+    print(f"  {'component':<12} {'cycles':>12} {'CPI':>8} {'%':>7}", file=file)
+    for component, cycles in stack:
+        print(f"  {component:<12} {cycles:>12} {cycles / instret if instret else 0:>8.3f} "
+              f"{cycles / cycle if cycle else 0:>7.2%}", file=file)
+
+#####################################
+# Main Program
+#####################################
+
+def cmdParser():
+    parser = argparse.ArgumentParser(description='Build a CPI stack from the hardware performance counter dump')
+    parser.add_argument('log', type=str, nargs='?', default='-', help='The log file, default to stdin')
+    parser.add_argument('-name', type=str, default=None, help='Only report this dump')
+    parser.add_argument('-branch_penalty', type=int, default=PENALTY_EVENTS['branch_miss'],
+                        help='Cycles lost on a mispredicted branch')
+    parser.add_argument('-trap_penalty', type=int, default=PENALTY_EVENTS['trap'],
+                        help='Cycles lost on a trap')
+    parser.add_argument('-json', type=str, default=None, help='Write the CPI stack as json')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = cmdParser()
+    if args.log == '-':
+        dumps = parse_log(sys.stdin)
+    else:
+        with open(args.log, errors='replace') as f:
+            dumps = parse_log(f)
+    if args.name:
+        dumps = {args.name: dumps[args.name]} if args.name in dumps else {}
+    if not dumps:
+        sys.exit("No HPM dump found")
+    penalty = {'branch_miss': args.branch_penalty, 'trap': args.trap_penalty}
+    result = {}
+    for name, runs in dumps.items():
+        counters = merge(runs, name)
+        stack = cpi_stack(counters, penalty)
+        print_stack(name, counters, stack)
+        result[name] = {'counters': counters, 'stack': dict(stack)}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
@@ -32,6 +32,7 @@ case class AppleRISCVIO() extends Bundle {
     val timer_interrupt     = in Bool
     val software_interrupt  = in Bool
     val debug_interrupt     = in Bool
+    val dcache_miss         = in Bool   // performance monitor event from the data cache
 }
 
 case class AppleRISCV() extends Component {
@@ -345,8 +346,6 @@ case class AppleRISCV() extends Component {
         mcsr_inst.io.csr_bus.addr  := ex2mem.csr_idx.asUInt
         mcsr_inst.io.csr_bus.wtype := ex2mem.csr_sel
         mcsr_inst.io.csr_bus.wen   := ex2mem.csr_wr & mem_stage_valid
-        mcsr_inst.io.inc_br_cnt    := branch_unit_inst.io.is_branch_instr
-        mcsr_inst.io.inc_pred_good := branch_unit_inst.io.is_branch_instr & ~branch_unit_inst.io.take_branch
 
         mcsr_inst.io.mtrap_enter  := trap_ctrl_inst.io.mtrap_enter
         mcsr_inst.io.mtrap_exit   := trap_ctrl_inst.io.mtrap_exit
@@ -501,6 +500,36 @@ case class AppleRISCV() extends Component {
         ex2mem_pipe_stall := ex2mem_stall
         mem2wb_pipe_stall := mem2wb_stall
     }
+
+    // Performance Monitor Event
+    val HPM = new Area {
+        val events = Bits(HpmEvent.NUM bits)
+        events := 0
+        val is_branch_instr = branch_unit_inst.io.is_branch_instr
+        events(HpmEvent.BRANCH)      := is_branch_instr
+        events(HpmEvent.BRANCH_GOOD) := is_branch_instr & ~branch_unit_inst.io.take_branch
+        events(HpmEvent.BRANCH_MISS) := is_branch_instr & branch_unit_inst.io.take_branch
+        events(HpmEvent.DCACHE_MISS) := io.dcache_miss
+        events(HpmEvent.TRAP)        := trap_ctrl_inst.io.mtrap_enter
+
+        // Stall cycle, each cycle is counted by one event only
+        val mul_stall  = if (AppleRISCVCfg.USE_RV32M) mul_inst.io.mul_stall_req else False
+        val div_stall  = if (AppleRISCVCfg.USE_RV32M) div_inst.io.div_stall_req else False
+        val dbus_wait  = lsu_inst.io.lsu_wait_data | lsu_inst.io.lsu_wait_dbus
+        val mul_busy   = ~dbus_wait & mul_stall
+        val div_busy   = ~dbus_wait & ~mul_stall & div_stall
+        val load_use   = ~dbus_wait & ~HDU.muldiv_stall_req & HDU.id_stall_on_load_dep
+        val csr_dep    = ~dbus_wait & ~HDU.muldiv_stall_req & ~HDU.id_stall_on_load_dep & HDU.id_stall_on_csr_dep
+        val ibus_wait  = ~dbus_wait & ~HDU.muldiv_stall_req & ~HDU.id_stall_on_load_dep & ~HDU.id_stall_on_csr_dep &
+                         ifu_inst.io.ifu_wait_ibus
+        events(HpmEvent.DBUS_WAIT)   := dbus_wait
+        events(HpmEvent.MUL_BUSY)    := mul_busy
+        events(HpmEvent.DIV_BUSY)    := div_busy
+        events(HpmEvent.LOAD_USE)    := load_use
+        events(HpmEvent.CSR_DEP)     := csr_dep
+        events(HpmEvent.IBUS_WAIT)   := ibus_wait
+        mcsr_inst.io.hpm_events      := events
+    }
 }
 
 object AppleRISCVMain {
@@ -59,8 +59,7 @@ object CsrCfg {
     // Machine Counter/Timers
     val USE_MCYCLE      = true
     val USE_MINSTRET    = true
-    var USE_MHPMC3      = true
-    var USE_MHPMC4      = true
+    var MHPMC_NUM       = 6     // number of mhpmcounter starting from mhpmcounter3, up to 29
 }
 
 
@@ -163,3 +163,26 @@ object ExcCode {
   val EXC_CODE_M_TIMER_INT    = 7
   val EXC_CODE_M_EXT_INT      = 11
 }
+
+// ==========================================
+// Performance Monitor Event, value of mhpmevent
+// ==========================================
+// The stall events are exclusive: a stall cycle is counted by the first event
+// in the following order: DBUS_WAIT, MUL_BUSY, DIV_BUSY, LOAD_USE, CSR_DEP, IBUS_WAIT
+object HpmEvent {
+  val NONE        = 0   // counter does not count
+  val BRANCH      = 1   // branch and jump instruction
+  val BRANCH_GOOD = 2   // correctly predicted branch and jump instruction
+  val BRANCH_MISS = 3   // mispredicted branch and jump instruction, flushes IF/ID stage
+  val LOAD_USE    = 4   // stall cycle on load-use dependency
+  val CSR_DEP     = 5   // stall cycle on csr read dependency
+  val MUL_BUSY    = 6   // stall cycle waiting for the multiplier
+  val DIV_BUSY    = 7   // stall cycle waiting for the divider
+  val IBUS_WAIT   = 8   // stall cycle waiting for the instruction bus
+  val DBUS_WAIT   = 9   // stall cycle waiting for the data bus, including the data cache miss
+  val DCACHE_MISS = 10  // data cache miss
+  val TRAP        = 11  // exception and interrupt
+
+  val WIDTH       = 4
+  val NUM         = 1 << WIDTH
+}
@@ -16,6 +16,10 @@
 // Some notes about interrupt.
 // 1. mstatus:mpp is always set to 2'b11 since we only support machine mode
 //
+// Performance counter
+// mhpmcounter3 - mhpmcounter(3+MHPMC_NUM-1) count the event selected by the corresponding
+// mhpmevent register. See HpmEvent for the event list.
+//
 ///////////////////////////////////////////////////////////////////////////////////////////////////
 
 package AppleRISCV
@@ -50,8 +54,7 @@ case class MCSRIO() extends Bundle {
 
   // performance counter
   val inc_minstret  = in Bool
-  val inc_br_cnt    = in Bool
-  val inc_pred_good = in Bool
+  val hpm_events    = in Bits(HpmEvent.NUM bits)
 }
 
 case class MCSR() extends Component {
@@ -160,22 +163,18 @@ case class MCSR() extends Component {
     when(mcountinhbit.ir & io.inc_minstret) {cnt := cnt + 1}
   } else null
 
-  val mhpmcounter3 = if (CsrCfg.USE_MHPMC3) new Area {
-    // count number of branch instruction
-    val cnt  = Reg(UInt(64 bits)) init 0
-    busCtrl.readAndWrite(cnt(MXLEN-1 downto 0), 0xB03, 0, "Machine performance-monitoring counter.")
-    busCtrl.readAndWrite(cnt(63 downto MXLEN) , 0xB83, 0, "Upper 32 bits of mhpmcounter3, RV32I only.")
-    when(mcountinhbit.hpm(0) & io.inc_br_cnt) {cnt := cnt + 1}
-
-  } else null
-
-  val mhpmcounter4 = if (CsrCfg.USE_MHPMC4) new Area {
-    // count number of correct predicted instruction
-    val cnt  = Reg(UInt(64 bits)) init 0
-    busCtrl.readAndWrite(cnt(MXLEN-1 downto 0), 0xB04, 0, "Machine performance-monitoring counter.")
-    busCtrl.readAndWrite(cnt(63 downto MXLEN) , 0xB84, 0, "Upper 32 bits of mhpmcounter4, RV32I only.")
-    when(mcountinhbit.hpm(1) & io.inc_pred_good) {cnt := cnt + 1}
-  } else null
+  require(CsrCfg.MHPMC_NUM <= 29)
+  val mhpmcounter = for (i <- 0 until CsrCfg.MHPMC_NUM) yield new Area {
+    val idx   = i + 3
+    // mhpmcounter3 and mhpmcounter4 count branch and correct predicted branch by default
+    val resetEvent = if (idx == 3) HpmEvent.BRANCH else if (idx == 4) HpmEvent.BRANCH_GOOD else HpmEvent.NONE
+    val event = busCtrl.createReadAndWrite(UInt(HpmEvent.WIDTH bits), 0x320 + idx, 0,
+      s"Machine performance-monitoring event selector $idx.") init resetEvent
+    val cnt   = Reg(UInt(64 bits)) init 0
+    busCtrl.readAndWrite(cnt(MXLEN-1 downto 0), 0xB00 + idx, 0, "Machine performance-monitoring counter.")
+    busCtrl.readAndWrite(cnt(63 downto MXLEN) , 0xB80 + idx, 0, s"Upper 32 bits of mhpmcounter$idx, RV32I only.")
+    when(mcountinhbit.hpm(i) & io.hpm_events(event)) {cnt := cnt + 1}
+  }
 
   // ============================================
   // Trap related Logic
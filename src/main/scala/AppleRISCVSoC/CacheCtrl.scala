@@ -29,6 +29,7 @@ case class CacheCtrl(ahbLite3Cfg: AhbLite3Config, cacheConfig: CacheConfig,
   val io = new Bundle {
     val in_ahb  = slave(AhbLite3Master(ahbLite3Cfg))
     val out_ahb = master(AhbLite3Master(ahbLite3Cfg))
+    val miss    = out Bool
   }
 
   // Bypass the cache if we are not access main memory
@@ -38,6 +39,7 @@ case class CacheCtrl(ahbLite3Cfg: AhbLite3Config, cacheConfig: CacheConfig,
   val cache = Ahblite3Cache(cacheConfig)
   cache.io.cache_ahb <> io.in_ahb.toAhbLite3()
   cache.io.mem_ahb   <> io.out_ahb
+  io.miss := cache.io.miss
   when(bypass) {
     cache.io.cache_ahb.HSEL   := False
     cache.io.cache_ahb.HTRANS := 0
@@ -82,8 +82,10 @@ case class De2SoC(
         if (SoCCfg.USE_CACHE) {
             cacheCtrl.io.in_ahb <> cpu_rst_area.core.io.dbus_ahb
             ahblite3corssbar.io.dbus_ahb <> cacheCtrl.io.out_ahb
+            cpu_rst_area.core.io.dcache_miss := cacheCtrl.io.miss
         } else {
             ahblite3corssbar.io.dbus_ahb <> cpu_rst_area.core.io.dbus_ahb
+            cpu_rst_area.core.io.dcache_miss := False
         }
         imem.io.port1 <> ahblite3corssbar.io.imem_ahb.remapAddress(addr => addr.resize(imem.ahblite3Cfg.addressWidth))
         sramCtrlBridge.io.ahb_in <> ahblite3corssbar.io.dmem_ahb.remapAddress(addr => addr.resize(sramCtrl.ahblite3Cfg.addressWidth))
@@ -96,6 +98,7 @@ case class De2SoC(
             cpu_rst = cpu_rst,
             uart_en = ~uartdbg.io.downloading,
             uartdbgrst_req = uartdbg.io.downloading,
+            uartdbg_txd = uartdbg.io.uart.txd,
             external_interrupt = cpu_rst_area.core.io.external_interrupt,
             timer_interrupt = cpu_rst_area.core.io.timer_interrupt,
             software_interrupt = cpu_rst_area.core.io.software_interrupt,
@@ -109,16 +112,18 @@ case class De2SoC(
 
 object De2SoCMain{
     def main(args: Array[String]) {
+        // Pass "sim" to generate De2SoC_sim.v for simulation only: uart0 does not shift out the data
+        val sim = args.contains("sim")
         // FIXME
-        if (args.length > 0) {
+        if (args.length > 0 && !sim) {
             //AddrMapping.INSTR_RAM_ADDR_WIDTH = args(0).toInt
             println("Generate with INSTR_RAM_ADDR_WIDTH = " + args(0))
         }
         AppleRISCVCfg.USE_RV32M    = true
         AppleRISCVCfg.USE_BPU      = false
-        CsrCfg.USE_MHPMC3          = true
-        CsrCfg.USE_MHPMC4          = true
+        CsrCfg.MHPMC_NUM           = 6
         SoCCfg.USE_CACHE           = true
-        SpinalVerilog(InOutWrapper(De2SoC()))
+        SoCCfg.UART_SIM_FAST       = sim
+        SpinalConfig(netlistFileName = if (sim) "De2SoC_sim.v" else "De2SoC.v").generateVerilog(InOutWrapper(De2SoC()))
     }
 }
\ No newline at end of file
@@ -43,6 +43,7 @@ object SoCCfg {
     CacheConfig(ahbLite3Cfg, CACHE_LINE_SIZE, CACHE_SET_NUM, CACHE_SET_SIZE, CACHE_RAM_TYPE, CACHE_REPLACE)
 
   var USE_UART0 = true
+  var UART_SIM_FAST = false // simulation only: uart0 does not shift out the transmit data
   var USE_GPIO = true
   var USE_PWM0 = true
 }
@@ -88,6 +89,7 @@ case class Ahblite3crossbar(cfg: AhbLite3Config) extends Component {
 case class Peripherals(cpu_rst: Bool,
                        uart_en: Bool,
                        uartdbgrst_req: Bool,
+                       uartdbg_txd: Bool,
                        external_interrupt: Bool,
                        timer_interrupt: Bool,
                        software_interrupt: Bool,
@@ -125,10 +127,13 @@ case class Peripherals(cpu_rst: Bool,
 
   // UART0
   if (SoCCfg.USE_UART0) {
-    val uart0 = ApbUart(ApbCfg.uart0ApbCfg())
+    val uart0 = ApbUart(ApbCfg.uart0ApbCfg(), SoCCfg.UART_SIM_FAST)
+    uart0.setName("uart0") // accessed by the testbench
     apbDecList.append((uart0.io.apb, SoCAddrMapping.UART0.sizeMapping()))
     uart0.io.en := uart_en
-    uart0.io.uart <> _uart0
+    uart0.io.uart.rxd := _uart0.rxd
+    // the uart debug module sends its response through the tx port while downloading
+    _uart0.txd := Mux(uartdbgrst_req, uartdbg_txd, uart0.io.uart.txd)
     val uart_irq = uart0.io.rxwm | uart0.io.txwm
     plic.io.plic_irq_in(uart0_irq_base) := uart_irq
   }
@@ -71,8 +71,7 @@ object ArtyA7_topMain{
     // CPU Configuration
     AppleRISCVCfg.USE_RV32M   = true
     AppleRISCVCfg.USE_BPU     = true
-    CsrCfg.USE_MHPMC3         = true
-    CsrCfg.USE_MHPMC4         = true
+    CsrCfg.MHPMC_NUM          = 6
     SoCCfg.USE_CACHE          = true
     SpinalVerilog(InOutWrapper(ArtyA7_top()))
   }
@@ -95,8 +95,7 @@ object De2_topMain{
     // CPU Configuration
     AppleRISCVCfg.USE_RV32M   = true
     AppleRISCVCfg.USE_BPU     = true
-    CsrCfg.USE_MHPMC3         = true
-    CsrCfg.USE_MHPMC4         = true
+    CsrCfg.MHPMC_NUM          = 6
     SpinalVerilog(InOutWrapper(De2_top()))
   }
 }
\ No newline at end of file
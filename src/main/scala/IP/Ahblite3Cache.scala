@@ -237,6 +237,7 @@ case class Ahblite3Cache(cacheConfig: CacheConfig) extends Component {
   val io = new Bundle {
     val cache_ahb = slave(AhbLite3(cacheConfig.ahblite3Cfg))
     val mem_ahb   = master(AhbLite3Master(cacheConfig.ahblite3Cfg))
+    val miss      = out Bool    // pulse on each cache miss, for performance monitor
   }
 
   // ----------------------------------------
@@ -339,6 +340,8 @@ case class Ahblite3Cache(cacheConfig: CacheConfig) extends Component {
     io.mem_ahb.HBURST      := 0
     io.mem_ahb.HMASTLOCK   := False
 
+    io.miss                := False
+
     rdataCapture           := memWordCnt === wordIdx_ff
 
     // default port connection for each set
@@ -418,6 +421,7 @@ case class Ahblite3Cache(cacheConfig: CacheConfig) extends Component {
         if (cacheConfig.replacement == "NRU") {setPorts.foreach(x => x.clrnru := x.hit)}
       // Cache Miss - Grab the data from main memory
       }.otherwise{
+        io.miss := io.mem_ahb.HREADY
         when(newSetDirty) { // Flush the dirty cache line to Main Memory
           memAccessOFL(True, addrInc, True)
           when(io.mem_ahb.HREADY) {goto(FLUSH_CACHE)}
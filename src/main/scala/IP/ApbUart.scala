@@ -10,6 +10,7 @@
 // Date Created: 04/22/2021
 // Revision 1: 05/10/2021
 // Revision 2: 05/23/2021
+// Revision 3: 10/17/2026
 //
 // ================== Description ==================
 //
@@ -36,6 +37,11 @@
 // Revision 2:
 //  - Use APB as bus interface
 //
+// Revision 3:
+//  - Add simFastTx option for simulation: the transmit data is dropped instead of shifted out
+//    on the serial line so the transmit FIFO is never full. The testbench captures the
+//    APB write to txdata instead (tests/cocotb/scripts/uart_console.py).
+//
 ///////////////////////////////////////////////////////////////////////////////////////////////////
 
 package IP
@@ -59,7 +65,7 @@ object ApbUartCfg {
   val txFifoDepth = 8
 }
 
-case class ApbUart(apbCfg: Apb3Config) extends Component {
+case class ApbUart(apbCfg: Apb3Config, simFastTx: Boolean = false) extends Component {
 
   noIoPrefix()
 
@@ -77,7 +83,13 @@ case class ApbUart(apbCfg: Apb3Config) extends Component {
   // 0x000    txdata    Transmit data register
   val dataType = Bits(ApbUartCfg.uartCfg.dataWidthMax bits)
   val (tx_data, tx_avail) = busCtrl.createAndDriveFlow(dataType, 0x000, 0).queueWithAvailability(ApbUartCfg.txFifoDepth)
-  tx_data >> uartCtrl.io.write
+  if (simFastTx) {
+    tx_data.ready := True
+    uartCtrl.io.write.valid   := False
+    uartCtrl.io.write.payload := 0
+  } else {
+    tx_data >> uartCtrl.io.write
+  }
   val tx_full = (tx_avail === 0)
   busCtrl.read(tx_full, 0x0000, 31, "Transmit FIFO full")
 
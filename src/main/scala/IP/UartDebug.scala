@@ -9,6 +9,7 @@
 // Author: Heqing Huang
 // Date Created: 05/02/2021
 // Revision 1: 05/23/2021
+// Revision 2: 10/17/2026
 //
 // ================== Description ==================
 //
@@ -18,6 +19,11 @@
 //
 // Revision 1:
 //  - Changed to Ahblite3 bus
+// Revision 2:
+//  - Added addressed block command so only the changed part of the ram is downloaded
+//  - Added packet command protected by CRC-32 with ack/nak response, ping command
+//    and baud command to change the baudrate at runtime
+//  - Added checksum command to read back the CRC-32 of the ram
 //
 ///////////////////////////////////////////////////////////////////////////////////////////////////
 
@@ -36,6 +42,25 @@ import spinal.lib.fsm._
 /**
  * uart debug logic.
  */
+object UartDebug {
+  // Response code sent to the host. Each response is 2 bytes: code, sequence number
+  val ACK = 0x06
+  val NAK = 0x15
+  // Maximum number of data words in a packet. The packet is buffered until its CRC is checked and
+  // written in 2 * PACKET_WORDS cycles, less than the time to receive the next command word.
+  val PACKET_WORDS = 64
+
+  /** CRC-32 (same as zlib) of a 32 bits word, least significant byte first */
+  def crc32(crc: Bits, data: Bits): Bits = {
+    var c = crc
+    for (i <- 0 until 32) {
+      val b = c(0) ^ data(i)
+      c = (c >> 1).resize(32) ^ Mux(b, B"32'hEDB88320", B(0, 32 bits))
+    }
+    c
+  }
+}
+
 case class UartDebug(ahblite3Cfg: AhbLite3Config, baudrate: Int) extends Component {
 
   val io = new Bundle {
@@ -57,18 +82,55 @@ case class UartDebug(ahblite3Cfg: AhbLite3Config, baudrate: Int) extends Compone
 
   val uart = new UartCtrl(uartCfg)
   uart.io.uart <> io.uart
-  // baudrate = Fclk / rxSamplePerBit / clockDivider
-  // clockDivider = Fclk / rxSamplePerBit / baudrate
-  uart.io.config.clockDivider := (clockDomain.frequency.getValue / uartCfg.rxSamplePerBit / baudrate).toInt
+  // UartCtrl reloads its tick counter at 0 so one tick lasts clockDivider + 1 cycles
+  // baudrate = Fclk / rxSamplePerBit / (clockDivider + 1)
+  // clockDivider = Fclk / rxSamplePerBit / baudrate - 1
+  // The clock divider can be changed by the baud command
+  val clockDividerInit = (clockDomain.frequency.getValue / uartCfg.rxSamplePerBit / baudrate).toInt - 1
+  val clockDivider = Reg(UInt(uartCfg.clockDividerWidth bits)) init(clockDividerInit)
+  uart.io.config.clockDivider := clockDivider
   uart.io.config.frame.parity := NONE
   uart.io.config.frame.stop := ONE
   uart.io.config.frame.dataLength := 7
 
   val writeCtrl = new Area {
-    // tie-off the write port as we are only receiving data from uart
-    uart.io.write.valid := False
+    // Response fifo. Low byte is the response code, high byte is the sequence number.
+    val fifo = StreamFifo(Bits(16 bits), 16)
+    val upper = Reg(Bool) init False
+    fifo.io.push.valid := False
+    fifo.io.push.payload := 0
     uart.io.writeBreak := False
-    uart.io.write.payload := 0
+    uart.io.write.valid := fifo.io.pop.valid
+    uart.io.write.payload := Mux(upper, fifo.io.pop.payload(15 downto 8), fifo.io.pop.payload(7 downto 0))
+    fifo.io.pop.ready := uart.io.write.ready & upper
+    when(uart.io.write.fire) {
+      upper := ~upper
+    }
+
+    def send(data: Bits): Unit = {
+      fifo.io.push.valid := True
+      fifo.io.push.payload := data
+    }
+
+    def respond(code: Int, seq: Bits): Unit = {
+      send(seq(7 downto 0) ## B(code, 8 bits))
+    }
+  }
+
+  // Go back to the idle state if no byte is received for a while so the host can resend
+  // the packet after losing a byte. The baudrate also goes back to the initial one so a host
+  // which lost the connection can start over at the initial baudrate.
+  val rxTimeout = new Area {
+    val counter = Reg(UInt(20 bits)) init 0
+    val timeout = counter === counter.maxValue
+    when(uart.io.read.valid) {
+      counter := 0
+    } elsewhen(!timeout) {
+      counter := counter + 1
+    }
+    when(timeout) {
+      clockDivider := clockDividerInit
+    }
   }
 
   val download = new Area {
@@ -94,12 +156,16 @@ case class UartDebug(ahblite3Cfg: AhbLite3Config, baudrate: Int) extends Compone
         when(uart.io.read.valid) {
           readData(15 downto 8) := uart.io.read.payload
           goto(getByte1)
+        } elsewhen(rxTimeout.timeout) {
+          goto(idle)
         }
       }
       getByte1.whenIsActive {
         when(uart.io.read.valid) {
           readData(23 downto 16) := uart.io.read.payload
           goto(getByte2)
+        } elsewhen(rxTimeout.timeout) {
+          goto(idle)
         }
       }
 
@@ -107,6 +173,8 @@ case class UartDebug(ahblite3Cfg: AhbLite3Config, baudrate: Int) extends Compone
         when(uart.io.read.valid) {
           readData(31 downto 24) := uart.io.read.payload
           goto(getByte3)
+        } elsewhen(rxTimeout.timeout) {
+          goto(idle)
         }
       }
 
@@ -118,10 +186,32 @@ case class UartDebug(ahblite3Cfg: AhbLite3Config, baudrate: Int) extends Compone
 
     val startSignal = read4ByteFsm.readData === B"32'hFFFFFFFF"
     val stopSignal = read4ByteFsm.readData === B"32'hFFFFFFFE"
+    val blockSignal = read4ByteFsm.readData === B"32'hFFFFFFFD"
+    val baudSignal = read4ByteFsm.readData === B"32'hFFFFFFFC"
+    val pingSignal = read4ByteFsm.readData === B"32'hFFFFFFFB"
+    val packetSignal = read4ByteFsm.readData === B"32'hFFFFFFFA"
+    val checksumSignal = read4ByteFsm.readData === B"32'hFFFFFFF9"
+    val command = blockSignal | baudSignal | pingSignal | packetSignal | checksumSignal
 
     new StateMachine {
 
       val addr = Reg(UInt(ahblite3Cfg.addressWidth bits)) init 0
+      val count = Reg(UInt(32 bits)) init 0
+      val seq = Reg(Bits(8 bits)) init 0
+      val crc = Reg(Bits(32 bits)) init 0
+      val nextCrc = UartDebug.crc32(crc, read4ByteFsm.readData)
+      val divider = Reg(UInt(uartCfg.clockDividerWidth bits)) init 0
+      val switchCnt = Reg(UInt(uartCfg.clockDividerWidth + 8 bits)) init 0
+      // The first word after the start command selects the mode of the download:
+      // - a command word selects the command mode, the words out of a command are dropped
+      // - any other word selects the raw word stream, all the words except the stop command are
+      //   data so the image can contain the command values
+      val rawMode = Reg(Bool) init False
+      val cmdMode = Reg(Bool) init False
+      // packet buffer, written to the ram only after the CRC of the packet matches
+      val buffer = Mem(Bits(32 bits), UartDebug.PACKET_WORDS)
+      val index = Reg(UInt(log2Up(UartDebug.PACKET_WORDS + 1) bits)) init 0
+      val dataPhase = Reg(Bool) init False
       io.ahblite3.HTRANS := IDLE
       io.ahblite3.HWRITE := True
       io.ahblite3.HWDATA := read4ByteFsm.readData
@@ -137,9 +227,28 @@ case class UartDebug(ahblite3Cfg: AhbLite3Config, baudrate: Int) extends Compone
 
       val idle = new State with EntryPoint
       val downloading = new State
+      val blockAddr = new State
+      val blockCount = new State
+      val blockData = new State
+      val packetSeq = new State
+      val packetAddr = new State
+      val packetCount = new State
+      val packetData = new State
+      val packetCrc = new State
+      val packetWrite = new State
+      val baudDivider = new State
+      val baudSwitch = new State
+      val checksumAddr = new State
+      val checksumCount = new State
+      val checksumRead = new State
+      val checksumResp = new State
 
       idle.whenIsActive {
         addr := 0x20000000
+        // the next download starts at the initial baudrate
+        clockDivider := clockDividerInit
+        rawMode := False
+        cmdMode := False
         when(read4ByteFsm.captured & startSignal & io.load_imem) {
           goto(downloading)
         }
@@ -147,12 +256,255 @@ case class UartDebug(ahblite3Cfg: AhbLite3Config, baudrate: Int) extends Compone
 
       downloading.whenIsActive {
         io.downloading := True
-        when(read4ByteFsm.captured && !stopSignal) {
+        when(read4ByteFsm.captured) {
+          when(stopSignal) {
+            goto(idle)
+          } elsewhen(command && !rawMode) {
+            cmdMode := True
+            when(blockSignal) {
+              goto(blockAddr)
+            }
+            when(pingSignal) {
+              writeCtrl.respond(UartDebug.ACK, B(0, 8 bits))
+            }
+            when(baudSignal) {
+              goto(baudDivider)
+            }
+            when(packetSignal) {
+              crc := B"32'hFFFFFFFF"
+              goto(packetSeq)
+            }
+            when(checksumSignal) {
+              goto(checksumAddr)
+            }
+          } elsewhen(!cmdMode) {
+            io.ahblite3.HTRANS := NONSEQ
+            addr := addr + 4
+            rawMode := True
+          }
+        }
+      }
+
+      // Block command: 32'hFFFFFFFD, address, word count, data words.
+      // The data words are counted so they can take any value including the commands.
+      blockAddr.whenIsActive {
+        io.downloading := True
+        when(read4ByteFsm.captured) {
+          addr := read4ByteFsm.readData.asUInt.resized
+          goto(blockCount)
+        }
+      }
+
+      blockCount.whenIsActive {
+        io.downloading := True
+        when(read4ByteFsm.captured) {
+          count := read4ByteFsm.readData.asUInt
+          when(read4ByteFsm.readData === 0) {
+            goto(downloading)
+          } otherwise {
+            goto(blockData)
+          }
+        }
+      }
+
+      blockData.whenIsActive {
+        io.downloading := True
+        when(read4ByteFsm.captured) {
           io.ahblite3.HTRANS := NONSEQ
           addr := addr + 4
+          count := count - 1
+          when(count === 1) {
+            goto(downloading)
+          }
         }
-        when(read4ByteFsm.captured && stopSignal) {
-          goto(idle)
+      }
+
+      // Packet command: 32'hFFFFFFFA, sequence number, address, word count, data words, CRC.
+      // The CRC-32 covers the sequence number, address, word count and data words.
+      // The data words are buffered and only written to the ram after the CRC matches, so a
+      // corrupted packet does not write anything and the host only needs to resend it on nak.
+      packetSeq.whenIsActive {
+        io.downloading := True
+        when(read4ByteFsm.captured) {
+          seq := read4ByteFsm.readData(7 downto 0)
+          crc := nextCrc
+          goto(packetAddr)
+        }
+      }
+
+      packetAddr.whenIsActive {
+        io.downloading := True
+        when(read4ByteFsm.captured) {
+          addr := read4ByteFsm.readData.asUInt.resized
+          crc := nextCrc
+          goto(packetCount)
+        }
+      }
+
+      packetCount.whenIsActive {
+        io.downloading := True
+        when(read4ByteFsm.captured) {
+          count := read4ByteFsm.readData.asUInt
+          crc := nextCrc
+          index := 0
+          when(read4ByteFsm.readData === 0) {
+            goto(packetCrc)
+          } elsewhen(read4ByteFsm.readData.asUInt > UartDebug.PACKET_WORDS) {
+            // corrupted word count, the rest of the packet is dropped in the command mode
+            writeCtrl.respond(UartDebug.NAK, seq)
+            goto(downloading)
+          } otherwise {
+            goto(packetData)
+          }
+        }
+      }
+
+      packetData.whenIsActive {
+        io.downloading := True
+        when(read4ByteFsm.captured) {
+          buffer.write(index.resized, read4ByteFsm.readData)
+          index := index + 1
+          count := count - 1
+          crc := nextCrc
+          when(count === 1) {
+            goto(packetCrc)
+          }
+        }
+      }
+
+      packetCrc.whenIsActive {
+        io.downloading := True
+        when(read4ByteFsm.captured) {
+          count := index.resized
+          index := 0
+          dataPhase := False
+          when(~crc =/= read4ByteFsm.readData) {
+            writeCtrl.respond(UartDebug.NAK, seq)
+            goto(downloading)
+          } elsewhen(index === 0) {
+            writeCtrl.respond(UartDebug.ACK, seq)
+            goto(downloading)
+          } otherwise {
+            goto(packetWrite)
+          }
+        }
+      }
+
+      // write the buffered words, each one with an address phase then a data phase
+      packetWrite.whenIsActive {
+        io.downloading := True
+        io.ahblite3.HWDATA := buffer.readAsync(index.resized)
+        when(!dataPhase) {
+          io.ahblite3.HTRANS := NONSEQ
+          when(io.ahblite3.HREADY) {
+            dataPhase := True
+          }
+        } elsewhen(io.ahblite3.HREADY) {
+          dataPhase := False
+          addr := addr + 4
+          index := index + 1
+          count := count - 1
+          when(count === 1) {
+            writeCtrl.respond(UartDebug.ACK, seq)
+            goto(downloading)
+          }
+        }
+      }
+
+      // Baud command: 32'hFFFFFFFC, clock divider.
+      // The ack is sent with the current baudrate, then the new clock divider is used.
+      baudDivider.whenIsActive {
+        io.downloading := True
+        when(read4ByteFsm.captured) {
+          divider := read4ByteFsm.readData.asUInt.resized
+          writeCtrl.respond(UartDebug.ACK, read4ByteFsm.readData(7 downto 0))
+          switchCnt := ((clockDivider +^ 1) << 7).resized
+          goto(baudSwitch)
+        }
+      }
+
+      // wait until the ack is completely sent. The last byte is still shifted out after it leaves
+      // the fifo, a byte takes 10 * rxSamplePerBit * (clockDivider + 1) < 128 * (clockDivider + 1) cycles
+      baudSwitch.whenIsActive {
+        io.downloading := True
+        when(writeCtrl.fifo.io.pop.valid) {
+          switchCnt := ((clockDivider +^ 1) << 7).resized
+        } otherwise {
+          switchCnt := switchCnt - 1
+          when(switchCnt === 0) {
+            clockDivider := divider
+            goto(downloading)
+          }
+        }
+      }
+
+      // Checksum command: 32'hFFFFFFF9, address, word count.
+      // Respond ack, 0 and then the CRC-32 of the words read from the ram, least significant byte
+      // first, so the host can check the ram still holds the image it downloaded last time.
+      checksumAddr.whenIsActive {
+        io.downloading := True
+        when(read4ByteFsm.captured) {
+          addr := read4ByteFsm.readData.asUInt.resized
+          goto(checksumCount)
+        }
+      }
+
+      checksumCount.whenIsActive {
+        io.downloading := True
+        when(read4ByteFsm.captured) {
+          count := read4ByteFsm.readData.asUInt
+          crc := B"32'hFFFFFFFF"
+          index := 0
+          dataPhase := False
+          when(read4ByteFsm.readData === 0) {
+            goto(checksumResp)
+          } otherwise {
+            goto(checksumRead)
+          }
+        }
+      }
+
+      // read the words, each one with an address phase then a data phase
+      checksumRead.whenIsActive {
+        io.downloading := True
+        io.ahblite3.HWRITE := False
+        when(!dataPhase) {
+          io.ahblite3.HTRANS := NONSEQ
+          when(io.ahblite3.HREADY) {
+            dataPhase := True
+          }
+        } elsewhen(io.ahblite3.HREADY) {
+          dataPhase := False
+          crc := UartDebug.crc32(crc, io.ahblite3.HRDATA)
+          addr := addr + 4
+          count := count - 1
+          when(count === 1) {
+            goto(checksumResp)
+          }
+        }
+      }
+
+      checksumResp.whenIsActive {
+        io.downloading := True
+        index := index + 1
+        when(index === 0) {
+          writeCtrl.respond(UartDebug.ACK, B(0, 8 bits))
+        } elsewhen(index === 1) {
+          writeCtrl.send(~crc(15 downto 0))
+        } otherwise {
+          writeCtrl.send(~crc(31 downto 16))
+          goto(downloading)
+        }
+      }
+
+      // drop the partial packet if the host stops sending in the middle of it. A checksum of more
+      // words than the ram holds (corrupted word count) is also stopped by the timeout.
+      for (state <- List(blockAddr, blockCount, blockData, packetSeq, packetAddr, packetCount, packetData, packetCrc,
+                         baudDivider, checksumAddr, checksumCount, checksumRead)) {
+        state.whenIsActive {
+          when(rxTimeout.timeout) {
+            goto(downloading)
+          }
         }
       }
     }
@@ -0,0 +1,393 @@
+#!/usr/bin/python3
+##################################################################################################
+##
+## Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+##
+## ~~~ Hardware in SpinalHDL ~~~
+##
+## Author: Heqing Huang
+## Date Created: 10/17/2026
+##
+## ================== Description ==================
+##
+## Branch predictor simulator
+##
+## Run the branch records of a trace file (see sim_trace.py, captured with
+## iss.py -kinds branch) through several branch predictors and report the mispredictions
+## per thousand instructions (MPKI) of each of them.
+##
+## Predictor specification: <scheme>:<entries>[/h<history bits>][/btb<entries>][+ras<depth>]
+##   apple:32                   BPU.scala: tagged direct mapped 2 bits counter + BTB.
+##                              Every branch and jump updates its entry, the BTB of a
+##                              branch not taken holds pc + 4. Same as the hardware except
+##                              that the hardware updates the entry in EX stage so a branch
+##                              fetched within 2 instructions still sees the old entry.
+##   bimodal:256/btb32          untagged 2 bits counter table + tagged BTB of taken branches
+##   gshare:256/h8/btb32        global history xor pc indexed 2 bits counter table + BTB
+##   none                       always predict not taken (USE_BPU = false)
+##   +ras4                      predict the return target with a return address stack
+##
+## A branch is mispredicted if the direction is wrong or if it is taken and the
+## predicted target is wrong, same as BU.scala.
+##
+##   python3 bpu_sim.py coremark.trace -p apple:16,apple:32,apple:64,gshare:256/h8/btb32+ras4
+##   python3 bpu_sim.py -check          check the predictor models with a synthetic trace
+##
+##################################################################################################
+
+import re
+import sys
+import argparse
+from array import array
+from multiprocessing import Pool
+
+from sim_trace import read_chunks, RECORD_WORDS, KIND_BRANCH, BRANCH_TAKEN, \
+    BRANCH_COND, BRANCH_CALL, BRANCH_RET
+
+# Cycles lost on a mispredicted branch: IF and ID stage are flushed
+MISS_PENALTY = 2
+
+DEFAULT_PREDICTORS = (
+    "none",
+    "apple:8", "apple:16", "apple:32", "apple:64", "apple:128", "apple:32+ras4",
+    "bimodal:64/btb32", "bimodal:256/btb32", "bimodal:256/btb32+ras4",
+    "gshare:256/h4/btb32", "gshare:256/h8/btb32", "gshare:1024/h10/btb64+ras4",
+)
+
+###############################
+# Trace
+###############################
+
+def read_branches(file):
+    """ Read the branch records of a trace file
+
+        @return: (pc, target, flags) arrays and the number of instructions
+    """
+    pcs     = array('I')
+    targets = array('I')
+    flags   = array('H')
+    instr   = 0
+    for records in read_chunks(file):
+        for idx in range(0, len(records), RECORD_WORDS):
+            kind = records[idx+1]
+            if kind & 0xFF == KIND_BRANCH:
+                pcs.append(records[idx+2])
+                targets.append(records[idx+3])
+                flags.append(kind >> 8)
+        if records:
+            instr = records[-RECORD_WORDS]
+    return pcs, targets, flags, instr
+
+###############################
+# Predictor
+###############################
+
+TAKEN = BRANCH_TAKEN >> 8
+
+class Predictor:
+    """ Base class of the branch predictors
+
+        predict(pc) returns (taken, target), update(pc, btype, taken, target) trains the
+        predictor with the resolved branch.
+    """
+
+    def __init__(self, ras=0):
+        self.ras_depth = ras
+        self.ras = []
+
+    def predict(self, pc):
+        return False, 0
+
+    def update(self, pc, btype, taken, target):
+        pass
+
+    def bits(self):
+        """ Storage in bits """
+        return self.ras_depth * 30
+
+    def run(self, pcs, targets, flags):
+        """ Run the branches through the predictor
+
+            @return: dict of the number of branches, direction miss and target miss
+        """
+        ras = self.ras
+        depth = self.ras_depth
+        dir_miss = tgt_miss = 0
+        for pc, target, flag in zip(pcs, targets, flags):
+            btype = flag >> 4
+            taken = bool(flag & TAKEN)
+            pred_take, pred_pc = self.predict(pc)
+            # the return pops the stack even if it is not predicted taken, otherwise the stack
+            # gets out of sync with the calls
+            if depth and btype == BRANCH_RET and ras:
+                ras_pc = ras.pop()
+                if pred_take:
+                    pred_pc = ras_pc
+            if pred_take != taken:
+                dir_miss += 1
+            elif taken and pred_pc != target:
+                tgt_miss += 1
+            if depth and btype == BRANCH_CALL:
+                if len(ras) == depth:
+                    del ras[0]
+                ras.append((pc + 4) & 0xFFFFFFFF)
+            self.update(pc, btype, taken, target)
+        return {'branches': len(pcs), 'dir_miss': dir_miss, 'tgt_miss': tgt_miss}
+
+class NoPredictor(Predictor):
+    """ Always predict not taken """
+    pass
+
+class AppleBPU(Predictor):
+    """ Model of BPU.scala """
+
+    def __init__(self, depth=32, ras=0):
+        super().__init__(ras)
+        self.depth = depth
+        self.idx_bits = depth.bit_length() - 1
+        self.mask = depth - 1
+        self.counter = [0] * depth
+        self.tag = [0] * depth
+        self.btb = [0] * depth
+        self.valid = [False] * depth
+
+    def predict(self, pc):
+        idx = (pc >> 2) & self.mask
+        if self.valid[idx] and self.tag[idx] == pc >> (2 + self.idx_bits):
+            return self.counter[idx] >= 2, self.btb[idx]
+        return False, self.btb[idx]
+
+    def update(self, pc, btype, taken, target):
+        idx = (pc >> 2) & self.mask
+        tag = pc >> (2 + self.idx_bits)
+        if self.valid[idx] and self.tag[idx] == tag:
+            counter = self.counter[idx]
+            self.counter[idx] = min(counter + 1, 3) if taken else max(counter - 1, 0)
+        else:
+            self.counter[idx] = 2 if taken else 1
+        self.valid[idx] = True
+        self.tag[idx] = tag
+        # target_pc of BU.scala is pc + 4 for a branch not taken
+        self.btb[idx] = target if taken else (pc + 4) & 0xFFFFFFFF
+
+    def bits(self):
+        tag_bits = 32 - 2 - self.idx_bits
+        return self.depth * (1 + 2 + tag_bits + 30) + super().bits()
+
+class BTB:
+    """ Tagged direct mapped branch target buffer holding the taken branches """
+
+    def __init__(self, depth):
+        self.depth = depth
+        self.idx_bits = depth.bit_length() - 1
+        self.mask = depth - 1
+        self.tag = [-1] * depth
+        self.target = [0] * depth
+        self.uncond = [False] * depth
+
+    def lookup(self, pc):
+        """ @return: (hit, target, unconditional) """
+        idx = (pc >> 2) & self.mask
+        if self.tag[idx] == pc >> (2 + self.idx_bits):
+            return True, self.target[idx], self.uncond[idx]
+        return False, 0, False
+
+    def update(self, pc, btype, target):
+        idx = (pc >> 2) & self.mask
+        self.tag[idx] = pc >> (2 + self.idx_bits)
+        self.target[idx] = target
+        self.uncond[idx] = btype != BRANCH_COND
+
+    def bits(self):
+        return self.depth * (1 + 1 + 32 - 2 - self.idx_bits + 30)
+
+class Bimodal(Predictor):
+    """ Untagged pc indexed 2 bits counter table with a BTB """
+
+    def __init__(self, depth=256, btb=32, ras=0):
+        super().__init__(ras)
+        self.depth = depth
+        self.mask = depth - 1
+        self.counter = [1] * depth
+        self.btb = BTB(btb)
+
+    def index(self, pc):
+        return (pc >> 2) & self.mask
+
+    def predict(self, pc):
+        hit, target, uncond = self.btb.lookup(pc)
+        if not hit:
+            return False, 0
+        return uncond or self.counter[self.index(pc)] >= 2, target
+
+    def update(self, pc, btype, taken, target):
+        if btype == BRANCH_COND:
+            idx = self.index(pc)
+            counter = self.counter[idx]
+            self.counter[idx] = min(counter + 1, 3) if taken else max(counter - 1, 0)
+        if taken:
+            self.btb.update(pc, btype, target)
+
+    def bits(self):
+        return self.depth * 2 + self.btb.bits() + super().bits()
+
+class Gshare(Bimodal):
+    """ Global history xor pc indexed 2 bits counter table with a BTB """
+
+    def __init__(self, depth=256, history=8, btb=32, ras=0):
+        super().__init__(depth, btb, ras)
+        self.history = history
+        self.ghr = 0
+
+    def index(self, pc):
+        return ((pc >> 2) ^ self.ghr) & self.mask
+
+    def update(self, pc, btype, taken, target):
+        super().update(pc, btype, taken, target)
+        if btype == BRANCH_COND:
+            self.ghr = ((self.ghr << 1) | taken) & ((1 << self.history) - 1)
+
+    def bits(self):
+        return super().bits() + self.history
+
+SPEC_RE = re.compile(r'^(\w+)(?::(\d+))?((?:/[a-z]+\d+)*)(?:\+ras(\d+))?$')
+
+def make_predictor(spec):
+    """ Create a predictor from its specification string """
+    m = SPEC_RE.match(spec)
+    if not m:
+        raise ValueError(f"Invalid predictor: {spec}")
+    scheme, entries, options, ras = m.groups()
+    entries = int(entries) if entries else 32
+    ras = int(ras) if ras else 0
+    opts = {key: int(value) for key, value in re.findall(r'/([a-z]+)(\d+)', options)}
+    for size in [entries, opts.get('btb', 32)]:
+        if size & (size - 1):
+            raise ValueError(f"Size of {spec} needs to be power of 2")
+    if scheme == 'none':
+        return NoPredictor(ras)
+    if scheme == 'apple':
+        return AppleBPU(entries, ras)
+    if scheme == 'bimodal':
+        return Bimodal(entries, opts.get('btb', 32), ras)
+    if scheme == 'gshare':
+        return Gshare(entries, opts.get('h', 8), opts.get('btb', 32), ras)
+    raise ValueError(f"Unknown predictor scheme: {scheme}")
+
+###############################
+# Simulation
+###############################
+
+# Trace shared with the worker processes
+_trace = None
+
+def _init_worker(trace):
+    global _trace
+    _trace = trace
+
+def _run(spec):
+    pcs, targets, flags, instr = _trace
+    predictor = make_predictor(spec)
+    result = predictor.run(pcs, targets, flags)
+    miss = result['dir_miss'] + result['tgt_miss']
+    return {
+        'predictor': spec,
+        'bits':      predictor.bits(),
+        **result,
+        'miss':      miss,
+        'accuracy':  1 - miss / result['branches'] if result['branches'] else 0,
+        'mpki':      miss * 1000 / instr if instr else 0,
+        'lost':      miss * MISS_PENALTY,
+    }
+
+def simulate(trace, specs, jobs=None):
+    """ Run the trace through every predictor
+
+        @return: list of result dict, in the order of specs
+    """
+    for spec in specs:
+        make_predictor(spec)
+    if jobs == 1:
+        _init_worker(trace)
+        return list(map(_run, specs))
+    with Pool(jobs, initializer=_init_worker, initargs=(trace,)) as pool:
+        return pool.map(_run, specs)
+
+def print_table(results, instr, file=sys.stdout):
+    print(f"{instr} instructions, {results[0]['branches'] if results else 0} branches", file=file)
+    header = f"{'predictor':<28} {'bits':>7} {'dir miss':>9} {'tgt miss':>9} {'accuracy':>9} " \
+             f"{'MPKI':>8} {'lost cycles':>12}"
+    print(header, file=file)
+    print('-' * len(header), file=file)
+    for r in results:
+        print(f"{r['predictor']:<28} {r['bits']:>7} {r['dir_miss']:>9} {r['tgt_miss']:>9} "
+              f"{r['accuracy']:>9.2%} {r['mpki']:>8.2f} {r['lost']:>12}", file=file)
+
+def write_csv(results, file):
+    keys = list(results[0].keys()) if results else []
+    with open(file, 'w') as f:
+        f.write(','.join(keys) + '\n')
+        for r in results:
+            f.write(','.join(str(r[k]) for k in keys) + '\n')
+
+def self_check():
+    """ Run nested calls deeper than the BTB, the returns must never miss their target
+
+        The calls and the inner returns share the same BTB entry so they are never predicted
+        taken while the outer returns are. The return address stack must still be popped by
+        the inner returns to give the right target to the outer ones.
+    """
+    pcs, targets, flags = array('I'), array('I'), array('H')
+    call = (BRANCH_TAKEN | (BRANCH_CALL << 12)) >> 8
+    ret = (BRANCH_TAKEN | (BRANCH_RET << 12)) >> 8
+    nest = 6
+    outer = 3
+    for _ in range(20):
+        for level in range(nest):
+            pcs.append(0x1000 + 0x100 * level)
+            targets.append(0x1000 + 0x100 * (level + 1))
+            flags.append(call)
+        for level in reversed(range(nest)):
+            # BTB index 1 to 3 for the outer returns, 0 for the inner ones
+            pcs.append(0x1000 + 0x100 * (level + 1) + 0x40 + (4 * (level + 1) if level < outer else 0))
+            targets.append(0x1000 + 0x100 * level + 4)
+            flags.append(ret)
+    for spec in ("apple:4+ras8", "bimodal:64/btb4+ras8", "gshare:64/h4/btb4+ras8"):
+        predictor = make_predictor(spec)
+        result = predictor.run(pcs, targets, flags)
+        assert result['tgt_miss'] == 0, f"{spec}: {result['tgt_miss']} return target misses"
+        assert not predictor.ras, f"{spec}: {len(predictor.ras)} entries left in the return address stack"
+    print("Self check passed")
+
+###############################
+# Main Program
+###############################
+
+def cmdParser():
+    parser = argparse.ArgumentParser(description='Run a branch trace through several branch predictors')
+    parser.add_argument('trace', type=str, nargs='?', default=None, help='The trace file')
+    parser.add_argument('-p', type=str, dest='predictors', default=','.join(DEFAULT_PREDICTORS),
+                        help='Comma separated predictor specifications')
+    parser.add_argument('-instr', type=int, default=None,
+                        help='Number of instructions, default to the cycle of the last record')
+    parser.add_argument('-jobs', '-j', type=int, default=None, help='Number of processes, default to the cpu count')
+    parser.add_argument('-o', type=str, dest='output', default=None, help='Write the table as csv')
+    parser.add_argument('-check', action='store_true', help='Check the predictor models and exit')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = cmdParser()
+    if args.check:
+        self_check()
+        sys.exit(0)
+    if not args.trace:
+        sys.exit("The trace file is required")
+    pcs, targets, flags, instr = read_branches(args.trace)
+    if args.instr:
+        instr = args.instr
+    if not pcs:
+        sys.exit("No branch record found, capture the trace with iss.py -kinds branch")
+    results = simulate((pcs, targets, flags, instr), args.predictors.split(','), args.jobs)
+    print_table(results, instr)
+    if args.output:
+        write_csv(results, args.output)
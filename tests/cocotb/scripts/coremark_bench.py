@@ -0,0 +1,184 @@
+#!/usr/bin/python3
+##################################################################################################
+##
+## Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+##
+## ~~~ Hardware in SpinalHDL ~~~
+##
+## Author: Heqing Huang
+## Date Created: 10/17/2026
+##
+## ================== Description ==================
+##
+## Run CoreMark in simulation and track the score
+##
+## The simulation (run_coremark.py) captures the uart output of CoreMark. The score is
+## computed from the total ticks (mcycle / 1024, see core_portme.c) instead of the
+## Iterations/Sec line because the simulated run is too short for the integer time in seconds.
+## Each run is appended to the history file. The run fails if the CoreMark/MHz drops more
+## than the threshold below the last passing run of the same SoC and number of iterations.
+##
+##################################################################################################
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+subprocess_run = subprocess.Popen("git rev-parse --show-toplevel", shell=True, stdout=subprocess.PIPE)
+subprocess_return = subprocess_run.stdout.read()
+REPO_ROOT = subprocess_return.decode().rstrip()
+
+COREMARK_PATH = f"{REPO_ROOT}/sdk/benchmark/coremark"
+HISTORY_FILE  = f"{REPO_ROOT}/tests/cocotb/coremark_history.json"
+RESULT_FILE   = "coremark_result.json"
+LOG_FILE      = "coremark.log"
+
+# Clock frequency of each SoC in MHz, same as CLK_FEQ_MHZ in sdk/bsp/<board>/board.h
+CLK_MHZ = {
+    "arty": 50,
+    "de2" : 27,
+}
+# Resolution of the coremark timer, TIMER_RES_DIVIDER in core_portme.c
+TIMER_RES_DIVIDER = 1024
+
+# The last line printed by coremark
+END_MARKERS = ("Correct operation validated", "Errors detected", "Cannot validate operation")
+# Expected error, the simulated run is always shorter than 10 seconds
+SHORT_RUN_ERROR = "Must execute for at least 10 secs"
+
+#####################################
+# Utility function
+#####################################
+
+def finished(text):
+    """ Check if the coremark output is complete """
+    for marker in END_MARKERS:
+        idx = text.find(marker)
+        if idx >= 0 and text.find('\n', idx) >= 0:
+            return True
+    return False
+
+def parse_coremark(text, soc='arty'):
+    """ Parse the coremark output
+
+        @return: dict of the result
+    """
+    fields = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition(':')
+        if sep:
+            fields[key.strip()] = value.strip()
+    errors = [line for line in text.splitlines() if 'ERROR!' in line and SHORT_RUN_ERROR not in line]
+    if 'Total ticks' not in fields or 'Iterations' not in fields:
+        errors.append("Incomplete coremark output")
+        return {'soc': soc, 'errors': errors}
+    ticks = int(fields['Total ticks'])
+    iterations = int(fields['Iterations'])
+    cycles = ticks * TIMER_RES_DIVIDER
+    coremark_per_mhz = iterations * 1e6 / cycles if cycles else 0
+    return {
+        'soc':                soc,
+        'iterations':         iterations,
+        'ticks':              ticks,
+        'cycles':             cycles,
+        'cycles_per_iter':    cycles / iterations if iterations else 0,
+        'coremark_per_mhz':   coremark_per_mhz,
+        'iterations_per_sec': coremark_per_mhz * CLK_MHZ[soc],
+        'crcfinal':           fields.get('[0]crcfinal'),
+        'errors':             errors,
+    }
+
+def git_revision():
+    cmd = "git rev-parse --short HEAD && git status --porcelain --untracked-files=no"
+    output = subprocess.run(cmd, shell=True, cwd=REPO_ROOT, stdout=subprocess.PIPE).stdout.decode().split('\n')
+    return output[0] + ('-dirty' if any(output[1:]) else '')
+
+def load_history(file):
+    if not os.path.isfile(file):
+        return []
+    with open(file) as f:
+        return json.load(f)
+
+def save_history(file, history):
+    with open(file, 'w') as f:
+        json.dump(history, f, indent=2)
+
+def reference(history, result):
+    """ The last passing run with the same SoC and number of iterations """
+    for record in reversed(history):
+        if record['status'] == 'PASS' and record['soc'] == result['soc'] \
+           and record['iterations'] == result['iterations']:
+            return record
+    return None
+
+def check(result, history, threshold, minimum):
+    """ Check the result against the history and the minimum score
+
+        @return: list of failure messages
+    """
+    failures = list(result['errors'])
+    if failures:
+        return failures
+    score = result['coremark_per_mhz']
+    if minimum and score < minimum:
+        failures.append(f"CoreMark/MHz {score:.4f} is below the minimum {minimum}")
+    ref = reference(history, result)
+    if ref and score < ref['coremark_per_mhz'] * (1 - threshold):
+        failures.append(f"CoreMark/MHz {score:.4f} dropped more than {threshold:.1%} from "
+                        f"{ref['coremark_per_mhz']:.4f} ({ref['revision']})")
+    return failures
+
+#####################################
+# Main Program
+#####################################
+
+def cmdParser():
+    parser = argparse.ArgumentParser(description='Run CoreMark in simulation and track the score')
+    parser.add_argument('-soc', type=str, required=True, nargs='?', help='The FPGA board')
+    parser.add_argument('-timeout', '-to', type=str, required=True, nargs='?', help='Timeout value')
+    parser.add_argument('-dump', '-d', type=str, default='0', nargs='?', help='Dump the waveform?')
+    parser.add_argument('-history', type=str, default=HISTORY_FILE, nargs='?', help='The score history file')
+    parser.add_argument('-threshold', type=float, default=0.01, nargs='?',
+                        help='Maximum allowed drop of CoreMark/MHz from the last passing run')
+    parser.add_argument('-min', type=float, default=0, nargs='?', help='Minimum CoreMark/MHz')
+    parser.add_argument('-record', type=int, default=1, nargs='?', help='Append the result to the history file')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = cmdParser()
+    cmd = f"make MODULE=run_coremark TESTNAME=coremark TESTPATH={COREMARK_PATH} " \
+          f"TIMEOUT={args.timeout} DUMP={args.dump} SOC={args.soc}"
+    os.system(cmd)
+    if os.path.isfile(LOG_FILE):
+        with open(LOG_FILE) as f:
+            result = parse_coremark(f.read(), args.soc)
+    else:
+        result = {'soc': args.soc, 'errors': ["No coremark output, the simulation failed"]}
+    history = load_history(args.history)
+    failures = check(result, history, args.threshold, args.min)
+    result['status'] = 'FAIL' if failures else 'PASS'
+    result['revision'] = git_revision()
+    result['date'] = time.strftime("%Y-%m-%d %H:%M:%S")
+    with open(RESULT_FILE, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    print("==================================")
+    if 'cycles' in result:
+        print(f"CoreMark ({args.soc}, {result['iterations']} iterations, {result['revision']})")
+        print(f"  Cycles        : {result['cycles']}")
+        print(f"  Cycles/Iter   : {result['cycles_per_iter']:.1f}")
+        print(f"  CoreMark/MHz  : {result['coremark_per_mhz']:.4f}")
+        print(f"  Iterations/Sec: {result['iterations_per_sec']:.2f} @ {CLK_MHZ[args.soc]}MHz")
+        ref = reference(history, result)
+        if ref:
+            print(f"  Reference     : {ref['coremark_per_mhz']:.4f} ({ref['revision']}, {ref['date']})")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print(result['status'])
+    if args.record and 'cycles' in result:
+        history.append(result)
+        save_history(args.history, history)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,118 @@
+##################################################################################################
+##
+## Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+##
+## ~~~ Hardware in SpinalHDL ~~~
+##
+## Author: Heqing Huang
+## Date Created: 10/17/2026
+##
+## ================== Description ==================
+##
+## Lockstep co-simulation between AppleRISCV and the python ISS
+##
+## Every instruction moving from MEM stage to WB stage is retired. For each retired
+## instruction the ISS executes the same instruction and the PC, the destination register
+## and its value are compared. After a trap mepc and mcause are compared as well.
+## The check stops on the first divergence.
+##
+## Interrupts are asynchronous to the ISS so they are taken from the design: when the design
+## jumps to the trap vector with an interrupt cause, the ISS takes the same interrupt.
+##
+##################################################################################################
+
+from cocotb.triggers import FallingEdge, Event
+
+from iss import RV32ISS, Memory, CSR_MTVEC, CSR_MEPC, CSR_MCAUSE
+from rom_loader import read_program
+
+# Maximum number of non-retiring instructions (trap, mret) between two retired instructions
+MAX_SKIP = 4
+
+class CoSim:
+    """ Compare the retired instructions of the design against the ISS """
+
+    def __init__(self, dut, file_name, file_path):
+        core = dut.DUT_AppleRISCVSoC.core
+        self.clk = dut.io_clk
+        memory = Memory()
+        memory.load_segments(read_program(file_name, file_path))
+        self.iss = RV32ISS(memory=memory)
+        self.retired = 0
+        self.error = None
+        self.diverged = Event()
+        # cache all the handles
+        self.valid = core.mem2wb_pipe_valid
+        self.stall = core.mem2wb_pipe_stall
+        self.pc = core.ex2mem_pc
+        self.rd_wr = core.ex2mem_rd_wr
+        self.rd_idx = core.ex2mem_rd_idx
+        self.rd_wdata = core.MEMStage_rd_wdata
+        self.mepc = core.mcsr_inst.mepc
+        self.mcause = core.mcsr_inst.mcause
+
+    def report(self, msg):
+        self.error = f"Co-simulation diverged at instruction {self.retired}: {msg}"
+        self.diverged.set()
+
+    def check(self, pc):
+        """ Execute the ISS up to the next retired instruction and compare it with the design
+
+            @return: False if the design and the ISS diverge
+        """
+        iss = self.iss
+        trapped = False
+        for _ in range(MAX_SKIP):
+            mcause = self.mcause.value.integer
+            if iss.pc != pc and mcause & 0x80000000 and pc == iss.csr[CSR_MTVEC] & ~3:
+                iss.trap(mcause & 0x7FFFFFFF, interrupt=True)
+                trapped = True
+            iss_pc = iss.pc
+            if iss.step():
+                break
+            trapped = trapped or iss.trapped
+        else:
+            self.report(f"ISS did not retire any instruction, PC = {iss.pc:#010x}")
+            return False
+
+        if trapped:
+            mepc, mcause = self.mepc.value.integer, self.mcause.value.integer
+            if (mepc, mcause) != (iss.csr[CSR_MEPC], iss.csr[CSR_MCAUSE]):
+                self.report(f"trap mismatch, DUT mepc = {mepc:#010x} mcause = {mcause:#x}, "
+                            f"ISS mepc = {iss.csr[CSR_MEPC]:#010x} mcause = {iss.csr[CSR_MCAUSE]:#x}")
+                return False
+
+        if iss_pc != pc:
+            self.report(f"PC mismatch, DUT = {pc:#010x}, ISS = {iss_pc:#010x}")
+            return False
+
+        rd = self.rd_idx.value.integer if self.rd_wr.value.integer else 0
+        if rd != iss.rd:
+            self.report(f"PC = {pc:#010x}, rd mismatch, DUT = x{rd}, ISS = x{iss.rd}")
+            return False
+        if rd:
+            value = self.rd_wdata.value.integer
+            if iss.sync:
+                iss.set_rd(rd, value)
+            elif value != iss.rd_value:
+                self.report(f"PC = {pc:#010x}, x{rd} mismatch, DUT = {value:#010x}, ISS = {iss.rd_value:#010x}")
+                return False
+        self.retired += 1
+        return True
+
+    async def start(self):
+        while True:
+            await FallingEdge(self.clk)
+            try:
+                if not (self.valid.value.integer and not self.stall.value.integer):
+                    continue
+                pc = self.pc.value.integer
+            except ValueError:
+                # X/Z value during reset
+                continue
+            try:
+                if not self.check(pc):
+                    return
+            except ValueError:
+                self.report(f"PC = {pc:#010x}, X/Z value on the retired instruction")
+                return
@@ -0,0 +1,552 @@
+##################################################################################################
+##
+## Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+##
+## ~~~ Hardware in SpinalHDL ~~~
+##
+## Author: Heqing Huang
+## Date Created: 10/17/2026
+##
+## ================== Description ==================
+##
+## RV32IM + Zicsr instruction set simulator used as the golden model of AppleRISCV
+##
+## - Machine mode only, same CSR set as the MCSR module.
+## - Memory is backed by one bytearray per memory region.
+## - Each instruction is decoded once into a closure and kept in a decoded instruction cache.
+##   A store into a cached address invalidates the entry.
+## - Values that the ISS can not predict (peripheral loads, counters, mip) are flagged
+##   with the sync attribute so the checker can take the value from the design.
+##
+## The file can also be run as a script to capture the load/store and branch trace of a program
+## into a trace file (see sim_trace.py), e.g. for the cache trace replay test or bpu_sim.py:
+##   python3 iss.py <file_name> <file_path> -o <trace> [-max <instructions>] [-kinds load,mem,branch]
+## The cycle of each record is the instruction count. The simulation stops at the first
+## jump to itself or after the maximum number of instructions.
+##
+##################################################################################################
+
+import struct
+import argparse
+
+from rom_loader import IMEM_BASE, DMEM_BASE, read_program
+
+MASK = 0xFFFFFFFF
+
+# CSR address
+CSR_MSTATUS       = 0x300
+CSR_MISA          = 0x301
+CSR_MIE           = 0x304
+CSR_MTVEC         = 0x305
+CSR_MCOUNTEREN    = 0x306
+CSR_MCOUNTINHIBIT = 0x320
+CSR_MSCRATCH      = 0x340
+CSR_MEPC          = 0x341
+CSR_MCAUSE        = 0x342
+CSR_MTVAL         = 0x343
+CSR_MIP           = 0x344
+CSR_MVENDORID     = 0xF11
+CSR_MARCHID       = 0xF12
+CSR_MIMPID        = 0xF13
+CSR_MHARTID       = 0xF14
+
+# CSR whose value depends on the timing of the design or is not modeled (mhpmevent)
+CSR_SYNC = {CSR_MIP} | set(range(0xB00, 0xB20)) | set(range(0xB80, 0xBA0)) | set(range(0x323, 0x340))
+
+MISA_VALUE   = 0x40000000 | (1 << 8) | (1 << 12)  # RV32IM
+MSTATUS_MIE  = 1 << 3
+MSTATUS_MPIE = 1 << 7
+MSTATUS_MPP  = 3 << 11
+
+# Exception code
+EXC_INSTR_ADDR_MA = 0
+EXC_ILL_INSTR     = 2
+EXC_BREAKPOINT    = 3
+EXC_LD_ADDR_MA    = 4
+EXC_SD_ADDR_MA    = 6
+EXC_MECALL        = 11
+
+def sext(value, bits):
+    """ Sign extend the value to 32 bits """
+    sign = 1 << (bits - 1)
+    return ((value & (sign - 1)) - (value & sign)) & MASK
+
+def signed(value):
+    """ Interpret a 32 bits value as signed """
+    return value - (1 << 32) if value & 0x80000000 else value
+
+class Trap(Exception):
+    """ Exception raised by an instruction """
+    def __init__(self, cause, tval=0):
+        super().__init__(cause, tval)
+        self.cause = cause
+        self.tval = tval
+
+###############################
+# Memory
+###############################
+
+class Memory:
+    """ Sparse memory made of bytearray regions """
+
+    def __init__(self, regions=((IMEM_BASE, 0x200000), (DMEM_BASE, 0x100000))):
+        self.regions = [(base, bytearray(size)) for base, size in regions]
+
+    def find(self, addr, size):
+        for base, data in self.regions:
+            offset = addr - base
+            if 0 <= offset and offset + size <= len(data):
+                return data, offset
+        return None, 0
+
+    def load_segments(self, segments):
+        """ Load (address, data) segments into memory """
+        for addr, seg in segments:
+            data, offset = self.find(addr, len(seg))
+            if data is not None:
+                data[offset:offset+len(seg)] = seg
+
+    def read(self, addr, size):
+        """ @return: value or None if the address is not backed by memory """
+        data, offset = self.find(addr, size)
+        if data is None:
+            return None
+        return int.from_bytes(data[offset:offset+size], 'little')
+
+    def write(self, addr, size, value):
+        """ @return: False if the address is not backed by memory """
+        data, offset = self.find(addr, size)
+        if data is None:
+            return False
+        data[offset:offset+size] = (value & ((1 << (8 * size)) - 1)).to_bytes(size, 'little')
+        return True
+
+    def fetch(self, addr):
+        data, offset = self.find(addr, 4)
+        if data is None:
+            return None
+        return struct.unpack_from('<I', data, offset)[0]
+
+###############################
+# ISS
+###############################
+
+class RV32ISS:
+    """ RV32IM + Zicsr instruction set simulator """
+
+    def __init__(self, pc=IMEM_BASE, memory=None):
+        self.pc = pc
+        self.x = [0] * 32
+        self.mem = memory if memory else Memory()
+        self.icache = {}
+        self.csr = {
+            CSR_MSTATUS: MSTATUS_MPP, CSR_MIE: 0, CSR_MTVEC: 0, CSR_MCOUNTINHIBIT: 0,
+            CSR_MSCRATCH: 0, CSR_MEPC: 0, CSR_MCAUSE: 0, CSR_MTVAL: 0, CSR_MIP: 0,
+        }
+        # information about the last executed instruction
+        self.rd = 0
+        self.rd_value = 0
+        self.sync = False
+        self.trapped = False
+        # memory access hook: trace(write, addr, size, value)
+        self.trace = None
+
+    # ---------------------------
+    # Execution
+    # ---------------------------
+
+    def step(self):
+        """ Execute one instruction
+
+            @return: True if the instruction retires. Instructions that trap and
+                     mret/ecall do not retire in AppleRISCV.
+        """
+        pc = self.pc
+        exe = self.icache.get(pc)
+        if exe is None:
+            exe = self.decode(pc)
+            self.icache[pc] = exe
+        self.rd = 0
+        self.sync = False
+        self.trapped = False
+        try:
+            return exe()
+        except Trap as trap:
+            self.trap(trap.cause, trap.tval)
+            return False
+
+    def trap(self, cause, tval=0, interrupt=False):
+        """ Enter the machine mode trap handler """
+        status = self.csr[CSR_MSTATUS]
+        mpie = MSTATUS_MPIE if status & MSTATUS_MIE else 0
+        self.csr[CSR_MSTATUS] = (status & ~(MSTATUS_MIE | MSTATUS_MPIE)) | mpie | MSTATUS_MPP
+        self.csr[CSR_MEPC] = self.pc
+        self.csr[CSR_MCAUSE] = (cause | (0x80000000 if interrupt else 0)) & MASK
+        self.csr[CSR_MTVAL] = tval & MASK
+        self.pc = self.csr[CSR_MTVEC] & ~3
+        self.trapped = True
+
+    def write_rd(self, rd, value):
+        if rd:
+            self.x[rd] = value
+            self.rd = rd
+            self.rd_value = value
+
+    def set_rd(self, rd, value):
+        """ Overwrite a register with a value taken from the design """
+        if rd:
+            self.x[rd] = value & MASK
+
+    def invalidate(self, addr):
+        """ Invalidate the decoded instruction cache for a store address """
+        base = addr & ~3
+        self.icache.pop(base, None)
+        self.icache.pop(base + 4, None)
+
+    # ---------------------------
+    # CSR
+    # ---------------------------
+
+    def read_csr(self, addr):
+        if addr in CSR_SYNC:
+            self.sync = True
+            return self.csr.get(addr, 0)
+        if addr == CSR_MISA:
+            return MISA_VALUE
+        return self.csr.get(addr, 0)
+
+    def write_csr(self, addr, value):
+        if addr == CSR_MSTATUS:
+            value |= MSTATUS_MPP
+        if addr in self.csr or addr in CSR_SYNC:
+            self.csr[addr] = value & MASK
+
+    # ---------------------------
+    # Decoder
+    # ---------------------------
+
+    def decode(self, pc):
+        """ Decode the instruction at pc into a closure executing it """
+        instr = self.mem.fetch(pc)
+        if instr is None:
+            instr = 0
+        x = self.x
+        opcode = instr & 0x7F
+        rd = (instr >> 7) & 0x1F
+        funct3 = (instr >> 12) & 0x7
+        rs1 = (instr >> 15) & 0x1F
+        rs2 = (instr >> 20) & 0x1F
+        funct7 = instr >> 25
+        imm_i = sext(instr >> 20, 12)
+        imm_s = sext(((instr >> 25) << 5) | ((instr >> 7) & 0x1F), 12)
+        imm_b = sext((((instr >> 31) & 1) << 12) | (((instr >> 7) & 1) << 11) |
+                     (((instr >> 25) & 0x3F) << 5) | (((instr >> 8) & 0xF) << 1), 13)
+        imm_u = instr & 0xFFFFF000
+        imm_j = sext((((instr >> 31) & 1) << 20) | (((instr >> 12) & 0xFF) << 12) |
+                     (((instr >> 20) & 1) << 11) | (((instr >> 21) & 0x3FF) << 1), 21)
+        next_pc = (pc + 4) & MASK
+
+        def illegal():
+            raise Trap(EXC_ILL_INSTR, instr)
+
+        def alu(op, b_imm):
+            def exe():
+                b = imm_i if b_imm else x[rs2]
+                self.write_rd(rd, op(x[rs1], b) & MASK)
+                self.pc = next_pc
+                return True
+            return exe
+
+        if opcode == 0x37:      # LUI
+            return alu(lambda a, b: imm_u, True)
+        if opcode == 0x17:      # AUIPC
+            value = (pc + imm_u) & MASK
+            return alu(lambda a, b: value, True)
+
+        if opcode == 0x6F:      # JAL
+            target = (pc + imm_j) & MASK
+            def exe():
+                if target & 3:
+                    raise Trap(EXC_INSTR_ADDR_MA, target)
+                self.write_rd(rd, next_pc)
+                self.pc = target
+                return True
+            return exe
+
+        if opcode == 0x67 and funct3 == 0:     # JALR
+            def exe():
+                target = (x[rs1] + imm_i) & MASK & ~1
+                if target & 3:
+                    raise Trap(EXC_INSTR_ADDR_MA, target)
+                self.write_rd(rd, next_pc)
+                self.pc = target
+                return True
+            return exe
+
+        if opcode == 0x63:      # BRANCH
+            cond = {
+                0: lambda a, b: a == b,
+                1: lambda a, b: a != b,
+                4: lambda a, b: signed(a) < signed(b),
+                5: lambda a, b: signed(a) >= signed(b),
+                6: lambda a, b: a < b,
+                7: lambda a, b: a >= b,
+            }.get(funct3)
+            if cond is None:
+                return illegal
+            target = (pc + imm_b) & MASK
+            def exe():
+                if cond(x[rs1], x[rs2]):
+                    if target & 3:
+                        raise Trap(EXC_INSTR_ADDR_MA, target)
+                    self.pc = target
+                else:
+                    self.pc = next_pc
+                return True
+            return exe
+
+        if opcode == 0x03:      # LOAD
+            size, is_signed = {0: (1, True), 1: (2, True), 2: (4, True), 4: (1, False), 5: (2, False)}.get(funct3, (0, False))
+            if size == 0:
+                return illegal
+            def exe():
+                addr = (x[rs1] + imm_i) & MASK
+                if addr & (size - 1):
+                    raise Trap(EXC_LD_ADDR_MA, addr)
+                if self.trace:
+                    self.trace(False, addr, size, 0)
+                value = self.mem.read(addr, size)
+                if value is None:
+                    # peripheral, the value comes from the design
+                    value = 0
+                    self.sync = True
+                if is_signed:
+                    value = sext(value, size * 8)
+                self.write_rd(rd, value)
+                self.pc = next_pc
+                return True
+            return exe
+
+        if opcode == 0x23:      # STORE
+            size = {0: 1, 1: 2, 2: 4}.get(funct3, 0)
+            if size == 0:
+                return illegal
+            def exe():
+                addr = (x[rs1] + imm_s) & MASK
+                if addr & (size - 1):
+                    raise Trap(EXC_SD_ADDR_MA, addr)
+                if self.trace:
+                    self.trace(True, addr, size, x[rs2])
+                if self.mem.write(addr, size, x[rs2]):
+                    self.invalidate(addr)
+                self.pc = next_pc
+                return True
+            return exe
+
+        if opcode == 0x13:      # OP-IMM
+            shamt = rs2
+            op = {
+                0: lambda a, b: a + b,
+                2: lambda a, b: int(signed(a) < signed(b)),
+                3: lambda a, b: int(a < b),
+                4: lambda a, b: a ^ b,
+                6: lambda a, b: a | b,
+                7: lambda a, b: a & b,
+            }.get(funct3)
+            if funct3 == 1 and funct7 == 0:
+                op = lambda a, b: a << shamt
+            elif funct3 == 5 and funct7 == 0:
+                op = lambda a, b: a >> shamt
+            elif funct3 == 5 and funct7 == 0x20:
+                op = lambda a, b: signed(a) >> shamt
+            if op is None:
+                return illegal
+            return alu(op, True)
+
+        if opcode == 0x33:      # OP
+            if funct7 == 0:
+                op = {
+                    0: lambda a, b: a + b,
+                    1: lambda a, b: a << (b & 0x1F),
+                    2: lambda a, b: int(signed(a) < signed(b)),
+                    3: lambda a, b: int(a < b),
+                    4: lambda a, b: a ^ b,
+                    5: lambda a, b: a >> (b & 0x1F),
+                    6: lambda a, b: a | b,
+                    7: lambda a, b: a & b,
+                }[funct3]
+            elif funct7 == 0x20 and funct3 in (0, 5):
+                op = {
+                    0: lambda a, b: a - b,
+                    5: lambda a, b: signed(a) >> (b & 0x1F),
+                }[funct3]
+            elif funct7 == 1:
+                op = {
+                    0: lambda a, b: a * b,
+                    1: lambda a, b: (signed(a) * signed(b)) >> 32,
+                    2: lambda a, b: (signed(a) * b) >> 32,
+                    3: lambda a, b: (a * b) >> 32,
+                    4: div,
+                    5: lambda a, b: a // b if b else MASK,
+                    6: rem,
+                    7: lambda a, b: a % b if b else a,
+                }[funct3]
+            else:
+                return illegal
+            return alu(op, False)
+
+        if opcode == 0x0F:      # FENCE, FENCE.I
+            def exe():
+                if funct3 == 1:
+                    self.icache.clear()
+                self.pc = next_pc
+                return True
+            return exe
+
+        if opcode == 0x73:      # SYSTEM
+            if funct3 == 0:
+                if instr == 0x00000073:     # ECALL
+                    def exe():
+                        raise Trap(EXC_MECALL)
+                    return exe
+                if instr == 0x00100073:     # EBREAK
+                    def exe():
+                        raise Trap(EXC_BREAKPOINT, pc)
+                    return exe
+                if instr == 0x30200073:     # MRET
+                    def exe():
+                        status = self.csr[CSR_MSTATUS]
+                        mie = MSTATUS_MIE if status & MSTATUS_MPIE else 0
+                        self.csr[CSR_MSTATUS] = (status & ~MSTATUS_MIE) | mie | MSTATUS_MPIE | MSTATUS_MPP
+                        self.pc = self.csr[CSR_MEPC]
+                        return False
+                    return exe
+                return illegal
+            if funct3 == 4:
+                return illegal
+            csr = instr >> 20
+            use_imm = funct3 & 4
+            kind = funct3 & 3
+            def exe():
+                src = rs1 if use_imm else x[rs1]
+                # csrrw/csrrwi with rd = x0 does not read the csr
+                old = self.read_csr(csr) if (kind != 1 or rd) else 0
+                if kind == 1:
+                    self.write_csr(csr, src)
+                elif rs1:
+                    self.write_csr(csr, old | src if kind == 2 else old & ~src)
+                self.write_rd(rd, old)
+                self.pc = next_pc
+                return True
+            return exe
+
+        return illegal
+
+def div(a, b):
+    """ RV32M signed division """
+    if b == 0:
+        return MASK
+    a, b = signed(a), signed(b)
+    if a == -0x80000000 and b == -1:
+        return a
+    q = abs(a) // abs(b)
+    return -q if (a < 0) != (b < 0) else q
+
+def rem(a, b):
+    """ RV32M signed remainder """
+    if b == 0:
+        return a
+    a, b = signed(a), signed(b)
+    if a == -0x80000000 and b == -1:
+        return 0
+    r = abs(a) % abs(b)
+    return -r if a < 0 else r
+
+###############################
+# Main Program
+###############################
+
+SIZE_LOG2 = {1: 0, 2: 1, 4: 2}
+LINK_REG  = (1, 5)
+
+def branch_type(instr):
+    """ Classify a branch/jump instruction (see BRANCH_* in sim_trace.py)
+
+        @return: the branch type, None if the instruction is not a branch or jump
+    """
+    from sim_trace import BRANCH_COND, BRANCH_JAL, BRANCH_JALR, BRANCH_CALL, BRANCH_RET
+    opcode = instr & 0x7F
+    rd = (instr >> 7) & 0x1F
+    rs1 = (instr >> 15) & 0x1F
+    if opcode == 0x63:
+        return BRANCH_COND
+    if opcode == 0x6F:
+        return BRANCH_CALL if rd in LINK_REG else BRANCH_JAL
+    if opcode == 0x67:
+        if rd in LINK_REG:
+            return BRANCH_CALL
+        if rd == 0 and rs1 in LINK_REG:
+            return BRANCH_RET
+        return BRANCH_JALR
+    return None
+
+def capture_trace(file_name, file_path, output, max_instr, kinds=('load', 'mem')):
+    """ Run the program on the ISS and write its load/store and branch trace
+
+        @param kinds: what to trace: 'load', 'mem', 'branch'
+        @return: number of executed instructions
+    """
+    # imported here so the ISS does not depend on the tracer
+    from sim_trace import TraceWriter, KIND_MEM, KIND_LOAD, KIND_BRANCH, BRANCH_TAKEN, BRANCH_COND
+    memory = Memory()
+    memory.load_segments(read_program(file_name, file_path))
+    iss = RV32ISS(memory=memory)
+    writer = TraceWriter(output)
+    trace_load = 'load' in kinds
+    trace_mem = 'mem' in kinds
+    trace_branch = 'branch' in kinds
+    def trace(write, addr, size, value):
+        if write and trace_mem:
+            writer.record(KIND_MEM | (SIZE_LOG2[size] << 8), addr, value & (MASK >> (32 - 8 * size)))
+        elif not write and trace_load:
+            writer.record(KIND_LOAD | (SIZE_LOG2[size] << 8), addr, 0)
+    if trace_load or trace_mem:
+        iss.trace = trace
+    # pc -> (branch type, target of the conditional branch)
+    branches = {}
+    count = 0
+    while count < max_instr:
+        pc = iss.pc
+        iss.step()
+        count += 1
+        writer.cycle = count
+        if trace_branch and not iss.trapped:
+            if pc not in branches:
+                instr = memory.fetch(pc) or 0
+                imm_b = sext((((instr >> 31) & 1) << 12) | (((instr >> 7) & 1) << 11) |
+                             (((instr >> 25) & 0x3F) << 5) | (((instr >> 8) & 0xF) << 1), 13)
+                branches[pc] = (branch_type(instr), (pc + imm_b) & MASK)
+            btype, target = branches[pc]
+            if btype is not None:
+                if btype != BRANCH_COND:
+                    target = iss.pc
+                taken = iss.pc == target
+                writer.record(KIND_BRANCH | (btype << 12) | (BRANCH_TAKEN if taken else 0), pc, target)
+        if iss.pc == pc:
+            break
+    writer.close()
+    return count
+
+def cmdParser():
+    parser = argparse.ArgumentParser(description='Capture the load/store and branch trace of a program with the ISS')
+    parser.add_argument('file_name', type=str, help='The program name')
+    parser.add_argument('file_path', type=str, help='The directory of the program')
+    parser.add_argument('-o', type=str, dest='output', required=True, help='The output trace file')
+    parser.add_argument('-max', type=int, default=100000000, nargs='?', help='Maximum number of instructions')
+    parser.add_argument('-kinds', '-k', type=str, default='load,mem', nargs='?', help='Record kinds: load,mem,branch')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = cmdParser()
+    count = capture_trace(args.file_name, args.file_path, args.output, args.max, args.kinds.split(','))
+    print(f"Executed {count} instructions, trace written to {args.output}")
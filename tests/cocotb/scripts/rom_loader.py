@@ -0,0 +1,150 @@
+##################################################################################################
+##
+## Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+##
+## ~~~ Hardware in SpinalHDL ~~~
+##
+## Author: Heqing Huang
+## Date Created: 10/17/2026
+##
+## ================== Description ==================
+##
+## Create the instruction/data ram images for the testbench
+##
+## The program is read from the ELF file when it is available, otherwise from the
+## verilog hex file generated by objcopy. Each ram is written as one file per byte lane
+## (<rom>.0, <rom>.1, ...) so the testbench can $readmemh them directly into the ram
+## symbols of the SoC without any copy loop.
+##
+##################################################################################################
+
+import os
+import struct
+
+IMEM_BASE = 0x20000000
+DMEM_BASE = 0x80000000
+# Address window of each memory. Anything outside of them (e.g. .tohost) is dropped.
+MEM_WINDOW = 0x08000000
+
+# Number of byte lanes of the instruction/data ram of each SoC
+RAM_LANES = {
+    "arty": (4, 4),
+    "de2" : (4, 2),
+}
+
+ELF_MAGIC = b'\x7fELF'
+PT_LOAD = 1
+SHT_SYMTAB = 2
+
+###############################
+# Read the program
+###############################
+
+def read_elf(file):
+    """ Read the loadable segments of a 32 bits little endian ELF file
+
+        @return: list of (physical address, data)
+    """
+    with open(file, 'rb') as f:
+        elf = f.read()
+    phoff, = struct.unpack_from('<I', elf, 28)
+    phentsize, phnum = struct.unpack_from('<HH', elf, 42)
+    segments = []
+    for i in range(phnum):
+        p_type, p_offset, _, p_paddr, p_filesz, _, _, _ = struct.unpack_from('<8I', elf, phoff + i * phentsize)
+        if p_type == PT_LOAD and p_filesz > 0:
+            segments.append((p_paddr, elf[p_offset:p_offset+p_filesz]))
+    return segments
+
+def read_symbols(file):
+    """ Read the symbol table of a 32 bits little endian ELF file
+
+        @return: dict of symbol name to value
+    """
+    with open(file, 'rb') as f:
+        elf = f.read()
+    shoff, = struct.unpack_from('<I', elf, 32)
+    shentsize, shnum = struct.unpack_from('<HH', elf, 46)
+    sections = [struct.unpack_from('<10I', elf, shoff + i * shentsize) for i in range(shnum)]
+    symbols = {}
+    for _, sh_type, _, _, sh_offset, sh_size, sh_link, _, _, sh_entsize in sections:
+        if sh_type != SHT_SYMTAB:
+            continue
+        strtab = sections[sh_link][4]
+        for offset in range(sh_offset, sh_offset + sh_size, sh_entsize):
+            st_name, st_value = struct.unpack_from('<II', elf, offset)
+            if st_name:
+                end = elf.index(b'\0', strtab + st_name)
+                symbols[elf[strtab+st_name:end].decode()] = st_value
+    return symbols
+
+def find_symbol(file_name, file_path, name):
+    """ Address of a symbol of the program, name can also be an address """
+    try:
+        return int(name, 0)
+    except ValueError:
+        pass
+    symbols = read_symbols(f'{file_path}/{file_name}')
+    if name not in symbols:
+        raise KeyError(f"Symbol {name} is not found in {file_name}")
+    return symbols[name]
+
+def read_verilog(file):
+    """ Read the verilog hex file generated by objcopy
+
+        @return: list of (address, data)
+    """
+    segments = []
+    addr = 0
+    data = bytearray()
+    with open(file) as f:
+        for line in f:
+            if line[0] == '@':
+                if data:
+                    segments.append((addr, data))
+                addr = int(line[1:], 16)
+                data = bytearray()
+            else:
+                data += bytes.fromhex(line)
+    if data:
+        segments.append((addr, data))
+    return segments
+
+def read_program(file_name, file_path):
+    """ Read the program from the ELF file if it still exists or from the verilog file """
+    elf = f'{file_path}/{file_name}'
+    if os.path.isfile(elf):
+        with open(elf, 'rb') as f:
+            if f.read(4) == ELF_MAGIC:
+                return read_elf(elf)
+    return read_verilog(f'{file_path}/{file_name}.verilog')
+
+###############################
+# Create the ram images
+###############################
+
+def build_image(segments, base):
+    """ Map the segments within the memory window into a single image starting at base """
+    segments = [(addr - base, data) for addr, data in segments if base <= addr < base + MEM_WINDOW]
+    size = max([offset + len(data) for offset, data in segments], default=0)
+    image = bytearray((size + 3) & ~3)
+    for offset, data in segments:
+        image[offset:offset+len(data)] = data
+    return image
+
+def write_lanes(image, rom, lanes):
+    """ Write the image as one $readmemh file per byte lane """
+    for lane in range(lanes):
+        with open(f'{rom}.{lane}', 'w') as f:
+            data = image[lane::lanes]
+            if data:
+                f.write('@0\n')
+                f.write(data.hex('\n'))
+                f.write('\n')
+
+def create_rom_files(file_name, file_path, soc='arty'):
+    """ Create instr_ram.rom.<lane> and data_ram.rom.<lane> in the current directory """
+    segments = read_program(file_name, file_path)
+    imem_lanes, dmem_lanes = RAM_LANES[soc]
+    write_lanes(build_image(segments, IMEM_BASE), 'instr_ram.rom', imem_lanes)
+    write_lanes(build_image(segments, DMEM_BASE), 'data_ram.rom', dmem_lanes)
@@ -15,10 +15,42 @@
 ##################################################################################################
 
 import os
+import sys
+import glob
+import json
+import time
+import shutil
 import argparse
+import hashlib
+import subprocess
+import multiprocessing
+import xml.etree.ElementTree as ET
 
 from get_all_tests import *
 
+# Directory holding the per-test sandboxes when running in parallel
+WORK_DIR = 'work'
+# Directory holding the shared simulation models, one sub directory per SoC/RTL hash
+SIM_BUILD_CACHE = f"{REPO_ROOT}/tests/cocotb/output/sim_build"
+# Directory holding the test result cache used by the incremental regression
+RESULT_CACHE = f"{REPO_ROOT}/tests/cocotb/output/result_cache"
+# Directory holding the sandboxes of the failing tests rerun with the waveform dump
+RERUN_DIR = 'rerun'
+# Number of cycles dumped before the failure in the rerun
+RERUN_WINDOW = 1000
+# Failure record of a test written by sim_dump.py, used to place the dump window
+FAIL_FILE = '{}.fail.json'
+# Files of a rerun attached to the report
+RERUN_ARTIFACTS = ['*.fst', '*.vcd', '*.trace', '*.fail.json', '*.console.log', 'run.log']
+# Regression report
+REPORT_JSON = 'report.json'
+REPORT_JUNIT = 'report.xml'
+# Environment variables changing how a test runs or its result, part of the result cache key
+TEST_ENV = ['SIM', 'COSIM', 'TRACE', 'PROFILE', 'FAST_UART', 'SNAPSHOT', 'SNAPSHOT_AT', 'SNAPSHOT_FILE',
+            'DUMP_WINDOW', 'DUMP_SCOPE', 'DUMP_FST', 'VL_THREADS', 'VL_OPT', 'VL_PGO']
+# Python testbench files used by each test, defined once in tests/cocotb/makefile
+TB_SCRIPTS = os.getenv('TB_SCRIPTS', '').split()
+
 #####################################
 # Utility function
 #####################################
@@ -29,44 +61,278 @@ def cmdParser():
     parser.add_argument('-timeout', '-to', type=str, required=True, nargs='?', help='Timeout value')
     parser.add_argument('-test', '-t', type=str, required=True, nargs='?', help='The test you want to run')
     parser.add_argument('-dump', '-d', type=str, required=True, nargs='?', help='Dump the waveform')
+    parser.add_argument('-jobs', '-j', type=int, default=1, nargs='?', help='Number of tests to run in parallel')
+    parser.add_argument('-build_once', '-b', type=int, default=0, nargs='?', help='Build the simulation model once and reuse it')
+    parser.add_argument('-incremental', '-i', type=int, default=0, nargs='?', help='Only run the tests whose inputs changed or failed last time')
+    parser.add_argument('-rerun', '-r', type=int, default=0, nargs='?', help='Rerun the failing tests with the waveform dump around the failure')
     return parser.parse_args()
 
+def build_key(config):
+    """ Hash the build configuration and the content of all the verilog sources """
+    sha = hashlib.sha1(config.encode())
+    sources = config.rstrip().split('\n')[-1].split()
+    for source in sources:
+        with open(source, 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()[:16]
+
+def test_key(base_key, test, path):
+    """ Hash the inputs of a test: the RTL/testbench key and the test program """
+    sha = hashlib.sha1(base_key.encode())
+    for file in [f'{path}/{test}.verilog', f'{path}/{test}']:
+        if os.path.isfile(file):
+            with open(file, 'rb') as f:
+                sha.update(f.read())
+    return sha.hexdigest()[:16]
+
+def check_result(file='results.xml'):
+    """ Check the test result in the cocotb result file """
+    if not os.path.isfile(file):
+        return False
+    with open(file) as f:
+        contents = f.read()
+    search_word = "<failure />"
+    return not (search_word in contents)
+
+def create_sandbox(test, root=WORK_DIR):
+    """ Create a work directory for a test so it does not share any file with other tests """
+    workdir = os.path.abspath(os.path.join(root, test))
+    os.system(f"rm -rf {workdir}")
+    os.makedirs(workdir)
+    for script in TB_SCRIPTS:
+        os.symlink(os.path.realpath(script), os.path.join(workdir, script))
+    return workdir
+
+def run_sandbox_test(task):
+    """ Run a single test inside its sandbox. Executed in the worker process """
+    test, cmd, workdir = task
+    env = dict(os.environ, PWD=workdir)
+    with open(os.path.join(workdir, 'run.log'), 'w') as log:
+        subprocess.run(cmd, shell=True, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return test, check_result(os.path.join(workdir, 'results.xml'))
+
+def collect_artifacts(workdir):
+    """ The debug files created by a rerun """
+    artifacts = []
+    for pattern in RERUN_ARTIFACTS:
+        artifacts += sorted(glob.glob(os.path.join(workdir, pattern)))
+    return artifacts
+
+def write_junit(report, file):
+    """ Write the report as JUnit XML, the rerun artifacts are listed as attachments in system-out """
+    tests = report['tests']
+    failures = sum(entry['result'] != 'PASS' for entry in tests.values())
+    suite = ET.Element('testsuite', name=report['name'], tests=str(len(tests)), failures=str(failures),
+                       timestamp=report['date'])
+    for test, entry in tests.items():
+        case = ET.SubElement(suite, 'testcase', classname=f"{report['soc']}.{report['name']}", name=test)
+        if entry['result'] == 'PASS':
+            continue
+        rerun = entry.get('rerun', {})
+        failure = rerun.get('failure') or {}
+        message = failure.get('reason', 'Test Failed')
+        if 'cycle' in failure:
+            message += f" at cycle {failure['cycle']}"
+        ET.SubElement(case, 'failure', message=message).text = entry.get('command', '')
+        if rerun:
+            out = [f"rerun: {rerun['command']}"]
+            out += [f"[[ATTACHMENT|{artifact}]]" for artifact in rerun['artifacts']]
+            ET.SubElement(case, 'system-out').text = '\n'.join(out)
+    ET.ElementTree(suite).write(file, encoding='utf-8', xml_declaration=True)
+
 #####################################
 # Main Class
 #####################################
 
 class AllTests:
-    def __init__(self, soc, timeout, dump, f_get_all_tests):
+    def __init__(self, soc, timeout, dump, f_get_all_tests, jobs=1, build_once=False, cache_file=None,
+                 rerun=False, name='tests'):
+        self.name = name
         self.soc = soc
         self.timeout = timeout
         self.dump = dump
+        self.jobs = jobs
+        self.build_once = build_once
+        self.sim_build = None
+        # result cache used in incremental mode: test => {'key': hash, 'result': bool}
+        self.cache_file = cache_file
+        self.cache = {}
+        self.keys = {}
+        self.cached = set()
         self.cmds = {}
         self.results = {}
         self.failed_tests = []
+        # directory where each test ran, holding its failure record
+        self.workdirs = {}
+        # rerun of the failing tests: test => {'command', 'workdir', 'result', 'failure', 'artifacts'}
+        self.rerun = rerun
+        self.reruns = {}
         # a hash table containing all the test name and it's path
         self.tests = f_get_all_tests()
 
     def check_result(self):
         """ Check the test result """
-        with open('results.xml') as file:
-            contents = file.read()
-            search_word = "<failure />"
-            file.close()
-            return not (search_word in contents)
+        return check_result()
+
+    def make_cmd(self, test, path, sim_build=None):
+        """ The makefile command to run a test """
+        cmd = f'make TIMEOUT={self.timeout} TESTNAME={test} TESTPATH={path} SOC={self.soc} DUMP={self.dump}'
+        sim_build = sim_build or self.sim_build
+        if sim_build:
+            cmd += f' SIM_BUILD={sim_build}'
+        return cmd
+
+    def build_config(self, options=''):
+        """ Generate the RTL and get the build configuration with all the verilog sources """
+        os.system(f"make rtl SOC={self.soc}")
+        return subprocess.run(f"make -s print_build_config SOC={self.soc} DUMP={self.dump} {options}",
+                              shell=True, stdout=subprocess.PIPE).stdout.decode()
+
+    def build_model(self, options='', config=None):
+        """ Build the simulation model into a shared directory keyed by the SoC/RTL hash
+
+            @param options: extra make variables changing the model, e.g. DUMP_WINDOW
+            @param config: the build configuration if it is already generated with the same options
+            @return: the model directory
+        """
+        config = config or self.build_config(options)
+        sim_build = f"{SIM_BUILD_CACHE}/{self.soc}_{build_key(config)}"
+        print(f"Using simulation model in {sim_build}")
+        if os.system(f"make build_model SOC={self.soc} DUMP={self.dump} SIM_BUILD={sim_build} {options}") != 0:
+            raise RuntimeError("Failed to build the simulation model")
+        return sim_build
 
     def run_test(self, test, path):
         """ invoke makefile to run a test """
-        cmd = f'make TIMEOUT={self.timeout} TESTNAME={test} TESTPATH={path} SOC={self.soc} DUMP={self.dump}'
+        cmd = self.make_cmd(test, path)
         self.cmds[test] = cmd
+        self.workdirs[test] = os.getcwd()
         os.system(cmd)
         self.results[test] = self.check_result()
 
     def run_all_tests(self):
         """ Run all the tests """
         print(self.tests)
-        for test, path in self.tests.items():
+        if self.jobs > 1:
+            self.run_all_tests_parallel()
+            return
+        for test, path in self.tests_to_run():
             self.run_test(test, path)
 
+    def tests_to_run(self):
+        """ All the tests except the ones taken from the result cache """
+        return [(test, path) for test, path in self.tests.items() if test not in self.cached]
+
+    def run_all_tests_parallel(self):
+        """ Run all the tests in a process pool, each test in its own sandbox """
+        os.system(f"rm -rf {WORK_DIR}")
+        tasks = []
+        for test, path in self.tests_to_run():
+            workdir = create_sandbox(test)
+            cmd = self.make_cmd(test, path)
+            self.cmds[test] = f'cd {workdir} && {cmd}'
+            self.workdirs[test] = workdir
+            tasks.append((test, cmd, workdir))
+        with multiprocessing.Pool(self.jobs) as pool:
+            for test, result in pool.imap_unordered(run_sandbox_test, tasks):
+                self.results[test] = result
+                print(f"[{len(self.results)}/{len(tasks)}] {test}: {'PASS' if result else 'FAIL'}")
+
+    def rerun_failed(self):
+        """ Rerun the failing tests in parallel with the waveform dump of the cycles before the
+            failure and the pc trace, each test in its own sandbox
+        """
+        failed = [test for test in self.failed_tests if test in self.workdirs]
+        if not failed:
+            return
+        # the windowed dump needs a model built with the dump control
+        sim_build = self.build_model('DUMP_WINDOW=fail') if self.build_once else None
+        os.system(f"rm -rf {RERUN_DIR}")
+        tasks = []
+        for test in failed:
+            workdir = create_sandbox(test, RERUN_DIR)
+            cmd = self.make_cmd(test, self.tests[test], sim_build) + ' TRACE=pc'
+            record = os.path.join(self.workdirs[test], FAIL_FILE.format(test))
+            if os.path.isfile(record):
+                shutil.copy(record, workdir)
+                cmd += f' DUMP_WINDOW=fail:{RERUN_WINDOW} DUMP_FST=1'
+            self.reruns[test] = {'command': f'cd {workdir} && {cmd}', 'workdir': workdir}
+            tasks.append((test, cmd, workdir))
+        print(f"Rerunning {len(tasks)} failing tests with the waveform dump")
+        with multiprocessing.Pool(min(len(tasks), os.cpu_count())) as pool:
+            for test, result in pool.imap_unordered(run_sandbox_test, tasks):
+                rerun = self.reruns[test]
+                rerun['result'] = 'PASS' if result else 'FAIL'
+                rerun['artifacts'] = collect_artifacts(rerun['workdir'])
+                record = os.path.join(rerun['workdir'], FAIL_FILE.format(test))
+                if os.path.isfile(record):
+                    with open(record) as f:
+                        rerun['failure'] = json.load(f)
+                print(f"[rerun] {test}: {rerun['result']}, {len(rerun['artifacts'])} artifacts in {rerun['workdir']}")
+
+    def write_report(self):
+        """ Write the test results with the rerun artifacts as JSON and JUnit XML """
+        tests = {}
+        for test in self.tests:
+            if test not in self.results:
+                continue
+            entry = {
+                'result': 'PASS' if self.results[test] else 'FAIL',
+                'cached': test in self.cached,
+                'path':   self.tests[test],
+            }
+            if test in self.cmds:
+                entry['command'] = self.cmds[test]
+            if test in self.reruns:
+                entry['rerun'] = self.reruns[test]
+            tests[test] = entry
+        report = {
+            'name':  self.name,
+            'soc':   self.soc,
+            'date':  time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'tests': tests,
+        }
+        with open(REPORT_JSON, 'w') as f:
+            json.dump(report, f, indent=2)
+        write_junit(report, REPORT_JUNIT)
+
+    def load_cache(self, config):
+        """ Take the result of the unchanged and passing tests from the result cache
+
+            The key of each test covers the generated RTL, the testbench, the test program,
+            the timeout, the dump and the test options in TEST_ENV so any change to them
+            invalidates the result.
+
+            @param config: the build configuration
+        """
+        config += f"TIMEOUT={self.timeout} DUMP={self.dump}\n"
+        config += ''.join(f"{name}={os.getenv(name, '')}\n" for name in TEST_ENV)
+        sha = hashlib.sha1(build_key(config).encode())
+        for script in TB_SCRIPTS:
+            with open(script, 'rb') as f:
+                sha.update(f.read())
+        base_key = sha.hexdigest()
+        if os.path.isfile(self.cache_file):
+            with open(self.cache_file) as f:
+                self.cache = json.load(f)
+        for test, path in self.tests.items():
+            self.keys[test] = test_key(base_key, test, path)
+            entry = self.cache.get(test)
+            if entry and entry['key'] == self.keys[test] and entry['result']:
+                self.results[test] = True
+                self.cached.add(test)
+        print(f"{len(self.cached)} tests unchanged since they last passed, "
+              f"{len(self.tests) - len(self.cached)} tests to run")
+
+    def save_cache(self):
+        """ Store the result of the tests run in this regression into the result cache """
+        for test, result in self.results.items():
+            if test not in self.cached:
+                self.cache[test] = {'key': self.keys[test], 'result': result}
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        with open(self.cache_file, 'w') as f:
+            json.dump(self.cache, f, indent=2, sort_keys=True)
+
     def print_result(self):
         translate = {
             True: "PASS",
@@ -76,12 +342,15 @@ class AllTests:
         print("=======================================")
         print("              Tests Result             ")
         print("=======================================")
-        for test, result in self.results.items():
+        for test in self.tests:
+            if test not in self.results:
+                continue
+            result = self.results[test]
             pass_or_fail = translate[result]
             final_pass = final_pass & result
             print(test + ": " + str(pass_or_fail), end='')
             if pass_or_fail == 'PASS':
-                print()
+                print(' (cached)' if test in self.cached else '')
             else:
                 print('    ---- ' + test + ' ----')
                 self.failed_tests.append(test)
@@ -96,20 +365,38 @@ class AllTests:
         """ Print the command for failed test """
         for t in self.failed_tests:
             print(self.cmds[t])
+            if t in self.reruns:
+                print(f"    debug files: {self.reruns[t]['workdir']}")
 
     def allTasks(self):
         """ Run all the Tasks """
         os.system("make clean_all")
+        # generate the RTL once for the result cache and the shared model
+        config = self.build_config() if self.cache_file or self.build_once else None
+        if self.cache_file:
+            self.load_cache(config)
+        if self.build_once:
+            self.sim_build = self.build_model(config=config)
         self.run_all_tests()
+        if self.cache_file:
+            self.save_cache()
         self.print_result()
+        if self.rerun:
+            self.rerun_failed()
+        self.write_report()
         self.print_cmd()
         os.system("rm -rf *.verilog")
 
 if __name__ == '__main__':
     args = cmdParser()
+    if not TB_SCRIPTS:
+        sys.exit("TB_SCRIPTS is not set, run the tests from tests/cocotb/makefile")
     soc = args.soc
     to = args.timeout
     dump = args.dump
     test = args.test
-    run = AllTests(soc, to, dump, get_all_tests(test))
+    jobs = args.jobs
+    build_once = args.build_once == 1
+    cache_file = f"{RESULT_CACHE}/{soc}_{test}.json" if args.incremental == 1 else None
+    run = AllTests(soc, to, dump, get_all_tests(test), jobs, build_once, cache_file, args.rerun == 1, test)
     run.allTasks()
\ No newline at end of file
@@ -0,0 +1,85 @@
+##################################################################################################
+##
+## Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+##
+## ~~~ Hardware in SpinalHDL ~~~
+##
+## Author: Heqing Huang
+## Date Created: 10/17/2026
+##
+## ================== Description ==================
+##
+## Run CoreMark and capture the uart output
+##
+## The clock runs at the frequency of the board so the baudrate programmed by the software
+## matches the uart monitor. The output is written to coremark.log.
+## With FAST_UART=1 the output is captured from the uart APB bus (uart_console.py) instead.
+##
+##################################################################################################
+
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import with_timeout
+from cocotb.result import SimTimeoutError
+from cocotbext.uart import UartSink
+
+import os
+
+from run_one_test import process_rom_file, reset, TIME_OUT, FAST_UART
+from coremark_bench import CLK_MHZ, LOG_FILE, finished, parse_coremark
+from sim_profile import SimProfiler
+from uart_console import UartConsole
+
+BAUDRATE = 115200
+
+async def capture_uart(sink, log):
+    """ Capture the uart output until coremark finishes """
+    text = ""
+    while not finished(text):
+        data = await sink.read()
+        text += data.decode(errors='replace')
+        log.write(data.decode(errors='replace'))
+        log.flush()
+    return text
+
+async def capture_console(console):
+    """ Wait until coremark finishes, the console writes the log """
+    while not finished(console.text):
+        await console.wait_line()
+    return console.text
+
+@cocotb.test()
+def coremark(dut):
+    """ CoreMark """
+    file_name = os.getenv('TEST_NAME')
+    file_path = os.getenv('TEST_PATH')
+    soc = os.getenv('SoC', 'arty')
+    process_rom_file(file_name, file_path)
+    clock = Clock(dut.io_clk, round(1e6 / CLK_MHZ[soc]), units="ps")
+    cocotb.fork(clock.start())
+    if FAST_UART:
+        console = UartConsole(dut, LOG_FILE)
+        cocotb.fork(console.start())
+        capture = capture_console(console)
+    else:
+        sink = UartSink(dut.io_uart0_txd, baud=BAUDRATE, bits=8)
+        log = open(LOG_FILE, 'w')
+        capture = capture_uart(sink, log)
+    yield reset(dut)
+    profiler = SimProfiler.fromEnv(period=1e3 / CLK_MHZ[soc], log=dut._log)
+    if profiler:
+        profiler.start()
+    try:
+        text = yield with_timeout(capture, TIME_OUT, "ns")
+    except SimTimeoutError:
+        assert False, "Time out"
+    finally:
+        if profiler:
+            profiler.report('coremark')
+        if FAST_UART:
+            console.close()
+        else:
+            log.close()
+    result = parse_coremark(text, soc)
+    assert not result['errors'], '\n'.join(result['errors'])
+    dut._log.info(f"CoreMark/MHz: {result['coremark_per_mhz']:.4f}, {result['cycles']} cycles")
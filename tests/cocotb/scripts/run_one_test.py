@@ -15,11 +15,21 @@
 
 import cocotb
 from cocotb.clock import Clock
-from cocotb.triggers import FallingEdge, Timer
+from cocotb.triggers import FallingEdge, Timer, Edge, First, ReadOnly, with_timeout
+from cocotb.result import SimTimeoutError
 
 import os
 import subprocess
 
+from rom_loader import create_rom_files
+from sim_trace import Tracer
+from cosim import CoSim
+from sim_profile import SimProfiler
+from uart_console import UartConsole
+from sim_snapshot import SimSnapshot
+from sim_dump import DumpControl, write_failure
+from sim_util import CLOCK_PERIOD, current_cycle
+
 subprocess_run = subprocess.Popen("git rev-parse --show-toplevel", shell=True, stdout=subprocess.PIPE)
 subprocess_return = subprocess_run.stdout.read()
 REPO_ROOT = subprocess_return.decode().rstrip()
@@ -29,39 +39,20 @@ REPO_ROOT = subprocess_return.decode().rstrip()
 ###############################
 
 def process_rom_file(file_name, file_path):
-    """ Split the text and data section for the generated verilog file """
+    """ Create the instruction and data ram images for the test """
     print(file_name, file_path)
-    # Link the instruction rom file to the tb directory
-    SRC_FILE = f'/{file_path}/{file_name}.verilog'
-    ROM_FILE = os.getcwd() + f'/{file_name}.verilog' # need to link the instruction ram file the the current directory
-    if os.path.isfile(ROM_FILE):
-        os.remove(ROM_FILE)
-    os.symlink(SRC_FILE, ROM_FILE)
     os.system(f"ln -s {REPO_ROOT}/*.bin {os.getcwd()}/.")
-    FP = open(f'{file_name}.verilog', "r")
-    IRAM_FP = open('instr_ram.rom', "w")
-    DRAM_FP = open('data_ram.rom', "w")
-    iram = True
-    FP.readline() # get ride of the first address line
-    for line in FP.readlines():
-        if line.rstrip() == "@80000000":
-            iram = False
-            continue
-        if iram:
-            IRAM_FP.write(line)
-        else:
-            DRAM_FP.write(line)
-    FP.close()
-    IRAM_FP.close()
-    DRAM_FP.close()
-    os.system("sed -i 's/@2/@0/' instr_ram.rom")
+    create_rom_files(file_name, file_path, os.getenv('SoC', 'arty'))
+
+def get_finish_regs(dut):
+    """ Look up the handles of x1, x2 and x3 used to report the test result """
+    regfile = dut.DUT_AppleRISCVSoC.core.regfile_inst
+    return [regfile.ram[idx] for idx in range(1, 4)]
 
-def check_finish(dut):
+def check_finish(regs):
     """ Check if the rest is finished or not """
     try:
-        reg1 = dut.DUT_AppleRISCVSoC.core.regfile_inst.ram[1].value.integer
-        reg2 = dut.DUT_AppleRISCVSoC.core.regfile_inst.ram[2].value.integer
-        reg3 = dut.DUT_AppleRISCVSoC.core.regfile_inst.ram[3].value.integer
+        reg1, reg2, reg3 = [reg.value.integer for reg in regs]
     except ValueError:
         reg1 = 'X'
         reg2 = 'X'
@@ -72,39 +63,54 @@ def check_finish(dut):
         return True, False
     return False, False
 
-async def register_write_tracer(dut, reg):
-    """ DUMP register write information for a single register """
-    while True:
-        await FallingEdge(dut.io_clk)
-        path = dut.DUT_AppleRISCVSoC.core.regfile_inst
-        wr = path.register_wr.value
-        idx = path.register_wr_addr.value
-        hit = wr == 1 and idx == reg
-        if hit:
-            try:
-                value = hex(path.rd_wdata.value.integer)
-            except ValueError:
-                value = 'XXXX'
-            pc = hex(dut.DUT_AppleRISCVSoC.core.ex2mem_pc.value.integer + 4)
-            print(f"Writing Register {reg} with value {value}, PC = {pc}")
-
-async def dump_pc_sequence(dut, FH):
-    """ dump pc sequence """
-    prev_pc = hex(0x20000000)
+async def wait_finish(regs):
+    """ Wait until the test finishes and return the test result
+
+        The pass/fail condition can only become true when one of x1, x2, x3 is written,
+        so we only wake up on the register file write instead of polling.
+    """
     while True:
-        await FallingEdge(dut.io_clk)
-        new_pc = hex(dut.DUT_AppleRISCVSoC.core.pc_inst.pc_value.value.integer)
-        if prev_pc != new_pc:
-            prev_pc = new_pc
-            FH.write(prev_pc)
-            FH.write("\n")
+        await First(*[Edge(reg) for reg in regs])
+        await ReadOnly()
+        finished, passed = check_finish(regs)
+        if finished:
+            return passed
+
+def record_failure(dut, file_name, reason):
+    """ Record the failure cycle so the rerun can dump the cycles before it (DUMP_WINDOW=fail) """
+    try:
+        pc = dut.DUT_AppleRISCVSoC.core.ex2mem_pc.value.integer
+    except ValueError:
+        pc = None
+    write_failure(file_name, current_cycle(), pc, reason)
 
 ###############################
 # Test suites
 ###############################
 
-TIMER_DELTA = 1000
 TIME_OUT = int(os.getenv('TIME_OUT'))
+# Comma separated trace kinds: pc, reg, mem, load. Empty to disable tracing.
+TRACE = os.getenv('TRACE', '')
+# Check the design against the python ISS in lockstep
+COSIM = os.getenv('COSIM', '0') == '1'
+# Simulation only SoC, the uart output is only available from the uart console
+FAST_UART = os.getenv('FAST_UART', '0') == '1'
+# save: save the simulation state when SNAPSHOT_AT (symbol or address) retires
+# restore: start from the saved state instead of running the boot code
+SNAPSHOT = os.getenv('SNAPSHOT', '')
+SNAPSHOT_AT = os.getenv('SNAPSHOT_AT', '') or 'main'
+SNAPSHOT_FILE = os.getenv('SNAPSHOT_FILE', '')
+
+def start_console(dut, file_name):
+    """ Capture the uart output into <test>.console.log """
+    try:
+        console = UartConsole(dut, f"{file_name}.console.log", dut._log)
+    except AttributeError:
+        # the uart0 instance is not named in the RTL generated before the console was added
+        assert not FAST_UART, "uart0 is not found in the RTL"
+        return None
+    cocotb.fork(console.start())
+    return console
 
 async def reset(dut, time=20):
     """ Reset the design """
@@ -116,29 +122,69 @@ async def reset(dut, time=20):
 @cocotb.test()
 def test(dut):
     """ RISCV TEST """
-    runtime = 2000
     file_name = os.getenv('TEST_NAME')
     file_path = os.getenv('TEST_PATH')
-    total_time = 0
-    timeout = False
     process_rom_file(file_name, file_path)
-    pc_file = open(f"{file_name}_pc.txt", "w")
     # Test start
-    clock = Clock(dut.io_clk, 10, units="ns")  # Create a 10us period clock on port clk
+    clock = Clock(dut.io_clk, CLOCK_PERIOD, units="ns")  # Create a 10us period clock on port clk
     cocotb.fork(clock.start())  # Start the clock
+    regs = get_finish_regs(dut)
     yield reset(dut)
-    #cocotb.fork(register_write_tracer(dut, 2))  # Check Register 2
-    #cocotb.fork(dump_pc_sequence(dut, pc_file))  # Check Register 2
-    yield Timer(runtime, units="ns")
-    finished, passed = False, False
-    while not finished and not timeout:
-        yield Timer(TIMER_DELTA, units="ns")
-        finished, passed = check_finish(dut)
-        total_time += TIMER_DELTA
-        if total_time > TIME_OUT:
-            timeout = True
-            assert False, "Time out"
+    assert SNAPSHOT in ('', 'save', 'restore'), f"Unknown SNAPSHOT mode {SNAPSHOT}"
+    snapshot = None
+    restored = None
+    if SNAPSHOT:
+        snapshot = SimSnapshot(dut, file_name, file_path, SNAPSHOT_FILE or f"{file_name}.snapshot", dut._log)
+    if SNAPSHOT == 'restore':
+        # the ISS can not start from the middle of the program
+        assert not COSIM, "COSIM can not be used with SNAPSHOT=restore"
+        restored = yield snapshot.restore()
+    dump = DumpControl.fromEnv(dut, file_name, file_path, dut._log)
+    if dump:
+        dump.start()
+    tracer = None
+    if TRACE:
+        tracer = Tracer(dut, f"{file_name}.trace", TRACE.split(','))
+        cocotb.fork(tracer.start())
+    cosim = None
+    if COSIM:
+        cosim = CoSim(dut, file_name, file_path)
+        cocotb.fork(cosim.start())
+    console = start_console(dut, file_name)
+    if console and restored:
+        for char in restored['console']:
+            console.put(char)
+    if SNAPSHOT == 'save':
+        cocotb.fork(snapshot.save_at(SNAPSHOT_AT, console))
+    profiler = SimProfiler.fromEnv(period=CLOCK_PERIOD, log=dut._log)
+    if profiler:
+        profiler.start()
+    finish = cocotb.fork(wait_finish(regs))
+    try:
+        if cosim:
+            # stop at the first divergence
+            yield with_timeout(First(finish.join(), cosim.diverged.wait()), TIME_OUT, "ns")
+        else:
+            yield with_timeout(finish.join(), TIME_OUT, "ns")
+        passed = None if cosim and cosim.error else finish.retval
+    except SimTimeoutError:
+        passed = None
+    finally:
+        if tracer:
+            tracer.close()
+        if profiler:
+            profiler.report(file_name)
+        if console:
+            console.close()
+    if not passed:
+        record_failure(dut, file_name, cosim.error if cosim and cosim.error else
+                       "Time out" if passed is None else "Test Failed")
 
     # check result
-    pc_file.close()
+    if cosim:
+        assert cosim.error is None, cosim.error
+        print(f"Co-simulation matched {cosim.retired} retired instructions")
+    if SNAPSHOT == 'save':
+        assert snapshot.saved, f"The snapshot marker {SNAPSHOT_AT} is never reached"
+    assert passed is not None, "Time out"
     assert passed, "Test Failed"
@@ -0,0 +1,172 @@
+#!/usr/bin/python3
+##################################################################################################
+##
+## Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+##
+## ~~~ Hardware in SpinalHDL ~~~
+##
+## Author: Heqing Huang
+## Date Created: 10/17/2026
+##
+## ================== Description ==================
+##
+## Verilator build setting benchmark
+##
+## Build the SoC model with each Verilator setting (see verilator.mk), run CoreMark on it and
+## report the build time and the simulated cycles per second (from sim_profile.py).
+##
+## Setting: '+' separated options, 'base' for the default build
+##   O3     -O3 and --x-assign fast (VL_OPT=1)
+##   t<n>   n threads (VL_THREADS=n)
+##   pgo    build a profiling model, train it with one CoreMark run, then rebuild with the
+##          profile (VL_PGO=gen then VL_PGO=use)
+##
+##   python3 sim_bench.py -soc arty -settings base,O3,O3+t2,O3+t4,O3+t4+pgo
+##
+##################################################################################################
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+from coremark_bench import COREMARK_PATH, LOG_FILE, parse_coremark
+
+WORK_DIR    = os.path.abspath('sim_bench')
+RESULT_FILE = 'sim_bench.json'
+PROFILE_FILE = 'coremark.profile.json'
+
+#####################################
+# Utility function
+#####################################
+
+def parse_setting(setting):
+    """ Convert a setting into the make variables
+
+        @return: (make variables, use pgo)
+    """
+    variables = {}
+    pgo = False
+    for option in setting.split('+'):
+        if option == 'base':
+            continue
+        elif option == 'O3':
+            variables['VL_OPT'] = 1
+        elif option == 'pgo':
+            pgo = True
+        elif option.startswith('t') and option[1:].isdigit():
+            variables['VL_THREADS'] = int(option[1:])
+        else:
+            raise ValueError(f"Unknown setting {option} in {setting}")
+    return variables, pgo
+
+def make(target, variables, log):
+    """ Run make and return the elapsed time, raise if make fails """
+    args = ' '.join(f"{key}={value}" for key, value in variables.items())
+    start = time.time()
+    with open(log, 'w') as f:
+        ret = subprocess.run(f"make {target} {args}", shell=True, stdout=f, stderr=subprocess.STDOUT).returncode
+    if ret != 0:
+        raise RuntimeError(f"make {target} failed, see {log}")
+    return time.time() - start
+
+class SimBench:
+    def __init__(self, soc, timeout, fast_uart):
+        self.soc = soc
+        self.common = {
+            'SIM':       'verilator',
+            'SOC':       soc,
+            'FAST_UART': fast_uart,
+        }
+        self.run_vars = {
+            'MODULE':   'run_coremark',
+            'TESTNAME': 'coremark',
+            'TESTPATH': COREMARK_PATH,
+            'TIMEOUT':  timeout,
+            'PROFILE':  1,
+        }
+
+    def build(self, name, variables):
+        sim_build = os.path.join(WORK_DIR, name)
+        variables = dict(self.common, **variables, SIM_BUILD=sim_build)
+        subprocess.run(f"rm -rf {sim_build}", shell=True)
+        return make('build_model', variables, os.path.join(WORK_DIR, f"{name}.build.log")), variables
+
+    def run(self, name, variables):
+        """ Run CoreMark on the model
+
+            @return: (wall time, profile summary, coremark result)
+        """
+        for file in [PROFILE_FILE, LOG_FILE]:
+            if os.path.isfile(file):
+                os.remove(file)
+        wall = make('sim', dict(variables, **self.run_vars), os.path.join(WORK_DIR, f"{name}.run.log"))
+        if not os.path.isfile(PROFILE_FILE):
+            raise RuntimeError(f"No profile of {name}, the simulation failed")
+        with open(PROFILE_FILE) as f:
+            profile = json.load(f)
+        with open(LOG_FILE) as f:
+            result = parse_coremark(f.read(), self.soc)
+        return wall, profile, result
+
+    def bench(self, setting):
+        variables, pgo = parse_setting(setting)
+        name = setting.replace('+', '_')
+        build = 0
+        if pgo:
+            pgo_dir = os.path.join(WORK_DIR, f"{name}_pgo")
+            subprocess.run(f"rm -rf {pgo_dir} && mkdir -p {pgo_dir}", shell=True)
+            gen_time, gen_vars = self.build(f"{name}_gen", dict(variables, VL_PGO='gen', VL_PGO_DIR=pgo_dir))
+            self.run(f"{name}_gen", gen_vars)
+            build += gen_time
+            variables = dict(variables, VL_PGO='use', VL_PGO_DIR=pgo_dir)
+        build_time, variables = self.build(name, variables)
+        build += build_time
+        wall, profile, result = self.run(name, variables)
+        return {
+            'setting':        setting,
+            'build_s':        build,
+            'wall_s':         wall,
+            'sim_s':          profile['wall_s'],
+            'cycles':         profile['cycles'],
+            'cycles_per_sec': profile['cycles_per_sec'],
+            'python_s':       profile['python_s'],
+            'coremark_ok':    not result['errors'],
+        }
+
+#####################################
+# Main Program
+#####################################
+
+def cmdParser():
+    parser = argparse.ArgumentParser(description='Benchmark the Verilator build settings with CoreMark')
+    parser.add_argument('-soc', type=str, default='arty', nargs='?', help='The FPGA board')
+    parser.add_argument('-timeout', '-to', type=str, default='500000000', nargs='?', help='Timeout value')
+    parser.add_argument('-settings', '-s', type=str, default='base,O3,O3+t2,O3+t4', nargs='?',
+                        help='Comma separated settings')
+    parser.add_argument('-fast_uart', type=int, default=1, nargs='?', help='Use the simulation only SoC')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = cmdParser()
+    os.makedirs(WORK_DIR, exist_ok=True)
+    bench = SimBench(args.soc, args.timeout, args.fast_uart)
+    results = []
+    for setting in args.settings.split(','):
+        print(f"Benchmarking {setting}")
+        try:
+            results.append(bench.bench(setting))
+        except RuntimeError as e:
+            print(f"FAIL: {setting}: {e}")
+    with open(RESULT_FILE, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print("==================================")
+    print(f"{'setting':<16} {'build(s)':>9} {'sim(s)':>8} {'cycles':>12} {'cycles/s':>10} {'speedup':>8} {'coremark':>9}")
+    for r in results:
+        speedup = r['cycles_per_sec'] / results[0]['cycles_per_sec'] if results[0]['cycles_per_sec'] else 0
+        print(f"{r['setting']:<16} {r['build_s']:>9.1f} {r['sim_s']:>8.1f} {r['cycles']:>12} "
+              f"{r['cycles_per_sec']:>10.0f} {speedup:>7.2f}x {'PASS' if r['coremark_ok'] else 'FAIL':>9}")
+    sys.exit(0 if results and all(r['coremark_ok'] for r in results) else 1)
@@ -0,0 +1,142 @@
+##################################################################################################
+##
+## Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+##
+## ~~~ Hardware in SpinalHDL ~~~
+##
+## Author: Heqing Huang
+## Date Created: 10/17/2026
+##
+## ================== Description ==================
+##
+## Windowed waveform dump
+##
+## Instead of dumping the whole simulation (DUMP=1), the testbench is built with DUMP_CTRL and
+## the dump is turned on and off from python through the dump_on register of the testbench.
+## The windows are given by DUMP_WINDOW, comma separated:
+##
+##   <start>:<end>      cycles start to end, end can be empty to dump until the end of the test
+##   pc=<marker>[:<n>]  n cycles (default 1000) from the first time marker retires, marker is a
+##                      symbol of the program or an address
+##   fail[:<n>]         the last n cycles (default 1000) before the failure recorded by the
+##                      previous run of the test in <test>.fail.json
+##
+##   make software_test NAME=uart DUMP_WINDOW=pc=main:500 DUMP_SCOPE=core DUMP_FST=1
+##
+## The cycles are counted from the start of the simulation, also when it starts from a snapshot.
+##
+##################################################################################################
+
+import os
+import json
+
+import cocotb
+from cocotb.triggers import FallingEdge, Timer
+
+from rom_loader import find_symbol
+from sim_util import CLOCK_PERIOD, current_cycle, wait_retire
+
+DEFAULT_CYCLES = 1000
+
+###############################
+# Failure record
+###############################
+
+def fail_file(file_name):
+    return f"{file_name}.fail.json"
+
+def write_failure(file_name, cycle, pc, reason):
+    """ Record where the test failed so the next run can dump the cycles before it """
+    with open(fail_file(file_name), 'w') as f:
+        json.dump({'test': file_name, 'cycle': cycle, 'pc': pc, 'reason': reason}, f, indent=2)
+
+def read_failure(file_name):
+    file = fail_file(file_name)
+    if not os.path.isfile(file):
+        raise FileNotFoundError(f"{file} is not found, run the failing test once without the dump first")
+    with open(file) as f:
+        return json.load(f)
+
+###############################
+# Windows
+###############################
+
+def parse_windows(spec, file_name, file_path):
+    """ Convert DUMP_WINDOW into a list of (start cycle or None, start pc or None, cycles or None) """
+    windows = []
+    for item in spec.split(','):
+        if item.startswith('pc='):
+            marker, _, cycles = item[3:].partition(':')
+            pc = find_symbol(file_name, file_path, marker)
+            windows.append((None, pc, int(cycles) if cycles else DEFAULT_CYCLES))
+        elif item == 'fail' or item.startswith('fail:'):
+            _, _, cycles = item.partition(':')
+            cycles = int(cycles) if cycles else DEFAULT_CYCLES
+            windows.append((max(read_failure(file_name)['cycle'] - cycles, 0), None, None))
+        else:
+            start, sep, end = item.partition(':')
+            if not sep:
+                raise ValueError(f"Invalid dump window {item}")
+            start = int(start) if start else 0
+            windows.append((start, None, int(end) - start if end else None))
+    return windows
+
+class DumpControl:
+    """ Turn the waveform dump of the testbench on and off """
+
+    def __init__(self, dut, windows, log=None):
+        self.dut = dut
+        self.dump_on = dut.dump_on
+        self.clk = dut.io_clk
+        self.windows = windows
+        self.log = log
+        # number of open windows, the windows can overlap
+        self.active = 0
+
+    @classmethod
+    def fromEnv(cls, dut, file_name, file_path, log=None):
+        """ Create the dump control if DUMP_WINDOW is set, return None otherwise """
+        spec = os.getenv('DUMP_WINDOW', '')
+        if not spec:
+            return None
+        if not hasattr(dut, 'dump_on'):
+            # verilator dumps the whole simulation
+            if log:
+                log.warning("The testbench is not built with DUMP_CTRL, DUMP_WINDOW is ignored")
+            return None
+        return cls(dut, parse_windows(spec, file_name, file_path), log)
+
+    def start(self):
+        for window in self.windows:
+            cocotb.fork(self.run_window(*window))
+
+    async def wait_cycle(self, cycle):
+        now = current_cycle()
+        if cycle > now:
+            await Timer((cycle - now) * CLOCK_PERIOD, units='ns')
+        await FallingEdge(self.clk)
+
+    async def run_window(self, start, pc, cycles):
+        if pc is not None:
+            await wait_retire(self.dut, pc)
+        else:
+            await self.wait_cycle(start)
+        self.turn_on()
+        if cycles is None:
+            return
+        await Timer(cycles * CLOCK_PERIOD, units='ns')
+        self.turn_off()
+
+    def turn_on(self):
+        self.active += 1
+        if self.active == 1:
+            self.dump_on.value = 1
+            if self.log:
+                self.log.info(f"Dump on at cycle {current_cycle()}")
+
+    def turn_off(self):
+        self.active -= 1
+        if self.active == 0:
+            self.dump_on.value = 0
+            if self.log:
+                self.log.info(f"Dump off at cycle {current_cycle()}")
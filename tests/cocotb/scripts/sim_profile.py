@@ -0,0 +1,256 @@
+##################################################################################################
+##
+## Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+##
+## ~~~ Hardware in SpinalHDL ~~~
+##
+## Author: Heqing Huang
+## Date Created: 10/17/2026
+##
+## ================== Description ==================
+##
+## Simulation throughput profiler
+##
+## Enabled by the PROFILE environment variable (make PROFILE=1):
+##   1: simulated cycles per wall second, time spent in python vs the simulator,
+##      wakeup count and time of each coroutine, VPI read/write count of each signal
+##   2: same as 1 plus a cProfile of the python side, written as <name>.prof
+##      (snakeviz, pstats) and <name>.folded (flamegraph.pl, speedscope)
+##
+## The counters are collected by wrapping the cocotb scheduler and the value property of the
+## signal handles, the wrappers are removed when the profiler stops. The summary is printed and
+## written to <name>.profile.json.
+##
+##   profiler = SimProfiler.fromEnv(period=10)
+##   profiler.start()
+##   ...
+##   profiler.stop()
+##   profiler.report(name)
+##
+##################################################################################################
+
+import os
+import json
+import time
+import pstats
+import cProfile
+from collections import defaultdict
+
+# Number of entries printed in each table
+TOP = 15
+
+class SimProfiler:
+    """ Collect the simulation throughput and the python side breakdown """
+
+    def __init__(self, period, level=1, log=None):
+        """
+            @param period: clock period in ns, used to convert the simulation time into cycles
+            @param level: 1 = counters only, 2 = counters and cProfile
+        """
+        import cocotb
+        self.cocotb = cocotb
+        self.period = period
+        self.level = level
+        self.log = log if log else cocotb.log
+        self.running = False
+        self.wall = 0
+        self.simTime = 0
+        self.pyTime = 0
+        self.reacts = 0
+        self.wakeups = defaultdict(int)
+        self.wakeupTime = defaultdict(float)
+        self.reads = defaultdict(int)
+        self.writes = defaultdict(int)
+        self.profile = None
+        self._patched = []
+
+    @classmethod
+    def fromEnv(cls, period, log=None):
+        """ Create the profiler if PROFILE is set, return None otherwise """
+        level = int(os.getenv('PROFILE', '0') or 0)
+        return cls(period, level, log) if level else None
+
+    # ---------------------------
+    # Hooks
+    # ---------------------------
+
+    def _patch(self, owner, name, value):
+        self._patched.append((owner, name, owner.__dict__.get(name), name in owner.__dict__))
+        setattr(owner, name, value)
+
+    def _hookScheduler(self):
+        scheduler = self.cocotb.scheduler
+        react = scheduler.react
+        def timedReact(trigger):
+            start = time.perf_counter()
+            try:
+                return react(trigger)
+            finally:
+                self.pyTime += time.perf_counter() - start
+                self.reacts += 1
+        self._patch(scheduler, 'react', timedReact)
+        name = 'schedule' if hasattr(scheduler, 'schedule') else '_schedule'
+        schedule = getattr(scheduler, name)
+        wakeups = self.wakeups
+        wakeupTime = self.wakeupTime
+        def countedSchedule(coroutine, *args, **kwargs):
+            key = getattr(coroutine, '__qualname__', None) or getattr(coroutine, '__name__', repr(coroutine))
+            start = time.perf_counter()
+            try:
+                return schedule(coroutine, *args, **kwargs)
+            finally:
+                wakeups[key] += 1
+                wakeupTime[key] += time.perf_counter() - start
+        self._patch(scheduler, name, countedSchedule)
+
+    def _hookHandles(self):
+        import cocotb.handle
+        reads = self.reads
+        writes = self.writes
+        for obj in vars(cocotb.handle).values():
+            if not isinstance(obj, type) or not isinstance(obj.__dict__.get('value'), property):
+                continue
+            prop = obj.__dict__['value']
+            def countedGet(handle, fget=prop.fget):
+                reads[handle._name] += 1
+                return fget(handle)
+            def countedSet(handle, value, fset=prop.fset):
+                writes[handle._name] += 1
+                return fset(handle, value)
+            self._patch(obj, 'value', property(countedGet, countedSet if prop.fset else None, prop.fdel, prop.__doc__))
+
+    def _unhook(self):
+        for owner, name, value, present in reversed(self._patched):
+            if present:
+                setattr(owner, name, value)
+            else:
+                delattr(owner, name)
+        self._patched = []
+
+    # ---------------------------
+    # Control
+    # ---------------------------
+
+    def start(self):
+        from cocotb.utils import get_sim_time
+        self._hookScheduler()
+        self._hookHandles()
+        if self.level >= 2:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        self.simStart = get_sim_time('ns')
+        self.wallStart = time.perf_counter()
+        self.running = True
+
+    def stop(self):
+        from cocotb.utils import get_sim_time
+        if not self.running:
+            return
+        self.running = False
+        self.wall += time.perf_counter() - self.wallStart
+        self.simTime += get_sim_time('ns') - self.simStart
+        if self.profile:
+            self.profile.disable()
+        self._unhook()
+
+    # ---------------------------
+    # Report
+    # ---------------------------
+
+    def summary(self):
+        cycles = self.simTime / self.period
+        return {
+            'cycles':           int(cycles),
+            'sim_time_ns':      self.simTime,
+            'wall_s':           self.wall,
+            'cycles_per_sec':   cycles / self.wall if self.wall else 0,
+            'python_s':         self.pyTime,
+            'simulator_s':      max(self.wall - self.pyTime, 0),
+            'reacts':           self.reacts,
+            'wakeups':          sorted(([name, count, self.wakeupTime[name]] for name, count in self.wakeups.items()),
+                                       key=lambda x: -x[2]),
+            'vpi_reads':        sum(self.reads.values()),
+            'vpi_writes':       sum(self.writes.values()),
+            'signals':          sorted(([name, self.reads[name], self.writes[name]]
+                                        for name in set(self.reads) | set(self.writes)),
+                                       key=lambda x: -(x[1] + x[2])),
+        }
+
+    def report(self, name):
+        """ Print the summary and write the profile files
+
+            @return: the summary dict
+        """
+        self.stop()
+        summary = self.summary()
+        wall = summary['wall_s'] or 1
+        lines = [
+            f"Profile of {name}",
+            f"  {summary['cycles']} cycles in {summary['wall_s']:.2f}s: {summary['cycles_per_sec']:.0f} cycles/s",
+            f"  python {summary['python_s']:.2f}s ({summary['python_s'] / wall:.1%}), "
+            f"simulator {summary['simulator_s']:.2f}s ({summary['simulator_s'] / wall:.1%}), "
+            f"{summary['reacts']} callbacks",
+        ]
+        if self.profile:
+            stats = pstats.Stats(self.profile)
+            summary['logging_s'] = loggingTime(stats)
+            lines.append(f"  logging {summary['logging_s']:.2f}s ({summary['logging_s'] / wall:.1%})")
+            stats.dump_stats(f"{name}.prof")
+            writeFolded(stats, f"{name}.folded")
+        lines.append(f"  {'coroutine':<48} {'wakeups':>10} {'time(s)':>9}")
+        for coro, count, spent in summary['wakeups'][:TOP]:
+            lines.append(f"  {coro[-48:]:<48} {count:>10} {spent:>9.3f}")
+        lines.append(f"  VPI: {summary['vpi_reads']} reads, {summary['vpi_writes']} writes")
+        lines.append(f"  {'signal':<48} {'reads':>10} {'writes':>9}")
+        for signal, reads, writes in summary['signals'][:TOP]:
+            lines.append(f"  {signal[-48:]:<48} {reads:>10} {writes:>9}")
+        self.log.info('\n'.join(lines))
+        with open(f"{name}.profile.json", 'w') as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+def loggingTime(stats):
+    """ Cumulative time spent in Logger.handle, i.e. formatting and writing the log records """
+    total = 0
+    for (file, _, func), (_, _, _, ct, _) in stats.stats.items():
+        if func == 'handle' and file.endswith(os.path.join('logging', '__init__.py')):
+            total += ct
+    return total
+
+def writeFolded(stats, file, minTime=1e-6, maxDepth=64):
+    """ Write the call graph of a cProfile as folded stacks for flame graph tools
+
+        cProfile only keeps caller/callee pairs, so the time of a function called from several
+        places is split between them in proportion to the time of each call site.
+    """
+    entries = stats.stats
+    children = defaultdict(list)
+    for callee, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            children[caller].append((callee, edge[3]))
+    roots = [func for func, (_, _, _, _, callers) in entries.items() if not callers]
+
+    def label(func):
+        file, line, name = func
+        return f"{name} ({os.path.basename(file)}:{line})" if line else name
+
+    folded = defaultdict(float)
+    def walk(func, path, scale):
+        _, _, tt, ct, _ = entries[func]
+        if ct * scale < minTime or len(path) > maxDepth:
+            return
+        path = path + [func]
+        folded[';'.join(label(f) for f in path)] += tt * scale
+        for callee, edgeCt in children[func]:
+            if callee in path or callee not in entries:
+                continue
+            calleeCt = entries[callee][3]
+            if calleeCt:
+                walk(callee, path, scale * edgeCt / calleeCt)
+    for root in roots:
+        walk(root, [], 1.0)
+    with open(file, 'w') as f:
+        for stack, spent in folded.items():
+            us = int(spent * 1e6)
+            if us:
+                f.write(f"{stack} {us}\n")
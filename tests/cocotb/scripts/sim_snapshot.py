@@ -0,0 +1,189 @@
+##################################################################################################
+##
+## Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+##
+## ~~~ Hardware in SpinalHDL ~~~
+##
+## Author: Heqing Huang
+## Date Created: 10/17/2026
+##
+## ================== Description ==================
+##
+## Simulation snapshot
+##
+## Run the program once up to a marker (default: the first instruction of main retires) and
+## save the state of the SoC together with the harness state, so the following runs of the same
+## program (reruns, fuzz iterations, debug runs with dump) skip the reset and the boot code
+## (start.S, init.c, newlib init, data/bss setup):
+##
+##   make software_test NAME=uart SNAPSHOT=save             # writes uart.snapshot
+##   make software_test NAME=uart SNAPSHOT=restore
+##
+## The state is read and written through VPI: every register and memory word below the SoC
+## instance (and the external sram model of the de2 testbench), so the same snapshot flow works
+## with icarus and verilator. The instruction ram is not saved, it is loaded from the rom files
+## as usual. The snapshot is restored at the first falling edge after reset, when nothing else
+## is driving the design.
+##
+##################################################################################################
+
+import gzip
+import json
+import hashlib
+
+from cocotb.binary import BinaryValue
+from cocotb.handle import HierarchyObject, HierarchyArrayObject, NonHierarchyIndexableObject, ModifiableObject
+from cocotb.triggers import FallingEdge
+
+from rom_loader import read_program, find_symbol
+from sim_util import current_cycle, wait_retire
+
+SNAPSHOT_VERSION = 1
+# Instances that are not saved: the instruction ram is reloaded from the rom files
+EXCLUDE = ('soc_imem',)
+# Instances of the testbench holding state outside of the SoC
+TB_MEMORIES = ('IS61LV25616',)
+
+def program_hash(file_name, file_path):
+    """ Hash of the program, a snapshot can only be restored into the same program """
+    sha = hashlib.sha1()
+    for addr, data in read_program(file_name, file_path):
+        sha.update(addr.to_bytes(4, 'little'))
+        sha.update(data)
+    return sha.hexdigest()
+
+def encode(value):
+    """ Store the resolvable values as integers and the others (X/Z) as binary strings """
+    return value.integer if value.is_resolvable else value.binstr
+
+def decode(value):
+    return value if isinstance(value, int) else BinaryValue(value, n_bits=len(value))
+
+class SimSnapshot:
+    """ Save and restore the state of the SoC and the testbench memories """
+
+    def __init__(self, dut, file_name, file_path, file, log=None, exclude=EXCLUDE):
+        """
+            @param file: the snapshot file
+            @param exclude: name of the instances that are not saved
+        """
+        self.dut = dut
+        self.roots = [dut.DUT_AppleRISCVSoC]
+        for name in TB_MEMORIES:
+            if hasattr(dut, name):
+                self.roots.append(getattr(dut, name))
+        self.clk = dut.io_clk
+        self.file_name = file_name
+        self.file_path = file_path
+        self.file = file
+        self.log = log
+        self.exclude = exclude
+        self.saved = False
+        self._elements = None
+
+    # ---------------------------
+    # Design state
+    # ---------------------------
+
+    def elements(self):
+        """ All the state elements of the SoC: {path: (handle, is memory)} """
+        if self._elements is None:
+            self._elements = {}
+            for root in self.roots:
+                self._walk(root, root._name)
+        return self._elements
+
+    def _walk(self, handle, path):
+        for child in handle:
+            name = f"{path}.{child._name}"
+            if isinstance(child, (HierarchyObject, HierarchyArrayObject)):
+                if child._name not in self.exclude:
+                    self._walk(child, name)
+            elif isinstance(child, NonHierarchyIndexableObject):
+                self._elements[name] = (child, True)
+            elif isinstance(child, ModifiableObject) and child._type == 'GPI_REGISTER':
+                self._elements[name] = (child, False)
+
+    def capture(self):
+        state = {}
+        for path, (handle, memory) in self.elements().items():
+            if memory:
+                state[path] = [encode(handle[idx].value) for idx in handle._range]
+            else:
+                state[path] = encode(handle.value)
+        return state
+
+    def deposit(self, state):
+        elements = self.elements()
+        missing = set(state) ^ set(elements)
+        if missing:
+            raise ValueError(f"The snapshot does not match the RTL, {len(missing)} different state elements "
+                             f"(e.g. {sorted(missing)[0]}), save the snapshot again")
+        for path, value in state.items():
+            handle, memory = elements[path]
+            if memory:
+                for idx, word in zip(handle._range, value):
+                    handle[idx].setimmediatevalue(decode(word))
+            else:
+                handle.setimmediatevalue(decode(value))
+
+    # ---------------------------
+    # Save
+    # ---------------------------
+
+    async def save_at(self, marker, console=None):
+        """ Save the snapshot when the marker (symbol or address) retires
+
+            @param console: the uart console, its output so far is saved with the snapshot
+        """
+        pc = find_symbol(self.file_name, self.file_path, marker)
+        await wait_retire(self.dut, pc)
+        # the retired instruction is at the end of the pipeline, save at the next falling edge
+        # so all the registers are settled
+        await FallingEdge(self.clk)
+        self.save(marker, pc, console.text if console else "")
+
+    def save(self, marker, pc, console_text=""):
+        cycle = current_cycle()
+        snapshot = {
+            'version':     SNAPSHOT_VERSION,
+            'program':     program_hash(self.file_name, self.file_path),
+            'test':        self.file_name,
+            'marker':      marker,
+            'pc':          pc,
+            'cycle':       cycle,
+            'console':     console_text,
+            'state':       self.capture(),
+        }
+        with gzip.open(self.file, 'wt') as f:
+            json.dump(snapshot, f)
+        self.saved = True
+        if self.log:
+            self.log.info(f"Saved snapshot {self.file} at {marker} ({pc:#010x}), cycle {cycle}, "
+                          f"{len(snapshot['state'])} state elements")
+
+    # ---------------------------
+    # Restore
+    # ---------------------------
+
+    def load(self):
+        with gzip.open(self.file, 'rt') as f:
+            snapshot = json.load(f)
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version in {self.file}")
+        if snapshot['program'] != program_hash(self.file_name, self.file_path):
+            raise ValueError(f"{self.file} was saved with a different program ({snapshot['test']})")
+        return snapshot
+
+    async def restore(self):
+        """ Restore the snapshot, must be called after reset
+
+            @return: the snapshot without the design state (marker, pc, cycle, console)
+        """
+        snapshot = self.load()
+        await FallingEdge(self.clk)
+        self.deposit(snapshot.pop('state'))
+        if self.log:
+            self.log.info(f"Restored snapshot {self.file} at {snapshot['marker']} ({snapshot['pc']:#010x}), "
+                          f"skipping {snapshot['cycle']} cycles")
+        return snapshot
@@ -0,0 +1,298 @@
+#!/usr/bin/python3
+##################################################################################################
+##
+## Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+##
+## ~~~ Hardware in SpinalHDL ~~~
+##
+## Author: Heqing Huang
+## Date Created: 10/17/2026
+##
+## ================== Description ==================
+##
+## Simulation tracer for PC, register write, memory write, load and branch
+##
+## Records are stored in a preallocated ring buffer and flushed to the trace file in binary
+## chunks (optionally zlib compressed) whenever the buffer is full, so tracing runs in a
+## bounded amount of memory.
+##
+## Trace file format:
+##   header: b'ARVT' + version (uint32)
+##   chunk:  tag (b'RAW ' or b'ZLIB') + raw size (uint32) + payload size (uint32) + payload
+##   record: cycle, kind, a, b (4 x uint32, little endian)
+##
+## The file can also be run as a script to decode or diff trace files:
+##   python3 sim_trace.py decode <trace>
+##   python3 sim_trace.py diff <trace_a> <trace_b>
+##
+##################################################################################################
+
+import sys
+import zlib
+import struct
+import argparse
+from array import array
+from itertools import zip_longest
+
+TRACE_MAGIC   = b'ARVT'
+TRACE_VERSION = 1
+CHUNK_RAW     = b'RAW '
+CHUNK_ZLIB    = b'ZLIB'
+RECORD_WORDS  = 4
+
+# Record kind. For register write: a = register index, b = value.
+## For memory write: a = address, b = data, the HSIZE is stored in bit 8-15 of the kind.
+## For load: a = address, b = 0, the HSIZE is stored in bit 8-15 of the kind.
+## For branch and jump: a = pc, b = target, bit 8 of the kind is set if the branch is taken
+## and the branch type is stored in bit 12-15 of the kind. The target of a branch not taken
+## is the address it would have jumped to.
+KIND_PC     = 0
+KIND_REG    = 1
+KIND_MEM    = 2
+KIND_LOAD   = 3
+KIND_BRANCH = 4
+KIND_NAME = {
+    KIND_PC:     'pc',
+    KIND_REG:    'reg',
+    KIND_MEM:    'mem',
+    KIND_LOAD:   'load',
+    KIND_BRANCH: 'branch',
+}
+
+# Branch type
+BRANCH_TAKEN = 1 << 8
+BRANCH_COND  = 0    # conditional branch
+BRANCH_JAL   = 1    # direct jump
+BRANCH_JALR  = 2    # indirect jump
+BRANCH_CALL  = 3    # jal/jalr with rd = x1/x5
+BRANCH_RET   = 4    # jalr with rs1 = x1/x5 and rd = x0
+BRANCH_NAME = {
+    BRANCH_COND: 'br',
+    BRANCH_JAL:  'jal',
+    BRANCH_JALR: 'jalr',
+    BRANCH_CALL: 'call',
+    BRANCH_RET:  'ret',
+}
+
+AHB_NONSEQ = 2
+
+###############################
+# Tracer
+###############################
+
+class TraceWriter:
+    """ Write records into a trace file through the ring buffer """
+
+    def __init__(self, file, depth=65536, compress=True):
+        """
+            @param depth: number of records in the ring buffer
+            @param compress: compress the chunks with zlib
+        """
+        self.compress = compress
+        self.depth = depth
+        self.buffer = array('I', bytes(depth * RECORD_WORDS * 4))
+        self.ptr = 0
+        self.cycle = 0
+        self.fh = open(file, 'wb')
+        self.fh.write(TRACE_MAGIC + struct.pack('<I', TRACE_VERSION))
+
+    def record(self, kind, a, b):
+        """ Add a record into the ring buffer, flush the buffer if it is full """
+        idx = self.ptr * RECORD_WORDS
+        buffer = self.buffer
+        buffer[idx] = self.cycle
+        buffer[idx+1] = kind
+        buffer[idx+2] = a
+        buffer[idx+3] = b
+        self.ptr += 1
+        if self.ptr == self.depth:
+            self.flush()
+
+    def flush(self):
+        """ Write the records in the ring buffer to the trace file as one chunk """
+        if self.ptr == 0:
+            return
+        raw = memoryview(self.buffer)[:self.ptr * RECORD_WORDS].tobytes()
+        if self.compress:
+            tag, payload = CHUNK_ZLIB, zlib.compress(raw, 1)
+        else:
+            tag, payload = CHUNK_RAW, raw
+        self.fh.write(tag + struct.pack('<II', len(raw), len(payload)))
+        self.fh.write(payload)
+        self.ptr = 0
+
+    def close(self):
+        """ Flush everything into the trace file """
+        self.flush()
+        self.fh.close()
+
+class Tracer(TraceWriter):
+    """ Sample PC, register write, memory write and load every clock cycle """
+
+    def __init__(self, dut, file, kinds=('pc', 'reg', 'mem'), depth=65536, compress=True):
+        """
+            @param kinds: what to trace: 'pc', 'reg', 'mem', 'load'
+            @param depth: number of records in the ring buffer
+            @param compress: compress the chunks with zlib
+        """
+        super().__init__(file, depth, compress)
+        core = dut.DUT_AppleRISCVSoC.core
+        self.clk = dut.io_clk
+        self.kinds = kinds
+        self.running = False
+        # cache all the handles
+        self.pc = core.pc_inst.pc_value
+        self.reg_wr = core.regfile_inst.register_wr
+        self.reg_addr = core.regfile_inst.register_wr_addr
+        self.reg_wdata = core.regfile_inst.rd_wdata
+        self.htrans = core.dbus_ahb_HTRANS
+        self.hwrite = core.dbus_ahb_HWRITE
+        self.haddr = core.dbus_ahb_HADDR
+        self.hsize = core.dbus_ahb_HSIZE
+        self.hwdata = core.dbus_ahb_HWDATA
+        self.hready = core.dbus_ahb_HREADY
+
+    def close(self):
+        """ Stop tracing and flush everything into the trace file """
+        self.running = False
+        super().close()
+
+    async def start(self):
+        # imported here so the decoder can run without cocotb
+        from cocotb.triggers import FallingEdge
+        trace_pc = 'pc' in self.kinds
+        trace_reg = 'reg' in self.kinds
+        trace_mem = 'mem' in self.kinds
+        trace_load = 'load' in self.kinds
+        prev_pc = None
+        pending = None
+        self.running = True
+        while self.running:
+            await FallingEdge(self.clk)
+            self.cycle += 1
+            try:
+                if trace_pc:
+                    pc = self.pc.value.integer
+                    if pc != prev_pc:
+                        prev_pc = pc
+                        self.record(KIND_PC, pc, 0)
+                if trace_reg and self.reg_wr.value.integer:
+                    self.record(KIND_REG, self.reg_addr.value.integer, self.reg_wdata.value.integer)
+                if (trace_mem or trace_load) and self.hready.value.integer:
+                    # data phase of the previous write completes in this cycle
+                    if pending is not None:
+                        addr, size = pending
+                        self.record(KIND_MEM | (size << 8), addr, self.hwdata.value.integer)
+                        pending = None
+                    # address phase of a new access
+                    if self.htrans.value.integer >= AHB_NONSEQ:
+                        if self.hwrite.value.integer:
+                            if trace_mem:
+                                pending = (self.haddr.value.integer, self.hsize.value.integer)
+                        elif trace_load:
+                            self.record(KIND_LOAD | (self.hsize.value.integer << 8), self.haddr.value.integer, 0)
+            except ValueError:
+                # X/Z value during reset
+                continue
+
+###############################
+# Trace reader
+###############################
+
+def read_chunks(file):
+    """ Read the records of a trace file, one chunk at a time
+
+        @return: generator of array('I') holding the records of each chunk
+    """
+    with open(file, 'rb') as f:
+        header = f.read(8)
+        if header[:4] != TRACE_MAGIC:
+            raise ValueError(f"Not a trace file: {file}")
+        while True:
+            chunk = f.read(12)
+            if len(chunk) < 12:
+                return
+            tag = chunk[:4]
+            raw_size, payload_size = struct.unpack('<II', chunk[4:])
+            payload = f.read(payload_size)
+            if tag == CHUNK_ZLIB:
+                payload = zlib.decompress(payload)
+            records = array('I')
+            records.frombytes(payload[:raw_size])
+            yield records
+
+def read_records(file):
+    """ Read the records of a trace file
+
+        @return: generator of (cycle, kind, a, b)
+    """
+    for records in read_chunks(file):
+        for idx in range(0, len(records), RECORD_WORDS):
+            yield tuple(records[idx:idx+RECORD_WORDS])
+
+def format_record(record):
+    """ Convert a record into a string """
+    cycle, kind, a, b = record
+    name = KIND_NAME[kind & 0xFF]
+    if name == 'pc':
+        return f"{cycle:>10} pc  {a:#010x}"
+    if name == 'reg':
+        return f"{cycle:>10} reg x{a:<2} = {b:#010x}"
+    if name == 'load':
+        return f"{cycle:>10} ld  [{a:#010x}] size {kind >> 8}"
+    if name == 'branch':
+        taken = 'T' if kind & BRANCH_TAKEN else 'N'
+        return f"{cycle:>10} {BRANCH_NAME[(kind >> 12) & 0xF]:<4} {a:#010x} -> {b:#010x} {taken}"
+    return f"{cycle:>10} mem [{a:#010x}] = {b:#010x} size {kind >> 8}"
+
+def diff_trace(file_a, file_b, kinds=('pc', 'reg', 'mem', 'load', 'branch'), cycle=False):
+    """ Compare two trace files and report the first divergence of each kind
+
+        @param cycle: also compare the cycle of each record
+        @return: True if the traces match
+    """
+    def select(file, kind):
+        for record in read_records(file):
+            if KIND_NAME[record[1] & 0xFF] == kind:
+                yield record
+
+    match = True
+    for kind in kinds:
+        count = 0
+        for rec_a, rec_b in zip_longest(select(file_a, kind), select(file_b, kind)):
+            same = rec_a is not None and rec_b is not None and \
+                (rec_a if cycle else rec_a[1:]) == (rec_b if cycle else rec_b[1:])
+            if not same:
+                print(f"[{kind}] traces diverge at record {count}")
+                print(f"  A: {format_record(rec_a) if rec_a else 'end of trace'}")
+                print(f"  B: {format_record(rec_b) if rec_b else 'end of trace'}")
+                match = False
+                break
+            count += 1
+        else:
+            print(f"[{kind}] {count} records match")
+    return match
+
+###############################
+# Main Program
+###############################
+
+def cmdParser():
+    parser = argparse.ArgumentParser(description='Decode or diff simulation trace files')
+    parser.add_argument('cmd', type=str, choices=['decode', 'diff'], help='decode or diff the trace file')
+    parser.add_argument('files', type=str, nargs='+', help='The trace files')
+    parser.add_argument('-kinds', '-k', type=str, default='pc,reg,mem,load,branch', nargs='?', help='Record kinds to decode/diff')
+    parser.add_argument('-cycle', '-c', action='store_true', help='Compare the cycle of the records in diff')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = cmdParser()
+    kinds = args.kinds.split(',')
+    if args.cmd == 'decode':
+        for record in read_records(args.files[0]):
+            if KIND_NAME[record[1] & 0xFF] in kinds:
+                print(format_record(record))
+    else:
+        if len(args.files) != 2:
+            raise ValueError("diff needs two trace files")
+        sys.exit(0 if diff_trace(args.files[0], args.files[1], kinds, args.cycle) else 1)
@@ -0,0 +1,37 @@
+##################################################################################################
+##
+## Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+##
+## ~~~ Hardware in SpinalHDL ~~~
+##
+## Author: Heqing Huang
+## Date Created: 10/17/2026
+##
+## ================== Description ==================
+##
+## Common helpers of the testbench scripts
+##
+##################################################################################################
+
+from cocotb.triggers import FallingEdge
+from cocotb.utils import get_sim_time
+
+# Clock period of the testbench in ns
+CLOCK_PERIOD = 10
+
+def current_cycle():
+    """ Number of clock cycles since the start of the simulation """
+    return int(get_sim_time('ns') // CLOCK_PERIOD)
+
+async def wait_retire(dut, pc):
+    """ Wait until the instruction at pc retires """
+    core = dut.DUT_AppleRISCVSoC.core
+    while True:
+        await FallingEdge(dut.io_clk)
+        try:
+            if core.mem2wb_pipe_valid.value.integer and not core.mem2wb_pipe_stall.value.integer \
+                    and core.ex2mem_pc.value.integer == pc:
+                return
+        except ValueError:
+            # X/Z value during reset
+            continue
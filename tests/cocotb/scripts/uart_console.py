@@ -0,0 +1,84 @@
+##################################################################################################
+##
+## Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+##
+## ~~~ Hardware in SpinalHDL ~~~
+##
+## Author: Heqing Huang
+## Date Created: 10/17/2026
+##
+## ================== Description ==================
+##
+## Fast uart console
+##
+## Capture the characters written by the software to the uart0 transmit data register (offset
+## 0x000) from the APB bus of ApbUart instead of decoding the serial line, and stream them into
+## a log file. The monitor only wakes up on the APB accesses to the uart.
+##
+## Combined with the simulation only SoC (make FAST_UART=1), which drops the transmit data
+## instead of shifting it out, printf no longer waits for the serial line.
+##
+##################################################################################################
+
+from cocotb.triggers import RisingEdge, ReadOnly, Event
+
+UART_TXDATA = 0x000
+
+class UartConsole:
+    """ Capture the writes to the uart transmit data register """
+
+    def __init__(self, dut, file, log=None):
+        """
+            @param file: log file of the captured output
+            @param log: also print each line into this logger
+        """
+        uart = dut.DUT_AppleRISCVSoC.uart0
+        self.psel = uart.apb_PSEL
+        self.penable = uart.apb_PENABLE
+        self.pwrite = uart.apb_PWRITE
+        self.paddr = uart.apb_PADDR
+        self.pwdata = uart.apb_PWDATA
+        self.fh = open(file, 'w')
+        self.log = log
+        self.text = ""
+        self.line = ""
+        # set on every new line
+        self.newline = Event()
+        self.running = False
+
+    async def start(self):
+        self.running = True
+        while self.running:
+            # the enable is set in the access phase of every APB transfer
+            await RisingEdge(self.penable)
+            await ReadOnly()
+            try:
+                if self.psel.value.integer and self.pwrite.value.integer and \
+                   self.paddr.value.integer == UART_TXDATA:
+                    self.put(chr(self.pwdata.value.integer & 0xFF))
+            except ValueError:
+                # X/Z value during reset
+                continue
+
+    def put(self, char):
+        self.text += char
+        self.fh.write(char)
+        if char == '\n':
+            self.fh.flush()
+            if self.log:
+                self.log.info(f"[uart] {self.line}")
+            self.line = ""
+            self.newline.set()
+        else:
+            self.line += char
+
+    async def wait_line(self):
+        """ Wait until a new line is printed """
+        await self.newline.wait()
+        self.newline.clear()
+
+    def close(self):
+        self.running = False
+        if self.line and self.log:
+            self.log.info(f"[uart] {self.line}")
+        self.fh.close()
@@ -0,0 +1,33 @@
+#############################################################
+# Verilator build options, shared by the cocotb makefiles
+#
+# VL_THREADS=<n>  multi-threaded model (--threads n)
+# VL_OPT=1        -O3 and --x-assign fast for verilator and -O3 for the C++ compiler
+# VL_PGO=gen      model collecting the thread profile (--prof-pgo) and the C++ profile
+#                 into VL_PGO_DIR while it runs
+# VL_PGO=use      model optimized with the profiles collected by VL_PGO=gen
+#
+# Each combination needs its own SIM_BUILD directory.
+#############################################################
+
+VL_THREADS ?= 0
+VL_OPT     ?= 0
+VL_PGO     ?=
+VL_PGO_DIR ?= $(abspath pgo)
+
+ifeq ($(SIM),verilator)
+	ifneq ($(VL_THREADS),0)
+		EXTRA_ARGS += --threads $(VL_THREADS)
+	endif
+	ifeq ($(VL_OPT),1)
+		EXTRA_ARGS += -O3 --x-assign fast -CFLAGS -O3
+	endif
+	ifeq ($(VL_PGO),gen)
+		EXTRA_ARGS += --prof-pgo -CFLAGS -fprofile-generate=$(VL_PGO_DIR) -LDFLAGS -fprofile-generate=$(VL_PGO_DIR)
+		PLUSARGS   += +verilator+prof+vlt+file+$(VL_PGO_DIR)/profile.vlt
+	endif
+	ifeq ($(VL_PGO),use)
+		EXTRA_ARGS += $(VL_PGO_DIR)/profile.vlt
+		EXTRA_ARGS += -CFLAGS -fprofile-use=$(VL_PGO_DIR) -CFLAGS -fprofile-partial-training -CFLAGS -Wno-missing-profile
+	endif
+endif
@@ -18,6 +18,7 @@ from cocotb.clock import Clock
 from cocotb.triggers import FallingEdge, Timer
 from cocotbext.uart import UartSource, UartSink
 import random
+import zlib
 
 def to4Bytes(num):
     arr = []
@@ -26,6 +27,21 @@ def to4Bytes(num):
         num = num >> 8
     return bytearray(arr)
 
+def createPacket(seq, addr, data):
+    """ Packet command: command, sequence number, address, word count, data, CRC """
+    body = to4Bytes(seq) + to4Bytes(addr) + to4Bytes(len(data))
+    for word in data:
+        body += to4Bytes(word)
+    return to4Bytes(0xFFFFFFFA) + body + to4Bytes(zlib.crc32(body))
+
+def readImem(dut, idx):
+    imem = dut.DUT_AppleRISCVSoC.soc_imem
+    instr = imem.ram_symbol0[idx].value
+    instr = instr + (imem.ram_symbol1[idx].value << 8)
+    instr = instr + (imem.ram_symbol2[idx].value << 16)
+    instr = instr + (imem.ram_symbol3[idx].value << 24)
+    return instr
+
 ###############################
 # Test suites
 ###############################
@@ -70,4 +86,187 @@ def uartDbg_test(dut):
         instr = instr + (dut.DUT_AppleRISCVSoC.soc_imem.ram_symbol1[i].value << 8)
         instr = instr + (dut.DUT_AppleRISCVSoC.soc_imem.ram_symbol2[i].value << 16)
         instr = instr + (dut.DUT_AppleRISCVSoC.soc_imem.ram_symbol3[i].value << 24)
-        print(hex(instr))
\ No newline at end of file
+        print(hex(instr))
+
+@cocotb.test()
+def uartDbg_block_test(dut):
+    """ Test the block command used by the delta download """
+    clock = Clock(dut.io_clk, 20, units="ns")  # Create a 20 ns period clock on port clk
+    cocotb.fork(clock.start())  # Start the clock
+    yield reset(dut)
+
+    uart_source = UartSource(dut.io_uart0_rxd, baud=115200, bits=8)
+    offset = 4
+    golden = [0xFFFFFFFF, 0xFFFFFFFE, random.randint(0, 0xFFFFFFFF)]
+    dut.DUT_AppleRISCVSoC.io_load_imem = 1
+    # start, block command, address, count, data, end
+    stream = to4Bytes(0xFFFFFFFF) + to4Bytes(0xFFFFFFFD)
+    stream += to4Bytes(0x20000000 + offset * 4) + to4Bytes(len(golden))
+    for data in golden:
+        stream += to4Bytes(data)
+    stream += to4Bytes(0xFFFFFFFE)
+    yield uart_source.write(stream)
+    yield uart_source.wait()
+    yield Timer(1, units="us")
+
+    # Check result
+    print("Check result")
+    imem = dut.DUT_AppleRISCVSoC.soc_imem
+    for i, data in enumerate(golden):
+        instr = imem.ram_symbol0[offset+i].value
+        instr = instr + (imem.ram_symbol1[offset+i].value << 8)
+        instr = instr + (imem.ram_symbol2[offset+i].value << 16)
+        instr = instr + (imem.ram_symbol3[offset+i].value << 24)
+        print(hex(instr))
+        assert instr == data, f"Expect {hex(data)}, get {hex(instr)}"
+
+@cocotb.test()
+def uartDbg_packet_test(dut):
+    """ Test the packet protocol: ping, baud switch, ack and nak """
+    clock = Clock(dut.io_clk, 20, units="ns")  # Create a 20 ns period clock on port clk
+    cocotb.fork(clock.start())  # Start the clock
+    yield reset(dut)
+
+    uart_source = UartSource(dut.io_uart0_rxd, baud=115200, bits=8)
+    uart_sink = UartSink(dut.io_uart0_txd, baud=115200, bits=8)
+    dut.DUT_AppleRISCVSoC.io_load_imem = 1
+    yield uart_source.write(to4Bytes(0xFFFFFFFF) + to4Bytes(0xFFFFFFFB))
+    resp = yield uart_sink.read(2)
+    assert resp == bytes([0x06, 0]), f"Wrong ping response {resp}"
+
+    # switch to 50MHz / 8 / (3 + 1) = 1562500 baud
+    divider = 3
+    yield uart_source.write(to4Bytes(0xFFFFFFFC) + to4Bytes(divider))
+    resp = yield uart_sink.read(2)
+    assert resp == bytes([0x06, divider]), f"Wrong baud response {resp}"
+    yield Timer(50, units="us")
+    baud = 50000000 // 8 // (divider + 1)
+    uart_source = UartSource(dut.io_uart0_rxd, baud=baud, bits=8)
+    uart_sink = UartSink(dut.io_uart0_txd, baud=baud, bits=8)
+
+    # clear the ram of the second packet
+    yield uart_source.write(createPacket(0, 0x20000010, [0] * 4))
+    resp = yield uart_sink.read(2)
+    assert resp == bytes([0x06, 0]), f"Wrong packet response {resp}"
+
+    # two packets in flight, the second one with a corrupted data word
+    golden = [random.randint(0, 0xFFFFFFFF) for _ in range(8)]
+    good = createPacket(1, 0x20000000, golden[:4])
+    bad = bytearray(createPacket(2, 0x20000010, golden[4:]))
+    bad[20] ^= 0xFF
+    yield uart_source.write(good + bad)
+    resp = yield uart_sink.read(4)
+    assert resp == bytes([0x06, 1, 0x15, 2]), f"Wrong packet response {resp}"
+    # the corrupted packet is not written
+    for i in range(4, 8):
+        instr = readImem(dut, i)
+        assert instr == 0, f"Expect 0 before the resend, get {hex(instr)}"
+    # a packet larger than the packet buffer is rejected
+    yield uart_source.write(createPacket(3, 0x20000010, [0x12345678] * 65))
+    resp = yield uart_sink.read(2)
+    assert resp == bytes([0x15, 3]), f"Wrong packet response {resp}"
+    # resend the second packet
+    yield uart_source.write(createPacket(2, 0x20000010, golden[4:]) + to4Bytes(0xFFFFFFFE))
+    resp = yield uart_sink.read(2)
+    assert resp == bytes([0x06, 2]), f"Wrong packet response {resp}"
+    yield uart_source.wait()
+    yield Timer(1, units="us")
+
+    for i, data in enumerate(golden):
+        instr = readImem(dut, i)
+        assert instr == data, f"Expect {hex(data)}, get {hex(instr)}"
+
+@cocotb.test()
+def uartDbg_two_download_test(dut):
+    """ Test two downloads back to back, the first one switches the baudrate """
+    clock = Clock(dut.io_clk, 20, units="ns")  # Create a 20 ns period clock on port clk
+    cocotb.fork(clock.start())  # Start the clock
+    yield reset(dut)
+
+    uart_source = UartSource(dut.io_uart0_rxd, baud=115200, bits=8)
+    uart_sink = UartSink(dut.io_uart0_txd, baud=115200, bits=8)
+    dut.DUT_AppleRISCVSoC.io_load_imem = 1
+
+    # first download at 50MHz / 8 / (3 + 1) = 1562500 baud
+    divider = 3
+    yield uart_source.write(to4Bytes(0xFFFFFFFF) + to4Bytes(0xFFFFFFFB) + to4Bytes(0xFFFFFFFC) + to4Bytes(divider))
+    resp = yield uart_sink.read(4)
+    assert resp == bytes([0x06, 0, 0x06, divider]), f"Wrong ping/baud response {resp}"
+    yield Timer(50, units="us")
+    baud = 50000000 // 8 // (divider + 1)
+    fast_source = UartSource(dut.io_uart0_rxd, baud=baud, bits=8)
+    fast_sink = UartSink(dut.io_uart0_txd, baud=baud, bits=8)
+    golden = [random.randint(0, 0xFFFFFFFF) for _ in range(8)]
+    yield fast_source.write(createPacket(1, 0x20000000, golden[:4]) + to4Bytes(0xFFFFFFFE))
+    resp = yield fast_sink.read(2)
+    assert resp == bytes([0x06, 1]), f"Wrong packet response {resp}"
+    yield fast_source.wait()
+    yield Timer(10, units="us")
+
+    # second download at the initial baudrate, the board must respond to the ping
+    yield uart_source.write(to4Bytes(0xFFFFFFFF) + to4Bytes(0xFFFFFFFB))
+    resp = yield uart_sink.read(2)
+    assert resp == bytes([0x06, 0]), f"Wrong ping response after the first download {resp}"
+    yield uart_source.write(createPacket(1, 0x20000010, golden[4:]) + to4Bytes(0xFFFFFFFE))
+    resp = yield uart_sink.read(2)
+    assert resp == bytes([0x06, 1]), f"Wrong packet response {resp}"
+    yield uart_source.wait()
+    yield Timer(1, units="us")
+
+    for i, data in enumerate(golden):
+        instr = readImem(dut, i)
+        assert instr == data, f"Expect {hex(data)}, get {hex(instr)}"
+
+@cocotb.test()
+def uartDbg_raw_command_value_test(dut):
+    """ Test the raw word stream with data words equal to the command values """
+    clock = Clock(dut.io_clk, 20, units="ns")  # Create a 20 ns period clock on port clk
+    cocotb.fork(clock.start())  # Start the clock
+    yield reset(dut)
+
+    uart_source = UartSource(dut.io_uart0_rxd, baud=115200, bits=8)
+    dut.DUT_AppleRISCVSoC.io_load_imem = 1
+    golden = [random.randint(0, 0xFFFFFFF0), 0xFFFFFFFD, 0xFFFFFFFA, 0xFFFFFFFC, 0xFFFFFFFB, 0xFFFFFFF9,
+              random.randint(0, 0xFFFFFFF0)]
+    stream = to4Bytes(0xFFFFFFFF)
+    for data in golden:
+        stream += to4Bytes(data)
+    stream += to4Bytes(0xFFFFFFFE)
+    yield uart_source.write(stream)
+    yield uart_source.wait()
+    yield Timer(1, units="us")
+
+    for i, data in enumerate(golden):
+        instr = readImem(dut, i)
+        assert instr == data, f"Expect {hex(data)}, get {hex(instr)}"
+
+@cocotb.test()
+def uartDbg_checksum_test(dut):
+    """ Test the checksum command after a packet download """
+    clock = Clock(dut.io_clk, 20, units="ns")  # Create a 20 ns period clock on port clk
+    cocotb.fork(clock.start())  # Start the clock
+    yield reset(dut)
+
+    uart_source = UartSource(dut.io_uart0_rxd, baud=115200, bits=8)
+    uart_sink = UartSink(dut.io_uart0_txd, baud=115200, bits=8)
+    dut.DUT_AppleRISCVSoC.io_load_imem = 1
+    golden = [random.randint(0, 0xFFFFFFFF) for _ in range(8)]
+    yield uart_source.write(to4Bytes(0xFFFFFFFF) + createPacket(0, 0x20000000, golden))
+    resp = yield uart_sink.read(2)
+    assert resp == bytes([0x06, 0]), f"Wrong packet response {resp}"
+
+    image = bytearray()
+    for word in golden:
+        image += to4Bytes(word)
+    yield uart_source.write(to4Bytes(0xFFFFFFF9) + to4Bytes(0x20000000) + to4Bytes(len(golden)))
+    resp = yield uart_sink.read(6)
+    expected = bytes([0x06, 0]) + to4Bytes(zlib.crc32(image))
+    assert resp == expected, f"Wrong checksum response {resp}, expect {expected}"
+
+    # checksum of part of the ram
+    yield uart_source.write(to4Bytes(0xFFFFFFF9) + to4Bytes(0x20000004) + to4Bytes(2))
+    resp = yield uart_sink.read(6)
+    expected = bytes([0x06, 0]) + to4Bytes(zlib.crc32(image[4:12]))
+    assert resp == expected, f"Wrong checksum response {resp}, expect {expected}"
+    yield uart_source.write(to4Bytes(0xFFFFFFFE))
+    yield uart_source.wait()
@@ -54,28 +54,61 @@ class AHB3Bus(Bus):
 
 class AHB3ReqTrans(object):
     """ AHB Lite 3 Request Transaction """
+    # HTRANS
+    IDLE   = 0
     NONSEQ = 2
-    def __init__(self, active, addr, data, write, size=2, burst=0):
+    SEQ    = 3
+    # HBURST
+    SINGLE = 0
+    INCR   = 1
+    WRAP4  = 2
+    INCR4  = 3
+    WRAP8  = 4
+    INCR8  = 5
+    WRAP16 = 6
+    INCR16 = 7
+    BEATS  = {SINGLE: 1, WRAP4: 4, INCR4: 4, WRAP8: 8, INCR8: 8, WRAP16: 16, INCR16: 16}
+    WRAPS  = (WRAP4, WRAP8, WRAP16)
+
+    def __init__(self, active, addr, data, write, size=2, burst=0, seq=False):
+        """
+            @param seq: the transaction is a following beat of a burst
+        """
         self.HSEL   = True if active else False
         self.HWRITE = 1 if write else 0
         self.HADDR  = addr
         self.HWDATA = data
         self.HSIZE  = size
-        self.HTRANS = AHB3ReqTrans.NONSEQ if active else 0
+        self.HTRANS = (AHB3ReqTrans.SEQ if seq else AHB3ReqTrans.NONSEQ) if active else AHB3ReqTrans.IDLE
         self.HBURST = burst
         self.HPROT  = 0
         self.HREADY = 1
         self.HMASTLOCK = 0
 
+    @staticmethod
+    def burstAddr(addr, burst, size=2, length=1):
+        """ Address of each beat of a burst
+
+            @param length: number of beats of an INCR (undefined length) burst
+        """
+        beats = AHB3ReqTrans.BEATS.get(burst, length)
+        step  = 1 << size
+        if burst in AHB3ReqTrans.WRAPS:
+            boundary = beats * step
+            base = addr & ~(boundary - 1)
+            return [base + ((addr - base + i * step) % boundary) for i in range(beats)]
+        return [addr + i * step for i in range(beats)]
+
 class AHB3RespTrans(object):
     """ AHB Lite 3 Response Transaction """
-    def __init__(self, addr, data):
+    def __init__(self, addr, data, tid=None):
         self.HADDR  = addr
         self.HRDATA = data
         self.HREADYOUT = 1
+        self.tid    = tid
 
     def __str__(self):
-        return f"data: {self.HRDATA}, addr: {self.HADDR}"
+        return f"id: {self.tid}, data: {self.HRDATA}, addr: {self.HADDR}"
 
     def __eq__(self, other):
         if not isinstance(other, AHB3RespTrans):
@@ -84,10 +117,14 @@ class AHB3RespTrans(object):
 
 class AHB3Generator(object):
     """ AHB Lite 3 Generator
-        Only support single transcation right now.
+        read/write send a single transcation.
+        pipeline/burst send back to back transactions: the address phase of the next
+        transaction overlaps with the data phase of the current transaction.
     """
-    def __init__(self, clk, driver, scoreboard, debug=False):
+    def __init__(self, clk, driver, scoreboard, debug=False, stats=None, profiler=None):
         self.clk        = clk
+        self.stats      = stats
+        self.profiler   = profiler
         self.count      = 0
         self.readCount  = 0
         self.writeCount = 0
@@ -96,6 +133,9 @@ class AHB3Generator(object):
         self.wait       = 100
         self.log        = cocotb.log
         self.debug      = debug
+        # throughput of the pipelined transactions
+        self.words      = 0
+        self.cycles     = 0
 
     def reset(self):
         self.driver.append(AHB3ReqTrans(False, 0x0, 0x0, False))
@@ -128,6 +168,79 @@ class AHB3Generator(object):
         await self.driver.send(dataPhase)
         await Timer(random.randint(1, self.wait), "ns")
 
+    def _issue(self, req):
+        """ Update the scoreboard for a pipelined request, in program order """
+        if req is None:
+            return None
+        if req.HWRITE:
+            self.scoreboard.updateMemory(req.HADDR, req.HWDATA)
+        else:
+            self.scoreboard.addExpected(AHB3RespTrans(req.HADDR, self.scoreboard.getData(req.HADDR)))
+        return req
+
+    async def pipeline(self, reqs):
+        """ Send the requests back to back
+
+            The address phase is held while HREADYOUT is low.
+            @param reqs: iterable of AHB3ReqTrans, HWDATA is the write data
+            @return: (number of words transferred, number of cycles)
+        """
+        bus   = self.driver.bus
+        reqs  = iter(reqs)
+        await self.driver._wait_for_signal(bus.HREADYOUT)
+        await RisingEdge(self.clk)
+        addrPhase = self._issue(next(reqs, None))
+        dataPhase = None
+        words  = 0
+        cycles = 0
+        while addrPhase or dataPhase:
+            wdata = dataPhase.HWDATA if dataPhase and dataPhase.HWRITE else 0
+            if addrPhase:
+                bus.drive(AHB3ReqTrans(True, addrPhase.HADDR, wdata, addrPhase.HWRITE, addrPhase.HSIZE,
+                                       addrPhase.HBURST, addrPhase.HTRANS == AHB3ReqTrans.SEQ))
+            else:
+                bus.drive(AHB3ReqTrans(False, 0x0, wdata, False))
+            await RisingEdge(self.clk)
+            cycles += 1
+            if bus.HREADYOUT.value:
+                if dataPhase:
+                    words += 1
+                dataPhase = addrPhase
+                addrPhase = self._issue(next(reqs, None))
+        self.words  += words
+        self.cycles += cycles
+        return words, cycles
+
+    async def burst(self, addr, burst, write=False, data=None, length=1):
+        """ Send a INCR/WRAP burst
+
+            @param data: write data of each beat
+        """
+        addrs = AHB3ReqTrans.burstAddr(addr, burst, length=length)
+        data  = data if data else [0] * len(addrs)
+        reqs  = [AHB3ReqTrans(True, a, d, write, burst=burst, seq=(i > 0))
+                 for i, (a, d) in enumerate(zip(addrs, data))]
+        if self.debug:
+            self.log.info(f"Generate {'write' if write else 'read'} burst {burst} at addr {hex(addr)}")
+        return await self.pipeline(reqs)
+
+    def throughput(self):
+        """ Sustained words per cycle of the pipelined transactions """
+        return self.words / self.cycles if self.cycles else 0
+
+    async def report(self, name):
+        """ Wait for the last transaction to complete and report the cache statistics """
+        await self.driver._wait_for_signal(self.driver.bus.HREADYOUT)
+        await RisingEdge(self.clk)
+        await RisingEdge(self.clk)
+        if self.cycles:
+            self.log.info(f"Throughput: {self.words} words in {self.cycles} cycles, "
+                          f"{self.throughput():.3f} words/cycle")
+        if self.profiler:
+            self.profiler.report(name)
+        if self.stats:
+            return self.stats.report(name, (self.words, self.cycles) if self.cycles else None)
+
 
 class AHB3Driver(BusDriver):
     """ AHB Lite3 Driver """
@@ -141,9 +254,10 @@ class AHB3Driver(BusDriver):
 class AHB3Monitor(BusMonitor):
     """ AHB Lite3 BusMonitor """
 
-    def __init__(self, entity, name, clock, reset=None, debug=False, type = AHB3Signal.SLAVE):
+    def __init__(self, entity, name, clock, reset=None, debug=False, type = AHB3Signal.SLAVE, stats=None):
         self.debug = debug
         self.type = type
+        self.stats = stats
         self._signals = AHB3Signal.ahb3SlaveSignal if (self.type == AHB3Signal.SLAVE) else AHB3Signal.ahb3MasterSignal
         super().__init__(entity, name, clock, reset)
 
@@ -156,9 +270,13 @@ class AHB3Monitor(BusMonitor):
     async def _monitor_recv(self):
         hasReadReq  = False
         addr        = 0
+        cycle       = 0
 
         while True:
             await RisingEdge(self.clock)
+            cycle += 1
+            if self.stats and self.bus.HREADYOUT.value:
+                self.stats.complete(cycle)
             if self.bus.HREADYOUT.value and hasReadReq:
                 hasReadReq = False
                 data = self.bus.HRDATA.value.integer
@@ -166,9 +284,14 @@ class AHB3Monitor(BusMonitor):
                     self.log.info(f"Captured read data: {data}, addr: {hex(addr)}")
                 tr = AHB3RespTrans(addr, data)
                 self._recv(tr)
+            # the address phase is only taken when HREADYOUT is high
+            if not self.bus.HREADYOUT.value:
+                continue
             if (not self._reset.value) and self.readHSEL() and (not self.bus.HWRITE.value):
                 hasReadReq = True
                 addr = self.bus.HADDR.value.integer
+            if self.stats and (not self._reset.value) and self.readHSEL() and self.bus.HTRANS.value.integer >= AHB3ReqTrans.NONSEQ:
+                self.stats.request(self.bus.HADDR.value.integer, self.bus.HWRITE.value.integer, cycle)
 
 #################################################################
 
@@ -0,0 +1,110 @@
+##################################################################################################
+##
+## Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+##
+## ~~~ Hardware in SpinalHDL ~~~
+##
+## Author: Heqing Huang
+## Date Created: 10/17/2026
+##
+## ================== Description ==================
+##
+## Reference model of Ahblite3Cache
+##
+## The model only tracks tag, valid, dirty and NRU bits so it can predict whether an access
+## hits, misses or misses with a dirty line written back. The replacement follows
+## findNewSetNRU in Ahblite3Cache.scala.
+##
+##################################################################################################
+
+import os
+
+HIT       = 'hit'
+MISS      = 'miss'
+WRITEBACK = 'writeback'
+RESULTS   = (HIT, MISS, WRITEBACK)
+
+def log2(n):
+    return n.bit_length() - 1
+
+class CacheConfig:
+    """ Cache geometry, same as CacheConfig in Ahblite3Cache.scala """
+    def __init__(self, cacheLineSize=16, setNum=4, setSize=128, replacement="NRU"):
+        """
+            @param cacheLineSize: cache line size in byte
+            @param setNum: number of set
+            @param setSize: size of each set
+        """
+        assert cacheLineSize >= 4 and cacheLineSize % 4 == 0
+        assert setNum & (setNum - 1) == 0 and setSize & (setSize - 1) == 0
+        self.cacheLineSize = cacheLineSize
+        self.setNum        = setNum
+        self.setSize       = setSize
+        self.replacement   = replacement
+        self.wordCount     = cacheLineSize // 4
+        self.offsetBits    = log2(cacheLineSize)
+        self.idxBits       = log2(setSize)
+
+    @staticmethod
+    def fromEnv():
+        """ Geometry of the cache under test, default to CacheMain in Ahblite3Cache.scala """
+        return CacheConfig(int(os.getenv('CACHE_LINE_SIZE', 16)),
+                           int(os.getenv('CACHE_SET_NUM', 4)),
+                           int(os.getenv('CACHE_SET_SIZE', 128)),
+                           os.getenv('CACHE_REPLACE', 'NRU'))
+
+    def index(self, addr):
+        return (addr >> self.offsetBits) & (self.setSize - 1)
+
+    def tag(self, addr):
+        return addr >> (self.offsetBits + self.idxBits)
+
+    def __str__(self):
+        return f"line {self.cacheLineSize}B, {self.setNum} sets x {self.setSize}, {self.replacement}"
+
+class CacheModel:
+    """ Cache reference model """
+    def __init__(self, config):
+        self.config = config
+        entries     = config.setNum * config.setSize
+        # entry of set s at index i is at i * setNum + s
+        self.tags   = [0] * entries
+        self.valid  = bytearray(entries)
+        self.dirty  = bytearray(entries)
+        self.nru    = bytearray(b'\x01' * entries)
+        self.counts = dict.fromkeys(RESULTS, 0)
+
+    def victim(self, base):
+        """ Find the set to fill the data, same as findNewSetNRU """
+        setNum = self.config.setNum
+        nrus   = self.nru[base:base+setNum]
+        dirtys = self.dirty[base:base+setNum]
+        if any(nrus):
+            return nrus.index(1)
+        if all(dirtys) or not any(dirtys):
+            return 0
+        return dirtys.index(1)
+
+    def access(self, addr, write):
+        """ @return: HIT, MISS or WRITEBACK """
+        config = self.config
+        base   = config.index(addr) * config.setNum
+        tag    = config.tag(addr)
+        for entry in range(base, base + config.setNum):
+            if self.valid[entry] and self.tags[entry] == tag:
+                self.nru[entry] = 0
+                if write:
+                    self.dirty[entry] = 1
+                self.counts[HIT] += 1
+                return HIT
+        entry  = base + self.victim(base)
+        result = WRITEBACK if self.dirty[entry] else MISS
+        # If no NRU bit found, reset NRU
+        if not any(self.nru[base:base+config.setNum]):
+            self.nru[base:base+config.setNum] = b'\x01' * config.setNum
+        self.tags[entry]  = tag
+        self.valid[entry] = 1
+        self.dirty[entry] = 1 if write else 0
+        self.nru[entry]   = 0
+        self.counts[result] += 1
+        return result
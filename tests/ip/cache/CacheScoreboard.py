@@ -13,17 +13,25 @@
 ##
 ##################################################################################################
 
-from cocotb_bus.scoreboard import Scoreboard
+from cocotb.result import TestFailure
 
-class CacheScoreboard(Scoreboard):
-    """ Cache Scoreboard """
+class CacheScoreboard:
+    """ Cache Scoreboard
+
+        AHB read responses come back in the order of the requests, so each expected
+        transaction gets an incrementing ID and the monitored transaction is matched
+        with the expected transaction of the same ID in O(1).
+    """
     def __init__(self, dut, ram, monitor, debug=False):
-        super().__init__(dut)
         self.ram = ram
-        self.expected_output = []
+        self.expected_output = {}
         self.dut = dut
-        self.add_interface(monitor, self.expected_output)
+        self.log = dut._log
         self.debug = debug
+        self.expId = 0
+        self.recvId = 0
+        self.errors = 0
+        monitor.add_callback(self.compare)
 
     def getData(self, addr):
         return self.ram[addr>>2]
@@ -34,6 +42,27 @@ class CacheScoreboard(Scoreboard):
             self.log.info(f"Updated memory in scoreboard. Addr: {addr}, DATA: {value}")
 
     def addExpected(self, tr):
+        tr.tid = self.expId
+        self.expId += 1
         if self.debug:
             self.log.info(f"Added Expected Transaction: {tr}")
-        self.expected_output.append(tr)
\ No newline at end of file
+        self.expected_output[tr.tid] = tr
+
+    def compare(self, tr):
+        """ Compare the monitored transaction with the expected transaction """
+        tr.tid = self.recvId
+        self.recvId += 1
+        exp = self.expected_output.pop(tr.tid, None)
+        if exp is None:
+            self.errors += 1
+            self.log.error(f"Received transaction without expected transaction: {tr}")
+            raise TestFailure("Unexpected transaction")
+        if exp != tr:
+            self.errors += 1
+            self.log.error("Received transaction differed from expected transaction")
+            self.log.error(f"Expected: {exp}")
+            self.log.error(f"Received: {tr}")
+            raise TestFailure("Received transaction differed from expected transaction")
+        if self.debug:
+            self.log.info(f"Matched Transaction: {tr}")
+
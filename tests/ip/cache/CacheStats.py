@@ -0,0 +1,108 @@
+##################################################################################################
+##
+## Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+##
+## ~~~ Hardware in SpinalHDL ~~~
+##
+## Author: Heqing Huang
+## Date Created: 10/17/2026
+##
+## ================== Description ==================
+##
+## Cache performance statistics
+##
+## The cache monitor reports the start and the end of each access, the memory model reports
+## each access on the memory bus. An access is classified as
+##   - hit:       no memory access
+##   - miss:      the cache line is read from memory
+##   - writeback: the dirty cache line is written to memory before the line is read
+## The latency is the number of cycles from the address phase to the end of the data phase.
+## The reference model predicts the result of each access with the same cache geometry.
+##
+##################################################################################################
+
+import json
+from collections import Counter
+
+from CacheModel import CacheConfig, CacheModel, RESULTS, HIT, MISS, WRITEBACK
+
+class CacheStats:
+    """ Cache hit/miss/writeback statistics and latency histograms """
+    def __init__(self, dut, config=None, debug=False):
+        self.dut       = dut
+        self.log       = dut._log
+        self.debug     = debug
+        self.model     = CacheModel(config if config else CacheConfig.fromEnv())
+        self.counts    = dict.fromkeys(RESULTS, 0)
+        self.latency   = {result: Counter() for result in RESULTS}
+        self.mismatch  = 0
+        self.memReads  = 0
+        self.memWrites = 0
+        self.pending   = None
+
+    def memAccess(self, write):
+        """ Called by the memory model on each memory access """
+        if write:
+            self.memWrites += 1
+        else:
+            self.memReads += 1
+
+    def request(self, addr, write, cycle):
+        """ Called by the cache monitor on the address phase of an access """
+        predicted = self.model.access(addr, write)
+        self.pending = (addr, write, cycle, self.memReads, self.memWrites, predicted)
+
+    def complete(self, cycle):
+        """ Called by the cache monitor at the end of the data phase """
+        if self.pending is None:
+            return
+        addr, write, start, memReads, memWrites, predicted = self.pending
+        self.pending = None
+        if self.memWrites > memWrites:
+            result = WRITEBACK
+        elif self.memReads > memReads:
+            result = MISS
+        else:
+            result = HIT
+        self.counts[result] += 1
+        self.latency[result][cycle - start] += 1
+        if result != predicted:
+            self.mismatch += 1
+            if self.debug:
+                self.log.warning(f"{'Write' if write else 'Read'} {hex(addr)} is a {result}, "
+                                 f"reference model predicts {predicted}")
+
+    def summary(self):
+        total = sum(self.counts.values())
+        return {
+            'accesses':     total,
+            'counts':       self.counts,
+            'hitRate':      self.counts[HIT] / total if total else 0,
+            'predicted':    self.model.counts,
+            'mismatch':     self.mismatch,
+            'memReads':     self.memReads,
+            'memWrites':    self.memWrites,
+            'latency':      {result: dict(sorted(hist.items())) for result, hist in self.latency.items()},
+            'config':       str(self.model.config),
+        }
+
+    def report(self, name, pipeline=None):
+        """ Print the statistics and write them to <name>.stats.json
+
+            @param pipeline: (words, cycles) of the pipelined transactions
+        """
+        summary = self.summary()
+        if pipeline:
+            summary['pipeline'] = {'words': pipeline[0], 'cycles': pipeline[1]}
+        self.log.info(f"==== Cache statistics: {name} ({summary['config']}) ====")
+        self.log.info(f"accesses: {summary['accesses']}, hit rate: {summary['hitRate']:.2%}, "
+                      f"memory reads: {self.memReads}, memory writes: {self.memWrites}")
+        for result in RESULTS:
+            hist = summary['latency'][result]
+            self.log.info(f"{result:>9}: {self.counts[result]:>6} (predicted {self.model.counts[result]:>6}), "
+                          f"latency histogram {hist}")
+        if self.mismatch:
+            self.log.warning(f"{self.mismatch} accesses differ from the reference model")
+        with open(f"{name}.stats.json", 'w') as f:
+            json.dump(summary, f, indent=2)
+        return summary
@@ -0,0 +1,226 @@
+#!/usr/bin/python3
+##################################################################################################
+##
+## Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+##
+## ~~~ Hardware in SpinalHDL ~~~
+##
+## Author: Heqing Huang
+## Date Created: 10/17/2026
+##
+## ================== Description ==================
+##
+## Cache design space sweep
+##
+## Run a load/store trace (see traceTests.py) through many cache geometries without the RTL
+## and report the hit rate and the average memory access time (AMAT) of each geometry.
+## The replacement and write back policy is the same as CacheModel.py / Ahblite3Cache.scala.
+##
+## - The trace is decoded once per line size and consecutive accesses to the same cache line
+##   are merged: they always hit after the first one.
+## - Each geometry runs in its own process.
+## - The access time is estimated from the cache state machine: 1 cycle for a hit,
+##   one cycle per word to read the line on a miss and one more cycle per word to flush
+##   the dirty line on a writeback, plus the memory wait states.
+##
+##   python3 CacheSweep.py coremark.trace -line 16,32 -ways 1,2,4 -size 64,128,256
+##
+##################################################################################################
+
+import os
+import sys
+import argparse
+import itertools
+from array import array
+from multiprocessing import Pool
+
+from CacheModel import CacheConfig, RESULTS, HIT, MISS, WRITEBACK
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'cocotb', 'scripts'))
+from sim_trace import read_chunks, RECORD_WORDS, KIND_LOAD, KIND_MEM
+
+###############################
+# Trace
+###############################
+
+def readTrace(file, base=0x80000000, window=0x10000):
+    """ Read the data memory accesses of a trace file
+
+        @return: (address, write) as two arrays
+    """
+    addrs  = array('I')
+    writes = bytearray()
+    for records in read_chunks(file):
+        kinds = records[1::RECORD_WORDS]
+        for kind, addr in zip(kinds, records[2::RECORD_WORDS]):
+            kind &= 0xFF
+            if (kind == KIND_LOAD or kind == KIND_MEM) and 0 <= addr - base < window:
+                addrs.append(addr - base)
+                writes.append(kind == KIND_MEM)
+    return addrs, writes
+
+def mergeLines(addrs, writes, offsetBits):
+    """ Merge consecutive accesses to the same cache line
+
+        @return: (line address, first access is write, any access is write, number of access)
+    """
+    lines  = array('I')
+    first  = bytearray()
+    anyWr  = bytearray()
+    counts = array('I')
+    prev   = None
+    for addr, write in zip(addrs, writes):
+        line = addr >> offsetBits
+        if line == prev:
+            counts[-1] += 1
+            if write:
+                anyWr[-1] = 1
+        else:
+            prev = line
+            lines.append(line)
+            first.append(write)
+            anyWr.append(write)
+            counts.append(1)
+    return lines, first, anyWr, counts
+
+###############################
+# Simulation
+###############################
+
+def simulate(config, lines, first, anyWr, counts):
+    """ Simulate the cache with the merged trace
+
+        @return: number of hit, miss and writeback
+    """
+    setNum  = config.setNum
+    idxMask = config.setSize - 1
+    idxBits = config.idxBits
+    allNru  = [1] * setNum
+    tags    = [[-1] * setNum for _ in range(config.setSize)]
+    dirtys  = [[0] * setNum for _ in range(config.setSize)]
+    nrus    = [[1] * setNum for _ in range(config.setSize)]
+    hit = miss = writeback = 0
+    for line, write, wrote, count in zip(lines, first, anyWr, counts):
+        idx   = line & idxMask
+        tag   = line >> idxBits
+        ts    = tags[idx]
+        dirty = dirtys[idx]
+        nru   = nrus[idx]
+        # the merged accesses always hit
+        hit  += count - 1
+        if tag in ts:
+            way = ts.index(tag)
+            hit += 1
+        else:
+            # same as findNewSetNRU
+            if 1 in nru:
+                way = nru.index(1)
+            else:
+                way = dirty.index(1) if (1 in dirty and 0 in dirty) else 0
+                nru[:] = allNru
+            if dirty[way]:
+                writeback += 1
+            else:
+                miss += 1
+            ts[way]    = tag
+            dirty[way] = write
+        nru[way] = 0
+        if wrote:
+            dirty[way] = 1
+    return {HIT: hit, MISS: miss, WRITEBACK: writeback}
+
+def latency(config, memWait=0):
+    """ Estimated access time of hit, miss and writeback in cycles """
+    line = config.wordCount * (1 + memWait)
+    return {HIT: 1, MISS: 2 + line, WRITEBACK: 3 + 2 * line}
+
+###############################
+# Sweep
+###############################
+
+# Trace shared with the worker processes
+_merged = {}
+
+def _initWorker(merged):
+    global _merged
+    _merged = merged
+
+def _run(args):
+    config, memWait = args
+    counts = simulate(config, *_merged[config.offsetBits])
+    total  = sum(counts.values())
+    cycles = latency(config, memWait)
+    return {
+        'lineSize':  config.cacheLineSize,
+        'ways':      config.setNum,
+        'setSize':   config.setSize,
+        'sizeKB':    config.cacheLineSize * config.setNum * config.setSize / 1024,
+        'accesses':  total,
+        **counts,
+        'hitRate':   counts[HIT] / total if total else 0,
+        'amat':      sum(counts[r] * cycles[r] for r in RESULTS) / total if total else 0,
+    }
+
+def sweep(addrs, writes, configs, memWait=0, jobs=None):
+    """ Simulate every configuration
+
+        @return: list of result dict, sorted by AMAT
+    """
+    merged = {}
+    for config in configs:
+        if config.offsetBits not in merged:
+            merged[config.offsetBits] = mergeLines(addrs, writes, config.offsetBits)
+    tasks = [(config, memWait) for config in configs]
+    if jobs == 1:
+        _initWorker(merged)
+        results = list(map(_run, tasks))
+    else:
+        with Pool(jobs, initializer=_initWorker, initargs=(merged,)) as pool:
+            results = pool.map(_run, tasks)
+    return sorted(results, key=lambda r: (r['amat'], r['sizeKB']))
+
+def printTable(results, file=sys.stdout):
+    header = f"{'line':>5} {'ways':>5} {'setSize':>8} {'size(KB)':>9} {'hit rate':>9} " \
+             f"{'miss':>9} {'writeback':>10} {'AMAT':>7}"
+    print(header, file=file)
+    print('-' * len(header), file=file)
+    for r in results:
+        print(f"{r['lineSize']:>5} {r['ways']:>5} {r['setSize']:>8} {r['sizeKB']:>9.2f} {r['hitRate']:>9.2%} "
+              f"{r[MISS]:>9} {r[WRITEBACK]:>10} {r['amat']:>7.3f}", file=file)
+
+def writeCsv(results, file):
+    keys = list(results[0].keys()) if results else []
+    with open(file, 'w') as f:
+        f.write(','.join(keys) + '\n')
+        for r in results:
+            f.write(','.join(str(r[k]) for k in keys) + '\n')
+
+###############################
+# Main Program
+###############################
+
+def intList(s):
+    return [int(x, 0) for x in s.split(',')]
+
+def cmdParser():
+    parser = argparse.ArgumentParser(description='Sweep the cache geometry over a load/store trace')
+    parser.add_argument('trace', type=str, help='The trace file')
+    parser.add_argument('-line', type=intList, default=[8, 16, 32, 64], help='Cache line sizes in byte')
+    parser.add_argument('-ways', type=intList, default=[1, 2, 4, 8], help='Number of sets (ways)')
+    parser.add_argument('-size', type=intList, default=[32, 64, 128, 256], help='Set sizes')
+    parser.add_argument('-base', type=lambda x: int(x, 0), default=0x80000000, help='Base address of the cached memory')
+    parser.add_argument('-window', type=lambda x: int(x, 0), default=0x10000, help='Size of the cached memory in byte')
+    parser.add_argument('-memwait', type=int, default=0, help='Wait states of the main memory per word')
+    parser.add_argument('-jobs', '-j', type=int, default=None, help='Number of processes, default to the cpu count')
+    parser.add_argument('-o', type=str, dest='output', default=None, help='Write the table as csv')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = cmdParser()
+    addrs, writes = readTrace(args.trace, args.base, args.window)
+    configs = [CacheConfig(line, ways, size) for line, ways, size in itertools.product(args.line, args.ways, args.size)]
+    print(f"{len(addrs)} accesses, {len(configs)} configurations")
+    results = sweep(addrs, writes, configs, args.memwait, args.jobs)
+    printTable(results)
+    if args.output:
+        writeCsv(results, args.output)
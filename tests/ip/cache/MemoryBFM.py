@@ -14,8 +14,40 @@
 ##################################################################################################
 
 from cocotb.triggers import FallingEdge, RisingEdge, Timer
+from functools import lru_cache
+from array import array
 import random
-import copy
+
+@lru_cache(maxsize=None)
+def initImage(depth):
+    """ Initial memory content: each word holds its own byte address.
+        Built once and shared (read only) by all the memory images of the same depth.
+    """
+    return array('I', range(0, depth << 2, 4))
+
+class MemoryImage:
+    """ Copy-on-write memory image
+
+        Reads fall back to the shared initial image, writes go to a private dict.
+        Creating an image or a snapshot does not copy the initial image.
+    """
+    def __init__(self, base, written=None):
+        self.base    = base
+        self.written = written if written is not None else {}
+
+    def __getitem__(self, idx):
+        written = self.written
+        return written[idx] if idx in written else self.base[idx]
+
+    def __setitem__(self, idx, value):
+        self.written[idx] = value
+
+    def __len__(self):
+        return len(self.base)
+
+    def snapshot(self):
+        """ Copy of the image, only the written words are copied """
+        return MemoryImage(self.base, dict(self.written))
 
 class MemoryModel:
     """ Main memory Model """
@@ -24,16 +56,16 @@ class MemoryModel:
         self.depth   = depth
         self.width   = width
         self.bus     = bus
-        self.memory  = {}
+        self.memory  = None
         self.debug   = debug
+        self.stats   = None     # CacheStats to report each memory access
         self.initMem()
 
     def initMem(self):
-        for i in range(self.depth):
-            self.memory[i] = i << 2
+        self.memory = MemoryImage(initImage(self.depth))
 
     def getMemory(self):
-        return copy.deepcopy(self.memory)
+        return self.memory.snapshot()
 
     async def start(self):
         hsel   = 0
@@ -48,6 +80,8 @@ class MemoryModel:
             await RisingEdge(self.dut.clk)
             await Timer(1, "ns")
             # process address phase from previous clock
+            if (htrans > 1) and self.stats:
+                self.stats.memAccess(hwrite)
             if (htrans > 1) and hwrite:
                 hwdata = self.bus.HWDATA.value.integer
                 self.memory[haddr>>2] = hwdata
@@ -33,6 +33,7 @@ async def cacheReadMissHit(dut):
     await cacheAhbGen.read(0x4)
     await cacheAhbGen.read(0x8)
     await cacheAhbGen.read(0xC)
+    await cacheAhbGen.report("cacheReadMissHit")
 
 @cocotb.test()
 async def cacheWriteHit(dut):
@@ -47,6 +48,7 @@ async def cacheWriteHit(dut):
     await cacheAhbGen.read(0x0)
     await cacheAhbGen.write(0x4, 0x34)
     await cacheAhbGen.read(0x4)
+    await cacheAhbGen.report("cacheWriteHit")
 
 @cocotb.test()
 async def cacheWriteMiss(dut):
@@ -60,6 +62,7 @@ async def cacheWriteMiss(dut):
     await cacheAhbGen.write(0xc, 0xbb)
     await cacheAhbGen.read(0x8)
     await cacheAhbGen.read(0xc)
+    await cacheAhbGen.report("cacheWriteMiss")
 
 @cocotb.test()
 async def cacheReadSet(dut):
@@ -69,6 +72,7 @@ async def cacheReadSet(dut):
     await reset(dut)
     await cacheAhbGen.read(0x0)
     await cacheAhbGen.read(0x400)
+    await cacheAhbGen.report("cacheReadSet")
 
 @cocotb.test()
 async def cacheReadSetReplace(dut):
@@ -79,6 +83,7 @@ async def cacheReadSetReplace(dut):
     await cacheAhbGen.read(0x0)
     await cacheAhbGen.read(0x400)
     await cacheAhbGen.read(0x800)
+    await cacheAhbGen.report("cacheReadSetReplace")
 
 @cocotb.test()
 async def cacheReadSetReplaceDirty(dut):
@@ -93,3 +98,22 @@ async def cacheReadSetReplaceDirty(dut):
     await cacheAhbGen.read(0x400)
     await cacheAhbGen.read(0x800)
     await cacheAhbGen.read(0x400)
+    await cacheAhbGen.report("cacheReadSetReplaceDirty")
+
+@cocotb.test()
+async def cachePipelineBurst(dut):
+    """ Back to back transactions and bursts
+        - INCR4 write burst then WRAP4 read burst on the same cache line
+        - INCR8 read burst across two cache lines
+        - Back to back write and read on the same cache line
+    """
+    cacheAhbGen = setup(dut)
+    await reset(dut)
+    await cacheAhbGen.burst(0x100, AHB3ReqTrans.INCR4, write=True, data=[0x11, 0x22, 0x33, 0x44])
+    await cacheAhbGen.burst(0x108, AHB3ReqTrans.WRAP4)
+    await cacheAhbGen.burst(0x200, AHB3ReqTrans.INCR8)
+    await cacheAhbGen.pipeline([AHB3ReqTrans(True, 0x300, 0x55, True),
+                                AHB3ReqTrans(True, 0x300, 0x0, False),
+                                AHB3ReqTrans(True, 0x304, 0x66, True),
+                                AHB3ReqTrans(True, 0x304, 0x0, False)])
+    await cacheAhbGen.report("cachePipelineBurst")
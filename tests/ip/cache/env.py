@@ -20,9 +20,11 @@ from cocotb.triggers import FallingEdge, RisingEdge, Timer
 import random
 import os
 
-from AhbBFM import AHB3Bus, AHB3Driver, AHB3Generator, AHB3Monitor, AHB3Signal
+from AhbBFM import AHB3Bus, AHB3Driver, AHB3Generator, AHB3Monitor, AHB3Signal, AHB3ReqTrans
 from MemoryBFM import *
 from CacheScoreboard import *
+from CacheStats import CacheStats
+from sim_profile import SimProfiler
 
 #########################################################################
 
@@ -54,12 +56,17 @@ async def reset(dut, time=20):
 def setup(dut, memDepth = 4096):
     memoryAhbBus = AHB3Bus(dut, 'io_mem_ahb', type=AHB3Signal.MASTER)
     memory       = MemoryModel(dut, memDepth, 32, memoryAhbBus, debug=debug)
-    cacheAhbMon  = AHB3Monitor(dut, 'io_cache_ahb', dut.clk, reset=dut.reset, debug=debug)
+    stats        = CacheStats(dut, debug=debug)
+    memory.stats = stats
+    cacheAhbMon  = AHB3Monitor(dut, 'io_cache_ahb', dut.clk, reset=dut.reset, debug=debug, stats=stats)
     cacheSB      = CacheScoreboard(dut, memory.getMemory(), cacheAhbMon, debug=debug)
     cacheAhbDrv  = AHB3Driver(dut, 'io_cache_ahb', dut.clk)
-    cacheAhbGen  = AHB3Generator(dut.clk, cacheAhbDrv, cacheSB)
+    profiler     = SimProfiler.fromEnv(period=20)
+    cacheAhbGen  = AHB3Generator(dut.clk, cacheAhbDrv, cacheSB, stats=stats, profiler=profiler)
     cacheAhbGen.reset()
     clock = Clock(dut.clk, 20, units="ns")  # Create a 20 ns period clock on port clk
     cocotb.fork(clock.start())
     cocotb.fork(memory.start())
+    if profiler:
+        profiler.start()
     return cacheAhbGen
@@ -11,11 +11,16 @@
 ##
 ## Test the cache module
 ##
+## The seeds are picked at random unless CACHE_SEEDS (comma separated) is set, CACHE_TESTS
+## (comma separated) selects the test groups: randomAddr, sameSetAddr, pipeline.
+## regress.py uses them to run each seed in its own simulator process.
+##
 ##################################################################################################
 
 import cocotb
 import random
 import sys
+import os
 from env import *
 
 memDepth = 4096
@@ -48,19 +53,45 @@ def cacheRandomRead(dut, iterNum, addrGen, seed):
             yield cacheAhbGen.read(addr)
         else:
             yield cacheAhbGen.write(addr, data)
+    yield cacheAhbGen.report(f"{addrGen.__name__}_{seed}")
+
+@cocotb.coroutine
+def cacheRandomPipeline(dut, iterNum, addrGen, seed):
+    """ Cache Random Read/Write test with back to back transactions
+        Report the sustained throughput.
+    """
+    cacheAhbGen = setup(dut)
+    random.seed(seed)
+    yield reset(dut)
+    reqs = (AHB3ReqTrans(True, addrGen(), random.randint(0, 1000), random.randint(0, 1)) for _ in range(iterNum))
+    yield cacheAhbGen.pipeline(reqs)
+    yield cacheAhbGen.report(f"pipeline_{addrGen.__name__}_{seed}")
+
+TEST_GROUPS = ('randomAddr', 'sameSetAddr', 'pipeline')
+SEEDS = [int(x, 0) for x in os.getenv('CACHE_SEEDS', '').split(',') if x]
+TESTS = [x for x in os.getenv('CACHE_TESTS', ','.join(TEST_GROUPS)).split(',') if x]
+
+def getSeeds(num):
+    """ The seeds of CACHE_SEEDS or num random seeds """
+    return SEEDS if SEEDS else [random.randint(0, sys.maxsize-1) for x in range(num)]
+
+if 'randomAddr' in TESTS:
+    randomAddrTF = cocotb.regression.TestFactory(cacheRandomRead)
+    randomAddrTF.add_option("iterNum",  [10000])
+    randomAddrTF.add_option("addrGen",  [addrRandom])
+    randomAddrTF.add_option("seed",     getSeeds(10))
+    randomAddrTF.generate_tests(prefix="randomAddr")
 
-seeds = [random.randint(0, sys.maxsize-1) for x in range(10)]
-randomAddrTF = cocotb.regression.TestFactory(cacheRandomRead)
-randomAddrTF.add_option("iterNum",  [10000])
-randomAddrTF.add_option("addrGen",  [addrRandom])
-randomAddrTF.add_option("seed",     seeds)
-#randomAddrTF.add_option("addrGen",  [addrRandom])
-#randomAddrTF.add_option("seed",     [118544370685217500])  # To debug a seed
-randomAddrTF.generate_tests(prefix="randomAddr")
+if 'sameSetAddr' in TESTS:
+    sameSetAddrTF = cocotb.regression.TestFactory(cacheRandomRead)
+    sameSetAddrTF.add_option("iterNum",  [2000])
+    sameSetAddrTF.add_option("addrGen",  [addrSameSet])
+    sameSetAddrTF.add_option("seed",     getSeeds(5))
+    sameSetAddrTF.generate_tests(prefix="sameSetAddr")
 
-seeds = [random.randint(0, sys.maxsize-1) for x in range(5)]
-sameSetAddrTF = cocotb.regression.TestFactory(cacheRandomRead)
-sameSetAddrTF.add_option("iterNum",  [2000])
-sameSetAddrTF.add_option("addrGen",  [addrSameSet])
-sameSetAddrTF.add_option("seed",     seeds)
-sameSetAddrTF.generate_tests(prefix="sameSetAddr")
+if 'pipeline' in TESTS:
+    pipelineTF = cocotb.regression.TestFactory(cacheRandomPipeline)
+    pipelineTF.add_option("iterNum",  [10000])
+    pipelineTF.add_option("addrGen",  [addrRandom, addrSameSet])
+    pipelineTF.add_option("seed",     getSeeds(5))
+    pipelineTF.generate_tests(prefix="pipeline")
@@ -0,0 +1,196 @@
+#!/usr/bin/python3
+##################################################################################################
+##
+## Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+##
+## ~~~ Hardware in SpinalHDL ~~~
+##
+## Author: Heqing Huang
+## Date Created: 10/17/2026
+##
+## ================== Description ==================
+##
+## Multi-seed random cache regression
+##
+## The simulation model is built once. Each (test group, seed) of randomTests.py then runs in
+## its own simulator process inside its own work directory, several of them in parallel.
+## The verdict of every seed is stored in the results database so a failing seed can be
+## reproduced and rerun later:
+##
+##   python3 regress.py -seeds 1000 -jobs 8
+##   python3 regress.py --rerun-failed
+##   make random CACHE_TESTS=randomAddr CACHE_SEEDS=<seed>      # debug a single seed
+##
+##################################################################################################
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+from multiprocessing import Pool
+
+REPO_ROOT  = subprocess.run("git rev-parse --show-toplevel", shell=True,
+                            stdout=subprocess.PIPE).stdout.decode().rstrip()
+CACHE_DIR  = os.path.dirname(os.path.abspath(__file__))
+WORK_DIR   = os.path.join(CACHE_DIR, 'work')
+SIM_BUILD  = os.path.join(WORK_DIR, 'sim_build')
+DB_FILE    = os.path.join(CACHE_DIR, 'regress.json')
+LOG_FILE   = 'make.log'
+
+TEST_GROUPS = ('randomAddr', 'sameSetAddr', 'pipeline')
+# Files needed to run the tests in a work directory
+TB_FILES = ['randomTests.py', 'env.py', 'AhbBFM.py', 'MemoryBFM.py', 'CacheModel.py',
+            'CacheScoreboard.py', 'CacheStats.py', 'makefile']
+
+###############################
+# Results database
+###############################
+
+def loadDB(file):
+    if not os.path.isfile(file):
+        return {}
+    with open(file) as f:
+        return json.load(f)
+
+def saveDB(file, db):
+    tmp = file + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(db, f, indent=2, sort_keys=True)
+    os.replace(tmp, file)
+
+def dbKey(group, seed):
+    return f"{group}:{seed}"
+
+def failedRuns(db, groups):
+    """ (group, seed) whose last run failed """
+    return [(r['group'], r['seed']) for r in db.values() if r['verdict'] != 'PASS' and r['group'] in groups]
+
+def record(db, group, seed, verdict, elapsed, workdir, revision):
+    """ Add the verdict of a run into the database """
+    entry = db.setdefault(dbKey(group, seed), {'group': group, 'seed': seed, 'runs': 0, 'fails': 0})
+    entry['runs'] += 1
+    entry['fails'] += verdict != 'PASS'
+    entry['verdict'] = verdict
+    entry['elapsed'] = round(elapsed, 1)
+    entry['date'] = time.strftime("%Y-%m-%d %H:%M:%S")
+    entry['revision'] = revision
+    entry['workdir'] = workdir
+
+###############################
+# Run
+###############################
+
+def gitRevision():
+    cmd = "git rev-parse --short HEAD && git status --porcelain --untracked-files=no"
+    output = subprocess.run(cmd, shell=True, cwd=REPO_ROOT, stdout=subprocess.PIPE).stdout.decode().split('\n')
+    return output[0] + ('-dirty' if any(output[1:]) else '')
+
+def checkResult(file):
+    """ Check the test result in the cocotb result file """
+    if not os.path.isfile(file):
+        return 'ERROR'
+    with open(file) as f:
+        contents = f.read()
+    if '<testcase' not in contents:
+        return 'ERROR'
+    return 'FAIL' if '<failure' in contents else 'PASS'
+
+def buildModel(dump):
+    """ Build the simulation model shared by all the runs """
+    os.makedirs(WORK_DIR, exist_ok=True)
+    cmd = f"make build_model SIM_BUILD={SIM_BUILD} DUMP={dump}"
+    if subprocess.run(cmd, shell=True, cwd=CACHE_DIR).returncode != 0:
+        raise RuntimeError("Failed to build the simulation model")
+
+def createSandbox(group, seed):
+    """ Create a work directory for a run so it does not share any file with other runs """
+    workdir = os.path.join(WORK_DIR, f"{group}_{seed}")
+    subprocess.run(f"rm -rf {workdir}", shell=True)
+    os.makedirs(workdir)
+    for file in TB_FILES:
+        os.symlink(os.path.join(CACHE_DIR, file), os.path.join(workdir, file))
+    return workdir
+
+def runSeed(task):
+    """ Run a test group with one seed. Executed in the worker process """
+    group, seed, dump, timeout = task
+    workdir = createSandbox(group, seed)
+    cmd = f"make MODULE=randomTests SIM_BUILD={SIM_BUILD} DUMP={dump} CACHE_TESTS={group} CACHE_SEEDS={seed}"
+    env = dict(os.environ, PWD=workdir)
+    start = time.time()
+    with open(os.path.join(workdir, LOG_FILE), 'w') as log:
+        try:
+            subprocess.run(cmd, shell=True, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+                           timeout=timeout)
+            verdict = checkResult(os.path.join(workdir, 'results.xml'))
+        except subprocess.TimeoutExpired:
+            verdict = 'TIMEOUT'
+    return group, seed, verdict, time.time() - start, workdir
+
+def regress(tasks, jobs, db, dbFile, keep=False):
+    """ Run the tasks in a process pool and record the verdicts
+
+        @return: list of failing (group, seed)
+    """
+    revision = gitRevision()
+    failed = []
+    with Pool(jobs) as pool:
+        for count, (group, seed, verdict, elapsed, workdir) in enumerate(pool.imap_unordered(runSeed, tasks), 1):
+            if verdict != 'PASS':
+                failed.append((group, seed))
+            elif not keep:
+                subprocess.run(f"rm -rf {workdir}", shell=True)
+                workdir = None
+            record(db, group, seed, verdict, elapsed, workdir, revision)
+            # save after every run so an interrupted regression keeps its results
+            saveDB(dbFile, db)
+            print(f"[{count}/{len(tasks)}] {group} seed {seed}: {verdict} ({elapsed:.1f}s)")
+    return failed
+
+###############################
+# Main Program
+###############################
+
+def cmdParser():
+    parser = argparse.ArgumentParser(description='Run the random cache tests with many seeds in parallel')
+    parser.add_argument('-seeds', '-n', type=int, default=20, help='Number of new random seeds per test group')
+    parser.add_argument('-seed', type=str, default=None, help='Comma separated seeds to run instead of random ones')
+    parser.add_argument('-tests', '-t', type=str, default=','.join(TEST_GROUPS), help='Comma separated test groups')
+    parser.add_argument('-jobs', '-j', type=int, default=os.cpu_count(), help='Number of simulations in parallel')
+    parser.add_argument('-timeout', type=int, default=None, help='Timeout of each simulation in seconds')
+    parser.add_argument('-dump', '-d', type=int, default=0, help='Dump the waveform')
+    parser.add_argument('-db', type=str, default=DB_FILE, help='The results database')
+    parser.add_argument('-keep', action='store_true', help='Keep the work directory of the passing runs')
+    parser.add_argument('--rerun-failed', action='store_true', help='Only rerun the seeds that failed last time')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = cmdParser()
+    groups = args.tests.split(',')
+    for group in groups:
+        if group not in TEST_GROUPS:
+            sys.exit(f"Unknown test group {group}, valid groups: {','.join(TEST_GROUPS)}")
+    db = loadDB(args.db)
+    if args.rerun_failed:
+        runs = failedRuns(db, groups)
+        if not runs:
+            print("No failed seed in the results database")
+            sys.exit(0)
+    else:
+        if args.seed:
+            seeds = [int(x, 0) for x in args.seed.split(',')]
+        else:
+            seeds = [random.randint(0, sys.maxsize-1) for _ in range(args.seeds)]
+        runs = [(group, seed) for group in groups for seed in seeds]
+    buildModel(args.dump)
+    tasks = [(group, seed, args.dump, args.timeout) for group, seed in runs]
+    print(f"Running {len(tasks)} simulations with {args.jobs} jobs")
+    failed = regress(tasks, args.jobs, db, args.db, args.keep)
+    print("=======================================")
+    print(f"{len(tasks) - len(failed)}/{len(tasks)} PASS")
+    for group, seed in sorted(failed):
+        print(f"FAIL: make random CACHE_TESTS={group} CACHE_SEEDS={seed}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,63 @@
+##################################################################################################
+##
+## Copyright 2021 by Heqing Huang (feipenghhq@gamil.com)
+##
+## ~~~ Hardware in SpinalHDL ~~~
+##
+## Author: Heqing Huang
+## Date Created: 10/17/2026
+##
+## ================== Description ==================
+##
+## Replay the load/store trace of a real program against the cache
+##
+## The trace file has the format of tests/cocotb/scripts/sim_trace.py. It is captured either
+## from a SoC simulation (TRACE=mem,load) or from the ISS (iss.py -o <trace>). The accesses
+## to the data memory are sent back to back to the cache as word accesses, the hit rate and
+## the total cycles are reported in <name>.stats.json.
+##
+##   make trace TRACE_FILE=coremark.trace
+##
+##################################################################################################
+
+import cocotb
+import os
+from env import *
+from sim_trace import read_records, KIND_LOAD, KIND_MEM
+
+TRACE_FILE  = os.getenv('TRACE_FILE', '')
+# Base address of the traced memory, mapped to address 0 of the cache
+TRACE_BASE  = int(os.getenv('TRACE_BASE', '0x80000000'), 0)
+# Maximum number of accesses to replay, 0 for the whole trace
+TRACE_LIMIT = int(os.getenv('TRACE_LIMIT', '0'))
+# Size of the main memory in word, default to the 64KB data memory of the SoC
+memDepth    = int(os.getenv('TRACE_MEM_DEPTH', '16384'))
+
+def traceRequests(file, base, limit=0):
+    """ Convert the load/store records of the trace into cache requests """
+    window = memDepth << 2
+    count  = 0
+    for _, kind, addr, data in read_records(file):
+        kind &= 0xFF
+        if kind != KIND_LOAD and kind != KIND_MEM:
+            continue
+        offset = addr - base
+        # only the data memory is cached
+        if offset < 0 or offset >= window:
+            continue
+        yield AHB3ReqTrans(True, offset & ~3, data, kind == KIND_MEM)
+        count += 1
+        if count == limit:
+            return
+
+@cocotb.test(skip=not TRACE_FILE)
+async def cacheTraceReplay(dut):
+    """ Replay the load/store trace and report the hit rate and the total cycles """
+    cacheAhbGen = setup(dut, memDepth)
+    await reset(dut)
+    words, cycles = await cacheAhbGen.pipeline(traceRequests(TRACE_FILE, TRACE_BASE, TRACE_LIMIT))
+    name = os.path.splitext(os.path.basename(TRACE_FILE))[0]
+    summary = await cacheAhbGen.report(name)
+    dut._log.info(f"Replayed {words} accesses of {TRACE_FILE} in {cycles} cycles, "
+                  f"hit rate: {summary['hitRate']:.2%}, "
+                  f"average access time: {cycles / words if words else 0:.3f} cycles")
@@ -1,57 +1,75 @@
 module de2_tb ();
 
-parameter DATA_RAM_ADDR_WIDTH = 19;
-parameter DATA_RAM_SIZE = 1 << (DATA_RAM_ADDR_WIDTH);
-
-// The riscv-arch-test need a larger instruction memory then the actual hardware
-`ifdef SIM_LARGE_INSTR_RAM
-parameter INSTR_RAM_ADDR_WIDTH = 20;
-`else
-parameter INSTR_RAM_ADDR_WIDTH = 15;
-`endif
-parameter INSTR_RAM_SIZE = 1 << (INSTR_RAM_ADDR_WIDTH);
-
 reg io_clk;
 reg io_reset;
-reg [7:0] data_ram  [0:DATA_RAM_SIZE-1];
-reg [7:0] instr_ram [0:INSTR_RAM_SIZE-1];
 
-integer im = 0;
-integer dm = 0;
+// The rom files can be overridden at runtime with +INSTR_RAM_ROM=<file> and +DATA_RAM_ROM=<file>
+// so a prebuilt simulation model can be reused across tests.
+// Each rom is split into one file per byte lane (<file>.0, <file>.1, ...) which is loaded
+// directly into the corresponding ram symbol.
+string instr_ram_file;
+string data_ram_file;
 
 De2SoC DUT_AppleRISCVSoC(.*);
 
+// The dump file and the dumped scope can be changed at runtime with +DUMP_FILE=<file> and
+// +DUMP_SCOPE=<all|core|soc_imem|sram>.
+// With DUMP_CTRL the dump starts off and is turned on/off by the python testbench through
+// dump_on (sim_dump.py) so only some windows of the simulation are dumped.
 `ifdef DUMP_VCD
+reg    dump_on = 1'b0;
+string dump_file;
+string dump_scope;
+
 initial begin
-  $dumpfile ("DUT_de2.vcd");
-  $dumpvars (0, DUT_AppleRISCVSoC);
+  if (!$value$plusargs("DUMP_FILE=%s", dump_file))
+    dump_file = "DUT_de2.vcd";
+  if (!$value$plusargs("DUMP_SCOPE=%s", dump_scope))
+    dump_scope = "all";
+  $dumpfile (dump_file);
+  if (dump_scope == "core")
+    $dumpvars (0, DUT_AppleRISCVSoC.core);
+  else if (dump_scope == "soc_imem")
+    $dumpvars (0, DUT_AppleRISCVSoC.soc_imem);
+  else if (dump_scope == "sram")
+    $dumpvars (0, IS61LV25616);
+  else
+    $dumpvars (0, DUT_AppleRISCVSoC);
+`ifdef DUMP_CTRL
+  $dumpoff;
+`endif
 end
+
+`ifdef DUMP_CTRL
+always @(dump_on) begin
+  if (dump_on)
+    $dumpon;
+  else
+    $dumpoff;
+end
+`endif
 `endif
 
 `ifdef LOAD_INSTR_RAM
 initial begin
-  $display("Loading instruction ram verilog file");
-  $readmemh("instr_ram.rom", instr_ram);
+  if (!$value$plusargs("INSTR_RAM_ROM=%s", instr_ram_file))
+    instr_ram_file = "instr_ram.rom";
+  $display("Loading instruction ram verilog file %0s", instr_ram_file);
+  $readmemh({instr_ram_file, ".0"}, DUT_AppleRISCVSoC.soc_imem.ram_symbol0);
+  $readmemh({instr_ram_file, ".1"}, DUT_AppleRISCVSoC.soc_imem.ram_symbol1);
+  $readmemh({instr_ram_file, ".2"}, DUT_AppleRISCVSoC.soc_imem.ram_symbol2);
+  $readmemh({instr_ram_file, ".3"}, DUT_AppleRISCVSoC.soc_imem.ram_symbol3);
   $display("[INFO] Loading Instruction RAM Done");
-  for (im = 0; im < INSTR_RAM_SIZE; im = im + 4) begin
-    DUT_AppleRISCVSoC.soc_imem.ram_symbol3[im/4] = instr_ram[im+3];
-    DUT_AppleRISCVSoC.soc_imem.ram_symbol2[im/4] = instr_ram[im+2];
-    DUT_AppleRISCVSoC.soc_imem.ram_symbol1[im/4] = instr_ram[im+1];
-    DUT_AppleRISCVSoC.soc_imem.ram_symbol0[im/4] = instr_ram[im];
-  end
 end
 `endif
 
 `ifdef LOAD_DATA_RAM
-integer i;
-reg [31:0] word;
 initial begin
-  $display("Loading Data ram verilog file");
-  $readmemh("data_ram.rom", data_ram);
-  for (im = 0; im < DATA_RAM_SIZE; im = im + 2) begin
-    IS61LV25616.RAM_0[im/2] = data_ram[im];
-    IS61LV25616.RAM_1[im/2] = data_ram[im+1];
-  end
+  if (!$value$plusargs("DATA_RAM_ROM=%s", data_ram_file))
+    data_ram_file = "data_ram.rom";
+  $display("Loading Data ram verilog file %0s", data_ram_file);
+  $readmemh({data_ram_file, ".0"}, IS61LV25616.RAM_0);
+  $readmemh({data_ram_file, ".1"}, IS61LV25616.RAM_1);
   $display("[INFO] Loading Data RAM Done");
   //$display("[INFO] ram0 %x", IS61LV25616.RAM_0[0]);
   //$display("[INFO] ram0 %x", IS61LV25616.RAM_1[0]);